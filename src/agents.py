@@ -1,33 +1,21 @@
-from swarm import Agent
-
-def read_requirements(file_path):
-    """
-    Reads the contents of the specified requirements file.
-
-    Args:
-        file_path (str): The path to the requirements file.
-
-    Returns:
-        str: The contents of the file.
-    """
-    with open(file_path, 'r') as file:
-        return file.read()
+# The agents are built on first use, so that importing this module does not import Swarm and the
+# OpenAI SDK; commands that make no model calls start without them
+AGENT_SPECS = {}
 
 # Updated Reader Agent with more detailed instructions
-reader_agent = Agent(
+AGENT_SPECS["reader_agent"] = dict(
     name="Reader Agent",
     instructions=(
-        "You are responsible for reading and analyzing the contents of the provided requirements file. "
+        "You are responsible for reading and analyzing the contents of the provided requirements document. "
         "Your goal is to extract high-level requirements that outline the key objectives, deliverables, "
         "and any other important details mentioned in the document. The extracted requirements should be "
         "concise but cover all major points that stakeholders should be aware of to proceed with further "
         "clarifications or implementation."
     ),
-    functions=[read_requirements],  # This agent uses the `read_requirements` function to read the file
 )
 
 # Updated Clarification Agent with more detailed instructions
-clarification_agent = Agent(
+AGENT_SPECS["clarification_agent"] = dict(
     name="Clarification Agent",
     instructions=(
         "You are tasked with identifying any ambiguous or unclear requirements that need clarification. "
@@ -40,7 +28,7 @@ clarification_agent = Agent(
 )
 
 # IEEE 830 Compliant Requirements Writer Agent
-ieee_830_agent = Agent(
+AGENT_SPECS["ieee_830_agent"] = dict(
     name="IEEE 830 Requirements Writer",
     instructions=(
         "You are an expert in writing software requirements specifications that adhere to the IEEE 830 standard. "
@@ -62,3 +50,10 @@ ieee_830_agent = Agent(
         "Organize the requirements in a hierarchical manner and use consistent terminology throughout the document."
     ),
 )
+
+def __getattr__(name):
+    if name not in AGENT_SPECS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from swarm import Agent
+    agent = globals()[name] = Agent(**AGENT_SPECS[name])
+    return agent
@@ -0,0 +1,100 @@
+import json
+import logging
+from clarification import CONTINUE_QUESTION, ask_clarification_question, default_answer, parse_yes_no
+from question_index import QuestionIndex, normalize_question
+
+# What an answer script does with a question it has no answer to
+UNANSWERED_POLICIES = ("default", "ask", "fail")
+
+class UnansweredQuestion(LookupError):
+    """
+    Raised for a question the answer script does not cover when its policy is `fail`.
+    """
+
+def load_answers(path):
+    """
+    Reads an answer script: one JSON object per line with a `question` and its `answer`.
+
+    Returns:
+        list: `(question, answer)` tuples, in file order.
+
+    Raises:
+        ValueError: If a line is not such an object.
+    """
+    entries = []
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as error:
+                raise ValueError(f"{path}:{line_number}: {error}") from None
+            if not isinstance(item, dict) or not str(item.get("question", "")).strip() or "answer" not in item:
+                raise ValueError(f"{path}:{line_number}: expected an object with a question and an answer")
+            entries.append((str(item["question"]).strip(), str(item["answer"]).strip()))
+    return entries
+
+def answer_lines(clarifications):
+    """
+    Renders a session's clarifications, from its traceability index, as answer script lines.
+    """
+    return [
+        json.dumps({"question": clarification["question"], "answer": clarification["answer"]})
+        for clarification in clarifications
+    ]
+
+class AnswerScript:
+    """
+    Answers clarification questions from a script instead of a terminal.
+
+    A question takes the scripted answer to the same question or, through a `QuestionIndex`, to a
+    rephrasing of it, so a script exported from one session replays against a model that words
+    its questions a little differently. An answer may be an option number. A question the script
+    does not cover is answered by the `unanswered` policy: the first option (`default`, returned as
+    a `DefaultAnswer` so it is not remembered as a real answer), the terminal (`ask`) or an
+    `UnansweredQuestion` error (`fail`), which interrupts the session so it can be resumed with a
+    completed script. The continue prompt takes a scripted answer to
+    `CONTINUE_QUESTION` and is otherwise answered yes, so loops run until no questions are left.
+    """
+
+    def __init__(self, entries, unanswered="default", similarity_threshold=0.8):
+        if unanswered not in UNANSWERED_POLICIES:
+            raise ValueError(f"Unknown unanswered policy {unanswered!r}")
+        self.unanswered = unanswered
+        self.index = QuestionIndex(threshold=similarity_threshold)
+        self.continue_answer = None
+        for question, answer in entries:
+            if normalize_question(question) == normalize_question(CONTINUE_QUESTION):
+                self.continue_answer = answer
+            else:
+                self.index.add(question, answer)
+        self.scripted = 0
+        self.unscripted = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def answer_fn(self, question, options=None, suggestions=None):
+        match = self.index.match(question)
+        if match:
+            scripted_question, answer, similarity = match
+            self.scripted += 1
+            if similarity < 1.0:
+                logging.info(f"Answering '{question}' with the scripted answer to '{scripted_question}' ({similarity:.2f})")
+            if options and answer.isdigit() and 1 <= int(answer) <= len(options):
+                return options[int(answer) - 1]
+            return answer
+
+        if self.unanswered == "fail":
+            raise UnansweredQuestion(f"The answer script has no answer to: {question}")
+        self.unscripted += 1
+        if self.unanswered == "ask":
+            return ask_clarification_question(question, options, suggestions)
+        logging.warning(f"The answer script has no answer to '{question}'; using the default answer")
+        return default_answer(question, options)
+
+    def continue_fn(self):
+        if self.continue_answer is None:
+            return True
+        return parse_yes_no(self.continue_answer) is True
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+# Artifacts are split before each markdown heading, so revisions that rewrite only some
+# sections share the blobs of the others
+CHUNK_BOUNDARY_RE = re.compile(r"(?m)^(?=#{1,6} )")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    chunks TEXT NOT NULL,
+    UNIQUE (run_id, name, version)
+);
+CREATE TABLE IF NOT EXISTS publications (
+    name TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    UNIQUE (name, number),
+    UNIQUE (run_id, name, version)
+);
+"""
+
+def split_chunks(content):
+    return [chunk for chunk in CHUNK_BOUNDARY_RE.split(content) if chunk]
+
+class ArtifactStore:
+    """
+    Versioned, deduplicated history of every artifact a run produces, indexed in SQLite.
+
+    Artifacts are keyed by run and name, so names every run uses, such as
+    `001_original_requirements.txt`, keep one version history per run. Each `put` allocates the
+    next version inside a write transaction. `publish` also numbers a document among every run's
+    publications of its name, so concurrent sessions never receive the same `requirements_vN.md`.
+    Content is stored as zlib-compressed, content-addressed chunks split at markdown headings,
+    shared by all runs: a revision that only rewrites some sections of a document adds blobs for
+    those sections alone. With `path=":memory:"` the store lives only as long as the process.
+    """
+
+    def __init__(self, path=os.path.join("artifacts", "artifacts.db")):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def start_run(self, run_id, **metadata):
+        """
+        Registers a run and its options; registering an existing run again is a no-op.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, created, metadata) VALUES (?, ?, ?)",
+                (run_id, time.time(), json.dumps(metadata, default=str)),
+            )
+
+    def put(self, run_id, name, content):
+        """
+        Stores a new version of the run's artifact `name`.
+
+        Storing the same content as the run's latest version returns that version, so replayed
+        stages do not create new revisions.
+
+        Returns:
+            int: The version of the artifact.
+        """
+        chunks = split_chunks(content)
+        hashes = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+        encoded_hashes = json.dumps(hashes)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                latest = self._conn.execute(
+                    "SELECT version, chunks FROM artifacts WHERE run_id = ? AND name = ? ORDER BY version DESC LIMIT 1",
+                    (run_id, name),
+                ).fetchone()
+                if latest and latest[1] == encoded_hashes:
+                    self._conn.execute("COMMIT")
+                    return latest[0]
+
+                version = latest[0] + 1 if latest else 1
+                for chunk, digest in zip(chunks, hashes):
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO blobs (hash, size, data) VALUES (?, ?, ?)",
+                        (digest, len(chunk), zlib.compress(chunk.encode("utf-8"))),
+                    )
+                self._conn.execute(
+                    "INSERT INTO artifacts (run_id, name, version, created, size, chunks) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, name, version, time.time(), len(content), encoded_hashes),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        logging.info(f"Stored {name} v{version} for run {run_id}")
+        return version
+
+    def publish(self, run_id, name, content, after=0):
+        """
+        Stores `content` as the run's artifact `name` and numbers it among all runs' publications of `name`.
+
+        Numbers are allocated in a write transaction, so concurrent sessions and processes never
+        receive the same one. A new number is also above `after`, so numbers already taken outside
+        the store, such as files from before it existed, are skipped. Publishing the run's latest
+        version again returns its number.
+
+        Returns:
+            tuple: The artifact's version in the run and its publication number.
+        """
+        version = self.put(run_id, name, content)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT number FROM publications WHERE run_id = ? AND name = ? AND version = ?",
+                    (run_id, name, version),
+                ).fetchone()
+                if row:
+                    number = row[0]
+                else:
+                    number = self._conn.execute(
+                        "SELECT MAX(COALESCE(MAX(number), 0), ?) + 1 FROM publications WHERE name = ?", (after, name)
+                    ).fetchone()[0]
+                    self._conn.execute(
+                        "INSERT INTO publications (name, number, run_id, version) VALUES (?, ?, ?, ?)",
+                        (name, number, run_id, version),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return version, number
+
+    def get(self, run_id, name, version=None):
+        """
+        Returns the content of a run's artifact version (the latest by default), or None if it does not exist.
+        """
+        with self._lock:
+            if version is None:
+                row = self._conn.execute(
+                    "SELECT chunks FROM artifacts WHERE run_id = ? AND name = ? ORDER BY version DESC LIMIT 1",
+                    (run_id, name),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT chunks FROM artifacts WHERE run_id = ? AND name = ? AND version = ?",
+                    (run_id, name, version),
+                ).fetchone()
+            if row is None:
+                return None
+            parts = []
+            for digest in json.loads(row[0]):
+                data = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()[0]
+                parts.append(zlib.decompress(data).decode("utf-8"))
+        return "".join(parts)
+
+    def versions(self, run_id, name):
+        """
+        Lists `(version, created, size)` for every version of a run's artifact, oldest first.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT version, created, size FROM artifacts WHERE run_id = ? AND name = ? ORDER BY version",
+                (run_id, name),
+            ).fetchall()
+
+    def run_artifacts(self, run_id):
+        """
+        Lists `(name, version, size)` for every artifact a run stored, in the order it stored them.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, version, size FROM artifacts WHERE run_id = ? ORDER BY id", (run_id,)
+            ).fetchall()
+
+    def runs(self):
+        """
+        Lists `(run_id, created, metadata)` for every registered run, newest first.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT run_id, created, metadata FROM runs ORDER BY created DESC").fetchall()
+        return [(run_id, created, json.loads(metadata)) for run_id, created, metadata in rows]
+
+    def stats(self):
+        """
+        Returns the number of artifacts and blobs and the logical versus stored size.
+        """
+        with self._lock:
+            artifacts, logical_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+            blobs, stored_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return {
+            "artifacts": artifacts,
+            "blobs": blobs,
+            "logical_bytes": logical_bytes,
+            "stored_bytes": stored_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
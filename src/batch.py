@@ -0,0 +1,182 @@
+import argparse
+import glob
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from artifact_store import ArtifactStore
+from cache import CachedClient
+from clarification import default_answer
+from main import add_client_arguments, create_client, find_wrapper, run_session, write_run_report
+from scheduler import PRIORITY_BULK, request_priority
+from session_store import SessionStore
+from tracing import tracer
+from utils import (
+    setup_logging,
+    current_session_id,
+    add_session_log,
+    remove_session_log,
+)
+
+def find_requirements_files(source):
+    """
+    Resolves a directory or glob pattern into a sorted list of requirements files.
+
+    Args:
+        source (str): A directory (all `*.txt` and `*.md` files in it are used) or a glob pattern.
+
+    Returns:
+        list: Paths of the matching files.
+    """
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "*.txt")) + glob.glob(os.path.join(source, "*.md"))
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+def process_document(client, file_path, output_root, max_loops, sectioned_ieee=False, artifact_store=None):
+    """
+    Runs one complete, non-interactive session in its own output directory and log.
+
+    Args:
+        client (Swarm): The shared swarm client.
+        file_path (str): The requirements file to process.
+        output_root (str): Directory under which the session directory is created.
+        max_loops (int): Maximum number of clarification loops.
+        sectioned_ieee (bool): Generate the IEEE 830 document as concurrent sections.
+        artifact_store (ArtifactStore, optional): Store shared by the batch's sessions.
+
+    Returns:
+        tuple: The session id and the session directory.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    session_id = f"{stem}_{uuid.uuid4().hex[:8]}"
+    session_dir = os.path.join(output_root, session_id)
+
+    token = current_session_id.set(session_id)
+    handler = add_session_log(session_id, os.path.join(session_dir, "session.log"))
+    try:
+        logging.info(f"Session {session_id} started for {file_path}")
+        if artifact_store is not None:
+            artifact_store.start_run(session_id, requirements_file=file_path, batch=True)
+        # Batch calls are bulk work: interactive sessions sharing the client go first
+        with tracer.span("session", kind="session", session=session_id), request_priority(PRIORITY_BULK):
+            run_session(
+                client,
+                file_path,
+                session_id=session_id,
+                output_dir=os.path.join(session_dir, "agent_outputs"),
+                artifact_dir=session_dir,
+                answer_fn=default_answer,
+                continue_fn=lambda: True,
+                max_loops=max_loops,
+                sectioned_ieee=sectioned_ieee,
+                session_store=SessionStore(session_id, session_dir=session_dir),
+                artifact_store=artifact_store,
+                echo=lambda *args, **kwargs: None,
+            )
+        logging.info(f"Session {session_id} finished")
+    finally:
+        remove_session_log(handler)
+        current_session_id.reset(token)
+    return session_id, session_dir
+
+def run_batch(
+    client,
+    file_paths,
+    output_root="batch_outputs",
+    max_workers=4,
+    max_loops=3,
+    sectioned_ieee=False,
+    artifact_store=None,
+):
+    """
+    Processes many requirements files concurrently on a bounded worker pool.
+
+    Args:
+        client (Swarm): The shared swarm client.
+        file_paths (list): The requirements files to process.
+        output_root (str): Directory that receives one subdirectory per session.
+        max_workers (int): Maximum number of sessions running at the same time.
+        max_loops (int): Maximum number of clarification loops per session.
+        sectioned_ieee (bool): Generate each IEEE 830 document as concurrent sections.
+        artifact_store (ArtifactStore, optional): Store shared by the sessions; defaults to
+            `<output_root>/artifacts.db`.
+
+    Returns:
+        dict: Completed and failed counts, elapsed seconds and documents per minute.
+    """
+    os.makedirs(output_root, exist_ok=True)
+    if artifact_store is None:
+        artifact_store = ArtifactStore(os.path.join(output_root, "artifacts.db"))
+    completed = 0
+    failed = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                process_document, client, path, output_root, max_loops, sectioned_ieee, artifact_store
+            ): path
+            for path in file_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                session_id, session_dir = future.result()
+                completed += 1
+                print(f"[{completed + failed}/{len(file_paths)}] {path} -> {session_dir}")
+            except Exception:
+                failed += 1
+                logging.exception(f"Session for {path} failed")
+                print(f"[{completed + failed}/{len(file_paths)}] {path} FAILED (see log)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "completed": completed,
+        "failed": failed,
+        "elapsed_seconds": elapsed,
+        "documents_per_minute": completed / (elapsed / 60) if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ClarifyLoop over many requirements files concurrently.")
+    parser.add_argument("source", help="Directory or glob pattern of requirements files")
+    parser.add_argument("--workers", type=int, default=4, help="Number of sessions to run at the same time")
+    parser.add_argument("--max-loops", type=int, default=3, help="Maximum clarification loops per session")
+    parser.add_argument("--sectioned-ieee", action="store_true", help="Generate IEEE 830 documents as concurrent sections")
+    parser.add_argument("--output-dir", default="batch_outputs", help="Directory for per-session outputs")
+    parser.add_argument("--trace-dir", default="traces", help="Directory receiving the batch trace and summary")
+    parser.add_argument(
+        "--log-payload-chars", type=int, default=2000, help="Truncate longer log messages (0 disables truncation)"
+    )
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging(max_payload_chars=args.log_payload_chars)
+    file_paths = find_requirements_files(args.source)
+    if not file_paths:
+        print(f"No requirements files found for {args.source}")
+        return
+
+    client = create_client(args)
+    summary = run_batch(
+        client,
+        file_paths,
+        output_root=args.output_dir,
+        max_workers=args.workers,
+        max_loops=args.max_loops,
+        sectioned_ieee=args.sectioned_ieee,
+    )
+
+    print(
+        f"\nProcessed {summary['completed']} document(s), {summary['failed']} failed, "
+        f"in {summary['elapsed_seconds']:.1f}s ({summary['documents_per_minute']:.2f} documents/minute)"
+    )
+    logging.info(f"Batch summary: {summary}")
+    logging.info(f"Cache stats: {find_wrapper(client, CachedClient).stats()}")
+    write_run_report(args.trace_dir, f"batch_{time.strftime('%Y%m%d_%H%M%S')}", client)
+
+if __name__ == "__main__":
+    main()
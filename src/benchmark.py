@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from clarification import default_answer
+from fake_client import FakeSwarm
+from main import run_session
+from routing import DEFAULT_TIER_MODELS, RoutingClient, RoutingPolicy, tier_report
+from tracing import TracingClient, tracer
+
+# Metrics compared against a baseline; a higher value is a regression for each of them
+BASELINE_METRICS = ("loops", "questions_asked", "total_calls", "max_clarification_prompt_tokens", "wall_seconds", "peak_memory_bytes")
+
+def clarification_prompt_tokens(spans):
+    """
+    Returns the prompt size of the Clarification Agent calls for each loop, in loop order.
+    """
+    per_loop = {}
+    for span in spans:
+        attributes = span["attributes"]
+        if span["kind"] == "call" and attributes.get("agent") == "Clarification Agent" and attributes.get("loop"):
+            per_loop[attributes["loop"]] = max(per_loop.get(attributes["loop"], 0), attributes["prompt_tokens"])
+    return [per_loop[loop] for loop in sorted(per_loop)]
+
+def run_benchmark(
+    requirements_file,
+    latency=0.05,
+    tokens_per_second=2000,
+    questions_per_loop=3,
+    question_pool=9,
+    rephrase=False,
+    max_loops=10,
+    sectioned_ieee=False,
+    prefetch=False,
+    stream=False,
+    structured_questions=False,
+    routing=True,
+    unreliable_fast=False,
+):
+    """
+    Runs one full session against the local fake model with scripted answers.
+
+    Every question is answered with its first option and every loop continues, so the run is
+    deterministic apart from timing. With `routing`, calls go through the default model routing
+    policy; with `unreliable_fast`, the fake's fast-tier questions never parse, so every question
+    call escalates.
+
+    Returns:
+        dict: Wall time, peak memory, loop and question counts, calls per stage and per tier, and
+        prompt growth per loop.
+    """
+    tracer.reset()
+    fake = FakeSwarm(
+        latency, tokens_per_second, questions_per_loop, question_pool, rephrase,
+        unreliable_model=DEFAULT_TIER_MODELS["fast"] if unreliable_fast else None,
+    )
+    client = RoutingClient(TracingClient(fake), RoutingPolicy() if routing else None)
+    asked = []
+
+    def answer(question, options=None):
+        asked.append(question)
+        return default_answer(question, options)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with tracer.span("session", kind="session", session="benchmark"):
+                run_session(
+                    client,
+                    requirements_file,
+                    session_id="benchmark",
+                    output_dir=os.path.join(workdir, "agent_outputs"),
+                    artifact_dir=workdir,
+                    answer_fn=answer,
+                    continue_fn=lambda: True,
+                    max_loops=max_loops,
+                    sectioned_ieee=sectioned_ieee,
+                    prefetch=prefetch,
+                    stream=stream,
+                    structured_questions=structured_questions,
+                    echo=lambda *args, **kwargs: None,
+                )
+            wall_seconds = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    summary = tracer.summary()
+    prompt_tokens = clarification_prompt_tokens(tracer.spans)
+    tiers = tier_report(tracer.spans, client.policy, client.escalations)
+    return {
+        "wall_seconds": wall_seconds,
+        "peak_memory_bytes": peak_memory,
+        "loops": len(prompt_tokens),
+        "questions_asked": len(asked),
+        "total_calls": sum(fake.calls.values()),
+        "calls_per_agent": dict(fake.calls),
+        "calls_per_stage": {row["stage"]: row["calls"] for row in summary["stages"] if row["calls"]},
+        "calls_per_tier": {row["tier"]: row["calls"] for row in tiers},
+        "escalations": sum(client.escalations.values()),
+        "clarification_prompt_tokens": prompt_tokens,
+        "max_clarification_prompt_tokens": max(prompt_tokens, default=0),
+        "loop_summary": summary["loops"],
+    }
+
+def compare_to_baseline(result, baseline, tolerance=0.1):
+    """
+    Lists the metrics that are more than `tolerance` worse than the baseline.
+
+    Returns:
+        list: Human-readable regression descriptions; empty if there are none.
+    """
+    regressions = []
+    for metric in BASELINE_METRICS:
+        if metric not in baseline:
+            continue
+        expected = baseline[metric]
+        actual = result[metric]
+        if actual > expected * (1 + tolerance):
+            regressions.append(f"{metric}: {actual:.6g} (baseline {expected:.6g}, tolerance {tolerance:.0%})")
+    return regressions
+
+def format_result(result):
+    lines = [
+        f"Wall time:           {result['wall_seconds']:.2f}s",
+        f"Peak memory:         {result['peak_memory_bytes'] / 1024:.0f} KiB",
+        f"Clarification loops: {result['loops']}",
+        f"Questions asked:     {result['questions_asked']}",
+        f"Model calls:         {result['total_calls']}",
+        f"Escalations:         {result['escalations']}",
+        "",
+        "Calls per stage:",
+    ]
+    for stage, calls in sorted(result["calls_per_stage"].items()):
+        lines.append(f"  {stage:<32} {calls:>5}")
+    lines.append("")
+    lines.append("Calls per tier:")
+    for tier, calls in result["calls_per_tier"].items():
+        lines.append(f"  {tier:<32} {calls:>5}")
+    lines.append("")
+    lines.append("Clarification prompt tokens per loop:")
+    previous = None
+    for loop, tokens in enumerate(result["clarification_prompt_tokens"], 1):
+        growth = f" ({tokens - previous:+d})" if previous is not None else ""
+        lines.append(f"  loop {loop:<3} {tokens:>7}{growth}")
+        previous = tokens
+    return "\n".join(lines)
+
+def main():
+    """
+    Benchmarks the full pipeline against the local fake model and optionally checks for regressions.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a deterministic local fake model.")
+    parser.add_argument(
+        "requirements_file",
+        nargs="?",
+        default="requirements.txt",
+        help="Initial requirements file (default: requirements.txt)",
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=2000, help="Fake generation throughput; 0 for instant")
+    parser.add_argument("--questions-per-loop", type=int, default=3, help="Questions the fake asks per loop")
+    parser.add_argument("--question-pool", type=int, default=9, help="Total questions the fake asks before it is satisfied")
+    parser.add_argument("--rephrase", action="store_true", help="Make the fake also repeat answered questions in other words")
+    parser.add_argument("--max-loops", type=int, default=10, help="Maximum clarification loops")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs; the median wall time is reported")
+    parser.add_argument("--sectioned-ieee", action="store_true", help="Generate the IEEE 830 document as concurrent sections")
+    parser.add_argument("--prefetch", action="store_true", help="Prefetch requirement updates and questions")
+    parser.add_argument("--stream", action="store_true", help="Stream the IEEE 830 document")
+    parser.add_argument("--structured-questions", action="store_true", help="Request JSON clarification questions")
+    parser.add_argument("--no-routing", action="store_true", help="Send every call to its agent's own model")
+    parser.add_argument(
+        "--unreliable-fast",
+        action="store_true",
+        help="Make the fake's fast-tier questions unparseable, to measure escalation",
+    )
+    parser.add_argument("--output", help="Write the result as JSON to this file (e.g. to save a baseline)")
+    parser.add_argument("--baseline", help="Compare against a result saved with --output; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression (default: 0.1)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = [
+        run_benchmark(
+            args.requirements_file,
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            questions_per_loop=args.questions_per_loop,
+            question_pool=args.question_pool,
+            rephrase=args.rephrase,
+            max_loops=args.max_loops,
+            sectioned_ieee=args.sectioned_ieee,
+            prefetch=args.prefetch,
+            stream=args.stream,
+            structured_questions=args.structured_questions,
+            routing=not args.no_routing,
+            unreliable_fast=args.unreliable_fast,
+        )
+        for _ in range(args.repeat)
+    ]
+    result = results[-1]
+    result["wall_seconds"] = statistics.median(r["wall_seconds"] for r in results)
+    result["runs"] = len(results)
+    print(format_result(result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResult written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(result, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
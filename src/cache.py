@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from tracing import annotate
+
+def cache_key(agent, messages, model_override=None):
+    """
+    Computes the content address of a `client.run` call.
+
+    Args:
+        agent (Agent): The agent the call is made with.
+        messages (list): The message list sent to the agent.
+        model_override (str, optional): The model used instead of the agent's own.
+
+    Returns:
+        str: A hex SHA-256 digest identifying the call.
+    """
+    instructions = agent.instructions
+    if callable(instructions):
+        instructions = getattr(instructions, "__qualname__", repr(instructions))
+    payload = {
+        "agent": agent.name,
+        "instructions": instructions,
+        "model": model_override or agent.model,
+        "functions": [f.__name__ for f in agent.functions],
+        "messages": messages,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class CachedClient:
+    """
+    Wraps a Swarm client and memoizes `run` results on disk.
+
+    Entries are keyed on agent name, instructions, model and messages, and are evicted
+    least-recently-used first once the cache grows past `max_bytes` or an entry is
+    older than `max_age` seconds.
+    """
+
+    def __init__(self, client, cache_dir=".clarifyloop_cache", max_bytes=256 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        now = time.time()
+        for mtime, key, size in sorted(entries):
+            if now - mtime > self.max_age:
+                self._remove(key)
+                continue
+            self._index[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        self._remove_from_index(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self._index and self._total_bytes > self.max_bytes:
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    def _load(self, key):
+        if key not in self._index:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        if time.time() - entry.get("created", 0) > self.max_age:
+            self._remove(key)
+            self.evictions += 1
+            return None
+        os.utime(path)
+        self._index.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, path)
+        self._remove_from_index(key)
+        size = os.path.getsize(path)
+        self._index[key] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _remove_from_index(self, key):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _response_from_entry(self, agent, entry, context_variables):
+        # Imported here so that loading the cache does not load Swarm and the OpenAI SDK
+        from swarm.types import Response
+
+        updated_context = dict(context_variables)
+        updated_context.update(entry["context_updates"])
+        return Response(
+            messages=entry["messages"],
+            agent=agent if entry["agent"] == agent.name else None,
+            context_variables=updated_context,
+        )
+
+    def _entry_from_response(self, key, response, context_variables):
+        return {
+            "key": key,
+            "agent": response.agent.name if response.agent else None,
+            "created": time.time(),
+            "messages": response.messages,
+            "context_updates": {
+                k: v for k, v in response.context_variables.items()
+                if context_variables.get(k) != v
+            },
+        }
+
+    def _replay_stream(self, agent, entry, context_variables):
+        # Mirror the chunk protocol of Swarm's streaming run for a cached response
+        response = self._response_from_entry(agent, entry, context_variables)
+        yield {"delim": "start"}
+        yield {"content": response.messages[-1]["content"], "sender": agent.name}
+        yield {"delim": "end"}
+        yield {"response": response}
+
+    def _record_stream(self, key, stream, context_variables):
+        for chunk in stream:
+            if "response" in chunk:
+                entry = self._entry_from_response(key, chunk["response"], context_variables)
+                with self._lock:
+                    self._store(key, entry)
+            yield chunk
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        """
+        Runs the agent through the wrapped client, serving repeated calls from the cache.
+
+        The returned response carries the caller's context variables plus any updates the
+        original call made to them. Streaming calls are cached too: a hit is replayed as a
+        single content chunk followed by the final response.
+        """
+        context_variables = context_variables or {}
+        key = cache_key(agent, messages, model_override)
+        with self._lock:
+            entry = self._load(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        annotate(cache="hit" if entry is not None else "miss")
+        if entry is not None:
+            logging.info(f"Cache hit for {agent.name} ({key[:12]})")
+            if stream:
+                return self._replay_stream(agent, entry, context_variables)
+            return self._response_from_entry(agent, entry, context_variables)
+
+        logging.info(f"Cache miss for {agent.name} ({key[:12]})")
+        response = self.client.run(
+            agent=agent,
+            messages=messages,
+            context_variables=context_variables,
+            model_override=model_override,
+            stream=stream,
+            **kwargs,
+        )
+        if stream:
+            return self._record_stream(key, response, context_variables)
+        entry = self._entry_from_response(key, response, context_variables)
+        with self._lock:
+            self._store(key, entry)
+        return response
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
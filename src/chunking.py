@@ -0,0 +1,187 @@
+import logging
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import agents
+from text_terms import content_terms
+from sections import HEADING_RE, heading_title, parse_sections, slugify
+from tracing import submit_in_context
+
+# A slice of the source document: its position, the heading it falls under and its text
+Chunk = namedtuple("Chunk", ["index", "heading", "text"])
+
+# Numbered clauses such as "3.2 Reporting" or "4.1.2) The system shall ..." start a new block
+NUMBERED_CLAUSE_RE = re.compile(r"^\s*\d+(\.\d+)*[.)]?\s+\S")
+
+# Numbered lines up to this length are clause titles and are carried as context into later chunks
+MAX_CLAUSE_TITLE_CHARS = 80
+
+BULLET_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+
+# Documents larger than this are extracted chunk by chunk unless chunking is set explicitly
+CHUNKED_EXTRACTION_THRESHOLD = 60000
+
+GENERAL_AREA = "General"
+
+def iter_blocks(lines):
+    """
+    Groups lines into blocks that each start at a heading or numbered clause.
+    """
+    block = []
+    for line in lines:
+        if block and (HEADING_RE.match(line.rstrip("\n")) or NUMBERED_CLAUSE_RE.match(line)):
+            yield "".join(block)
+            block = []
+        block.append(line)
+    if block:
+        yield "".join(block)
+
+def split_oversized(block, max_chars):
+    # A block longer than a chunk is split at line boundaries, and very long lines at max_chars
+    piece = ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if piece:
+                yield piece
+                piece = ""
+            yield line[:max_chars]
+            line = line[max_chars:]
+        if piece and len(piece) + len(line) > max_chars:
+            yield piece
+            piece = ""
+        piece += line
+    if piece:
+        yield piece
+
+def iter_chunks(file_path, max_chars=12000):
+    """
+    Streams a document as structure-aware chunks of at most `max_chars` characters.
+
+    The file is read line by line. Chunks end at headings or numbered clauses where possible, so
+    a clause is not cut in half, and each chunk records the last heading before it so a chunk
+    that starts mid-section keeps its context.
+
+    Args:
+        file_path (str): The requirements document.
+        max_chars (int): Maximum characters per chunk.
+
+    Yields:
+        Chunk: The document's chunks, in order.
+    """
+    index = 0
+    heading = ""
+    chunk_heading = ""
+    pieces = []
+    size = 0
+    with open(file_path, 'r') as f:
+        for block in iter_blocks(f):
+            first_line = block.split("\n", 1)[0].strip()
+            starts_section = bool(HEADING_RE.match(first_line)) or (
+                NUMBERED_CLAUSE_RE.match(first_line) is not None and len(first_line) <= MAX_CLAUSE_TITLE_CHARS
+            )
+            if starts_section:
+                heading = first_line
+            for position, piece in enumerate(split_oversized(block, max_chars)):
+                if pieces and size + len(piece) > max_chars:
+                    yield Chunk(index, chunk_heading, "".join(pieces))
+                    index += 1
+                    pieces, size = [], 0
+                if not pieces:
+                    # A chunk that opens with its own heading needs no context
+                    chunk_heading = "" if starts_section and position == 0 else heading
+                pieces.append(piece)
+                size += len(piece)
+    if pieces:
+        yield Chunk(index, chunk_heading, "".join(pieces))
+
+def extract_chunk(client, chunk):
+    """
+    Extracts the high-level requirements stated in one chunk.
+    """
+    context = f"It continues the section \"{chunk.heading}\".\n    " if chunk.heading else ""
+    prompt = f"""The text below is part {chunk.index + 1} of a larger requirements document.
+    {context}Extract the high-level requirements it states: key objectives, deliverables, constraints
+    and other important details. Respond only with markdown: one `## [Area]` heading per functional
+    area, followed by `- ` bullet points with one requirement each. Do not invent requirements that
+    this part does not state.
+
+    Document part:
+    {chunk.text}
+    """
+    response = client.run(
+        agent=agents.reader_agent,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return response.messages[-1]["content"]
+
+def requirement_tokens(text):
+    return frozenset(content_terms(text))
+
+def is_duplicate(tokens, seen, threshold):
+    for other in seen:
+        union = tokens | other
+        if union and len(tokens & other) / len(union) >= threshold:
+            return True
+    return False
+
+def merge_extractions(extractions, threshold=0.8):
+    """
+    Reduces per-chunk extractions into one document, merging areas and dropping duplicates.
+
+    Areas with the same title are merged in order of first appearance. Within an area, a
+    requirement whose content words overlap an earlier one's by at least `threshold` (Jaccard)
+    is dropped.
+
+    Args:
+        extractions (list): The chunks' markdown extractions, in document order.
+        threshold (float): Similarity at which two requirements count as duplicates.
+
+    Returns:
+        str: The merged high-level requirements.
+    """
+    areas = {}  # area id -> (title, requirements, token sets)
+    for extraction in extractions:
+        for section in parse_sections(extraction):
+            title = heading_title(section.heading) if section.heading else GENERAL_AREA
+            title, requirements, seen = areas.setdefault(slugify(title), (title, [], []))
+            for line in section.body.split("\n"):
+                requirement = BULLET_RE.sub("", line).strip()
+                if not requirement:
+                    continue
+                tokens = requirement_tokens(requirement)
+                if is_duplicate(tokens, seen, threshold):
+                    continue
+                seen.append(tokens)
+                requirements.append(requirement)
+
+    lines = []
+    for title, requirements, _ in areas.values():
+        if not requirements:
+            continue
+        lines.append(f"## {title}")
+        lines.extend(f"- {requirement}" for requirement in requirements)
+        lines.append("")
+    return "\n".join(lines).strip()
+
+def extract_requirements_chunked(client, file_path, max_chars=12000, max_workers=8):
+    """
+    Extracts high-level requirements from a large document with a parallel map over its chunks
+    and a local merge.
+
+    Chunks are submitted as soon as they are read, so extraction overlaps with reading the file.
+
+    Args:
+        client (Swarm): The swarm client to execute the agent.
+        file_path (str): The requirements document.
+        max_chars (int): Maximum characters per chunk.
+        max_workers (int): Maximum number of chunks extracted at the same time.
+
+    Returns:
+        str: The merged high-level requirements.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [submit_in_context(executor, extract_chunk, client, chunk) for chunk in iter_chunks(file_path, max_chars)]
+        extractions = [future.result() for future in futures]
+    merged = merge_extractions(extractions)
+    logging.info(f"Extracted high-level requirements from {len(extractions)} chunk(s) of {file_path}")
+    return merged
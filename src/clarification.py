@@ -1,19 +1,116 @@
-from agents import reader_agent 
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+import agents
+from sections import (
+    ADDITIONAL_SECTION_HEADING,
+    ADDITIONAL_SECTION_ID,
+    Section,
+    parse_sections,
+    route_clarifications,
+    stitch_sections,
+)
+from tracing import submit_in_context
 
-def ask_clarification_question(question, options=None):
+OPTION_LINE_RE = re.compile(r"^\d+\s*[.)]\s*(.+)$")
+
+CONTINUE_QUESTION = "Do you want to continue with more clarifications?"
+
+YES_ANSWERS = {"y", "yes", "yeah", "yep", "sure", "ok", "okay", "continue", "true", "1"}
+NO_ANSWERS = {"n", "no", "nope", "stop", "done", "quit", "false", "0"}
+
+def ask_clarification_question(question, options=None, suggestions=None):
     print(f"\nClarification needed: {question}")
     if options:
         for i, option in enumerate(options, 1):
             print(f"{i}. {option}")
+    if suggestions:
+        print("Answers from earlier sessions:")
+        for i, suggestion in enumerate(suggestions, 1):
+            print(f"s{i}. {suggestion.answer} (given in {suggestion.sessions} session(s), confidence {suggestion.confidence:.0%})")
     while True:
-        answer = input("Please choose an option number or provide your own answer: ").strip()
+        prompt = "Please choose an option number or provide your own answer"
+        if suggestions:
+            prompt += f" (s1-s{len(suggestions)} picks a suggestion, Enter accepts s1)"
+        answer = input(prompt + ": ").strip()
         if options and answer.isdigit() and 1 <= int(answer) <= len(options):
             return options[int(answer) - 1]
+        elif suggestions and not answer:
+            return suggestions[0].answer
+        elif suggestions and answer[:1].lower() == "s" and answer[1:].isdigit() and 1 <= int(answer[1:]) <= len(suggestions):
+            return suggestions[int(answer[1:]) - 1].answer
         elif answer:
             return answer
         else:
             print("Invalid input. Please try again.")
 
+class DefaultAnswer(str):
+    """
+    An answer nobody gave: one `default_answer` chose without asking.
+
+    It answers the question like any other, but is not recorded as an earlier session's answer.
+    """
+
+def default_answer(question, options=None, suggestions=None):
+    # Non-interactive answer source: pick the first suggested option
+    if options:
+        return DefaultAnswer(options[0])
+    return DefaultAnswer("No preference; use the most common industry practice.")
+
+def choose_amendments(clarifications):
+    """
+    Asks which answers of a finished session to change and for their new answers.
+
+    Args:
+        clarifications (list): The session's clarifications from its traceability index.
+
+    Returns:
+        dict: Clarification id -> new answer.
+    """
+    print("\nAnswers given in this session:")
+    for clarification in clarifications:
+        print(f"{clarification['id']}. {clarification['question']} -> {clarification['answer']}")
+    by_id = {clarification["id"].lower(): clarification for clarification in clarifications}
+    while True:
+        selection = input("Which answers do you want to change? (ids separated by commas, empty to cancel): ")
+        ids = [part.strip().lower() for part in selection.split(",") if part.strip()]
+        unknown = [part for part in ids if part not in by_id]
+        if not unknown:
+            break
+        print(f"Unknown id(s): {', '.join(unknown)}. Please try again.")
+
+    changes = {}
+    for part in ids:
+        clarification = by_id[part]
+        changes[clarification["id"]] = ask_clarification_question(clarification["question"], clarification["options"])
+    return changes
+
+def parse_yes_no(answer):
+    """
+    Reads a yes or no answer, however it is phrased.
+
+    Returns:
+        bool: True for yes, False for no, or None if the answer is neither.
+    """
+    answer = answer.strip().lower().rstrip(".!")
+    if answer in YES_ANSWERS:
+        return True
+    if answer in NO_ANSWERS:
+        return False
+    return None
+
+def confirm_continue():
+    while True:
+        try:
+            answer = input(f"\n{CONTINUE_QUESTION} (yes/no): ")
+        except EOFError:
+            # Input ran out (e.g. piped answers), so there is no one left to clarify anything
+            return False
+        decision = parse_yes_no(answer)
+        if decision is not None:
+            return decision
+        print("Please answer yes or no.")
+
 def parse_clarification_response(response):
     if "No further clarification needed" in response:
         return []
@@ -24,20 +121,21 @@ def parse_clarification_response(response):
     options = []
 
     for line in lines:
-        line = line.strip()
+        # Tolerate markdown emphasis and heading markers around the expected format
+        line = line.strip().lstrip('#').strip().replace('**', '')
+        option_match = OPTION_LINE_RE.match(line)
         if line.startswith("Question"):
             if current_question:
                 questions.append((current_question, options))
                 options = []
             current_question = line.split(":", 1)[-1].strip()
-        elif line and (line[0].isdigit() and (line[1] == '.' or line[1] == ')')):
-            option = line.split('.', 1)[-1].strip() if '.' in line else line.split(')', 1)[-1].strip()
-            options.append(option)
+        elif option_match and current_question:
+            options.append(option_match.group(1).strip())
     if current_question:
         questions.append((current_question, options))
     return questions
 
-def update_requirements_content(client, content, clarifications):
+def rewrite_requirements_content(client, content, clarifications):
     # Prepare the prompt for the agent
     clarification_text = "\n\n".join(
         [f"Question: {q}\nAnswer: {a}" for q, a in clarifications]
@@ -53,13 +151,70 @@ def update_requirements_content(client, content, clarifications):
     {clarification_text}
 
     Please provide a well-structured, updated requirements document that incorporates this new information.
+    Keep the [REQ-n] identifier at the start of every existing requirement and leave new requirements
+    without one.
     """
 
     # Call the reader_agent to generate updated requirements
     response = client.run(
-        agent=reader_agent,
+        agent=agents.reader_agent,
         messages=[{"role": "user", "content": prompt}],
     )
 
     # Return the updated requirements
     return response.messages[-1]["content"]
+
+def update_section(client, section, clarifications):
+    clarification_text = "\n\n".join(
+        [f"Question: {q}\nAnswer: {a}" for q, a in clarifications]
+    )
+    heading = section.heading or "(untitled section)"
+    prompt = f"""Update one section of a requirements document with the clarifications below.
+    Keep everything in the section that is still valid and incorporate the clarifications precisely.
+    Return only the updated body of this section: no heading, no other sections, no commentary.
+    Keep the [REQ-n] identifier at the start of every existing requirement and leave new requirements
+    without one.
+
+    Section: {heading}
+    {section.body}
+
+    Clarifications:
+    {clarification_text}
+    """
+
+    response = client.run(
+        agent=agents.reader_agent,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    body = response.messages[-1]["content"].strip("\n")
+
+    # Drop the heading if the agent repeated it
+    lines = body.split("\n")
+    if section.heading and lines and lines[0].strip() == section.heading.strip():
+        body = "\n".join(lines[1:]).strip("\n")
+    return section._replace(body=body)
+
+def update_requirements_content(client, content, clarifications, incremental=True, max_workers=4, routes=None):
+    sections = parse_sections(content)
+    if not incremental or len(sections) < 2:
+        return rewrite_requirements_content(client, content, clarifications)
+
+    # Regenerate only the sections the clarifications touch, concurrently, and stitch them back
+    if routes is None:
+        routes = route_clarifications(sections, clarifications)
+    if ADDITIONAL_SECTION_ID in routes and all(s.id != ADDITIONAL_SECTION_ID for s in sections):
+        sections.append(Section(ADDITIONAL_SECTION_ID, ADDITIONAL_SECTION_HEADING, ""))
+    affected = [section for section in sections if section.id in routes]
+    logging.info(
+        f"Incremental update: regenerating {len(affected)} of {len(sections)} section(s): "
+        f"{', '.join(section.id for section in affected)}"
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            section.id: submit_in_context(executor, update_section, client, section, routes[section.id])
+            for section in affected
+        }
+        updated = {section_id: future.result() for section_id, future in futures.items()}
+
+    return stitch_sections([updated.get(section.id, section) for section in sections])
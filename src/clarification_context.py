@@ -0,0 +1,150 @@
+import logging
+import re
+from question_index import QuestionIndex
+from text_terms import STOPWORDS
+
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text using a characters-per-token heuristic.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def question_topic(question, max_words=8):
+    """
+    Reduces a question to a short topic phrase made of its content words.
+    """
+    words = re.findall(r"[A-Za-z0-9][A-Za-z0-9'/-]*", question)
+    content_words = [w for w in words if w.lower() not in STOPWORDS]
+    return " ".join(content_words[:max_words]) or question.strip()
+
+class ClarificationContext:
+    """
+    Keeps the clarification loop's memory of answered questions bounded.
+
+    Answers are already folded into the current requirements by `update_requirements_content`,
+    so the Clarification Agent only needs to know which topics are settled. The context keeps
+    a similarity index of asked questions, so rephrasings of them are recognised too, and renders
+    a compact digest of answered topics. Once the digest outgrows its share of the token budget,
+    the oldest topics collapse into a rolling summary (or are dropped when `rolling_summary` is
+    False).
+    """
+
+    def __init__(
+        self,
+        token_budget=6000,
+        max_digest_tokens=600,
+        max_answer_chars=120,
+        rolling_summary=True,
+        similarity_threshold=0.8,
+    ):
+        self.token_budget = token_budget
+        self.max_digest_tokens = max_digest_tokens
+        self.max_answer_chars = max_answer_chars
+        self.rolling_summary = rolling_summary
+        self.question_index = QuestionIndex(threshold=similarity_threshold)
+        self.topics = []  # (topic, answer) in the order they were answered
+
+    def earlier_answer(self, question):
+        """
+        Returns `(earlier question, answer, similarity)` if `question` repeats or rephrases an
+        answered question, or None.
+        """
+        return self.question_index.match(question)
+
+    def add(self, question, answer):
+        self.question_index.add(question, answer)
+        self.topics.append((question_topic(question), answer))
+
+    def _topic_line(self, topic, answer):
+        if len(answer) > self.max_answer_chars:
+            answer = answer[:self.max_answer_chars - 3].rstrip() + "..."
+        return f"- {topic}: {answer}"
+
+    def digest(self, max_tokens=None):
+        """
+        Renders the answered topics within `max_tokens`, keeping the most recent ones verbatim.
+
+        Args:
+            max_tokens (int, optional): Token allowance for the digest; defaults to `max_digest_tokens`.
+
+        Returns:
+            str: The digest text, or an empty string when nothing has been answered.
+        """
+        if not self.topics:
+            return ""
+        if max_tokens is None:
+            max_tokens = self.max_digest_tokens
+
+        header = "Already clarified (do not ask about these topics again):"
+        used = estimate_tokens(header)
+        recent = []  # (line, cost), newest first
+        remaining = len(self.topics)
+        for topic, answer in reversed(self.topics):
+            line = self._topic_line(topic, answer)
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            recent.append((line, cost))
+            used += cost
+            remaining -= 1
+
+        if remaining:
+            # The older topics' line needs room too: a quarter of the budget for the rolling
+            # summary, the line itself for the omission note
+            if self.rolling_summary:
+                reserve = max_tokens // 4
+            else:
+                reserve = estimate_tokens(f"- ({len(self.topics)} earlier topic(s) omitted; already incorporated above)") + 1
+            while recent and used + reserve > max_tokens:
+                used -= recent.pop()[1]
+                remaining += 1
+
+        lines = [header]
+        if remaining:
+            if self.rolling_summary:
+                prefix = "- Also settled earlier: "
+                budget_chars = max(0, (max_tokens - used - 1) * CHARS_PER_TOKEN - len(prefix))
+                older = "; ".join(topic for topic, _ in self.topics[:remaining])
+                lines.append(prefix + older[:budget_chars])
+            else:
+                lines.append(f"- ({remaining} earlier topic(s) omitted; already incorporated above)")
+        lines.extend(line for line, _ in reversed(recent))
+        return "\n".join(lines)
+
+    def build_prompt(self, instructions, current_requirements, loop_number=None):
+        """
+        Assembles the Clarification Agent prompt within the token budget and logs its size.
+
+        Args:
+            instructions (str): The fixed instructions preceding the requirements.
+            current_requirements (str): The requirements with all earlier answers folded in.
+            loop_number (int, optional): The clarification loop number, used for logging.
+
+        Returns:
+            str: The prompt to send.
+        """
+        base = f"{instructions}\n\nCurrent requirements:\n{current_requirements}"
+        available = min(self.max_digest_tokens, self.token_budget - estimate_tokens(base))
+        digest = self.digest(available) if available > 0 else ""
+        prompt = f"{base}\n\n{digest}" if digest else base
+
+        prompt_tokens = estimate_tokens(prompt)
+        loop_label = f"loop {loop_number}" if loop_number is not None else "call"
+        logging.info(
+            f"Clarification {loop_label} prompt: {len(prompt)} chars, ~{prompt_tokens} tokens "
+            f"(budget {self.token_budget}, {len(self.topics)} answered topic(s))"
+        )
+        if prompt_tokens > self.token_budget:
+            logging.warning(
+                f"Clarification {loop_label} prompt exceeds the token budget: "
+                f"the current requirements alone are ~{estimate_tokens(current_requirements)} tokens"
+            )
+        return prompt
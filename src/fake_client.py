@@ -0,0 +1,202 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from swarm.types import Response
+from clarification_context import CHARS_PER_TOKEN
+
+# Question templates asked about every feature of the requirements, in order
+QUESTION_TEMPLATES = [
+    ("Which users must be able to access {feature}?", ["All registered users", "Administrators only", "Team members only"]),
+    ("What response time is acceptable for {feature}?", ["Under 200 ms", "Under 1 second", "Under 5 seconds"]),
+    ("Which platforms must support {feature}?", ["Web only", "Web and mobile", "Web, mobile and desktop"]),
+]
+
+# How the fake rephrases each template when it asks an answered question again
+REPHRASED_TEMPLATES = [
+    "Which users should have access to {feature}?",
+    "What is an acceptable response time for {feature}?",
+    "On which platforms should {feature} be supported?",
+]
+
+# Sections the fake never asks about
+UNQUESTIONED_SECTIONS = ("Overview", "Additional Requirements", "Clarified Decisions")
+
+REQUIREMENT_ID_RE = re.compile(r"\[(REQ-\d+)\]")
+
+CLARIFICATION_PAIR_RE = re.compile(r"Question: (.+?)\n\s*Answer: (.+?)(?=\n\s*\n|\n\s*Question: |\s*$)", re.S)
+
+class FakeSwarm:
+    """
+    Deterministic local stand-in for the Swarm client, used for benchmarks and offline runs.
+
+    Responses are templated from the prompt in the formats the pipeline parses: extracted
+    requirements with one section per feature of the input file, clarification questions in the
+    line-based or JSON format, section updates that fold the answers in, and the IEEE 830 outline
+    and sections, which cite the requirement ids of the matching requirements section. A question
+    counts as answered once its text appears in the prompt, so the number of loops depends on how
+    answers flow back into the requirements, as it does with a real model. With `rephrase`, every
+    batch of questions also repeats one answered question in different words, as models do. Calls
+    to `unreliable_model` get clarification questions in free prose the pipeline cannot parse, as
+    a weak model's may be. Each call waits `latency` seconds before the first token and then produces
+    `tokens_per_second` tokens, estimated at four characters per token.
+    """
+
+    def __init__(
+        self, latency=0.05, tokens_per_second=2000, questions_per_loop=3, question_pool=9, rephrase=False,
+        unreliable_model=None,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.questions_per_loop = questions_per_loop
+        self.question_pool = question_pool
+        self.rephrase = rephrase
+        self.unreliable_model = unreliable_model
+        self.calls = Counter()  # agent name -> number of calls
+        self._lock = threading.Lock()
+
+    def _token_delay(self, text):
+        if not self.tokens_per_second:
+            return 0.0
+        return len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    def _features(self, text):
+        # Feature phrases of the input file: "App: login, tasks and reminders." -> [login, tasks, reminders]
+        body = text.split(":", 1)[-1] if ":" in text.split("\n", 1)[0] else text
+        phrases = re.split(r"[,;.\n]|\band\b", body)
+        features = []
+        for phrase in phrases:
+            phrase = phrase.strip(" -*#").strip()
+            if 2 < len(phrase) <= 60 and phrase.lower() not in (f.lower() for f in features):
+                features.append(phrase)
+        return features[:8] or ["Core functionality"]
+
+    def _requirements(self, features):
+        sections = ["# Requirements", "", "## Overview", "- The system provides " + ", ".join(features).lower() + "."]
+        for feature in features:
+            sections += ["", f"## {feature.title()}", f"- The system shall support {feature.lower()}."]
+        return "\n".join(sections)
+
+    def _questions(self, prompt):
+        features = [
+            line[3:].strip() for line in prompt.split("\n")
+            if line.startswith("## ") and line[3:].strip() not in UNQUESTIONED_SECTIONS
+        ]
+        pool = [
+            (template.format(feature=feature.lower()), rephrased.format(feature=feature.lower()), options)
+            for (template, options), rephrased in zip(QUESTION_TEMPLATES, REPHRASED_TEMPLATES)
+            for feature in features
+        ][:self.question_pool]
+        questions = [(q, opts) for q, _, opts in pool if q not in prompt][:self.questions_per_loop]
+        if self.rephrase:
+            repeats = [(r, opts) for q, r, opts in pool if q in prompt and r not in prompt]
+            questions += repeats[:1]
+        return questions
+
+    def _clarification_content(self, prompt):
+        questions = self._questions(prompt)
+        if "JSON" in prompt:
+            return json.dumps({"questions": [{"question": q, "options": opts} for q, opts in questions]})
+        if not questions:
+            return "No further clarification needed"
+        blocks = []
+        for number, (question, options) in enumerate(questions, 1):
+            lines = [f"Question {number}: {question}"]
+            lines += [f"{index}. {option}" for index, option in enumerate(options, 1)]
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def _clarified_lines(self, text):
+        return [f"- {answer.strip()} ({question.strip()})" for question, answer in CLARIFICATION_PAIR_RE.findall(text)]
+
+    def _fold_clarifications(self, body, clarified):
+        # A changed answer replaces the line holding the earlier answer, keeping its id
+        lines = body.strip().split("\n")
+        for line in self._clarified_lines(clarified):
+            question_suffix = line[line.rindex(" ("):]
+            for position, existing in enumerate(lines):
+                if existing.endswith(question_suffix):
+                    tag = REQUIREMENT_ID_RE.search(existing)
+                    lines[position] = f"- [{tag.group(1)}] {line[2:]}" if tag else line
+                    break
+            else:
+                lines.append(line)
+        return "\n".join(lines).strip()
+
+    def _cited_requirements(self, prompt, title=None):
+        # The ids of the final requirements, or of the final requirements section titled `title`
+        final = prompt.split("Final Requirements:", 1)[-1]
+        if title is not None:
+            match = re.search(rf"^## {re.escape(title)}\s*$(.*?)(?=^## |\Z)", final, re.M | re.S | re.I)
+            final = match.group(1) if match else ""
+        return list(dict.fromkeys(REQUIREMENT_ID_RE.findall(final)))
+
+    def _complete(self, prompt):
+        if "extract high-level requirements" in prompt:
+            return self._requirements(self._features(prompt.split("Requirements Document:", 1)[-1].strip()))
+        if "of a larger requirements document" in prompt:
+            part = prompt.split("Document part:", 1)[-1]
+            return "\n".join(
+                f"## {feature.title()}\n- The system shall support {feature.lower()}." for feature in self._features(part)
+            )
+        if "ambiguous or vague requirements" in prompt:
+            return self._clarification_content(prompt)
+        if "could not be parsed" in prompt:
+            return json.dumps({"questions": []})
+        if prompt.startswith("Update one section"):
+            match = re.search(r"Section: .*?\n(.*?)\n\s*Clarifications:\n(.*)", prompt, re.S)
+            body, clarified = (match.group(1), match.group(2)) if match else ("", prompt)
+            return self._fold_clarifications(body, clarified)
+        if "generate an updated version of the requirements document" in prompt:
+            match = re.search(r"Current Requirements:\n(.*?)\n\s*New Clarifications:\n(.*)", prompt, re.S)
+            current, clarified = (match.group(1), match.group(2)) if match else ("", prompt)
+            return self._fold_clarifications(current, clarified)
+        if prompt.startswith("Plan an IEEE 830"):
+            features = [line[3:].strip() for line in prompt.split("\n") if line.startswith("## ")]
+            lines = ["GLOSSARY:", "- SRS: Software Requirements Specification", "", "SPECIFIC REQUIREMENTS:"]
+            lines += [f"3.{index} {title}" for index, title in enumerate(["External Interface Requirements"] + features, 1)]
+            return "\n".join(lines)
+        if prompt.startswith("You are writing one section"):
+            match = re.search(r"heading line `(#+) (\S+) (.+?)`", prompt)
+            if match:
+                hashes, number, title = match.groups()
+                content = f"{hashes} {number} {title}\n\n{hashes}# {number}.1 Overview\n\nThe system shall meet the {title.lower()} listed in the final requirements."
+                cited = self._cited_requirements(prompt, title)
+                return content + "".join(f"\n- [{requirement_id}]" for requirement_id in cited)
+        if "IEEE 830" in prompt:
+            return "\n".join([
+                "# 1. Introduction", "", "This document specifies the system.", "",
+                "# 2. Overall Description", "", "The system is a standalone application.", "",
+                "# 3. Specific Requirements", "", "The system shall meet the final requirements.",
+            ] + [f"- [{requirement_id}]" for requirement_id in self._cited_requirements(prompt)])
+        return "OK"
+
+    def _response(self, agent, content, context_variables):
+        return Response(
+            messages=[{"role": "assistant", "content": content, "sender": agent.name}],
+            agent=agent,
+            context_variables=dict(context_variables or {}),
+        )
+
+    def _stream(self, agent, content, context_variables):
+        time.sleep(self.latency)
+        yield {"delim": "start"}
+        for start in range(0, len(content), CHARS_PER_TOKEN):
+            token = content[start:start + CHARS_PER_TOKEN]
+            time.sleep(self._token_delay(token))
+            yield {"content": token, "sender": agent.name}
+        yield {"delim": "end"}
+        yield {"response": self._response(agent, content, context_variables)}
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls[agent.name] += 1
+        content = self._complete(messages[-1]["content"])
+        unreliable = model_override is not None and model_override == self.unreliable_model
+        if unreliable and "ambiguous or vague requirements" in messages[-1]["content"]:
+            content = "Several requirements could be clearer, for instance who may use each feature and how fast it must respond."
+        if stream:
+            return self._stream(agent, content, context_variables)
+        time.sleep(self.latency + self._token_delay(content))
+        return self._response(agent, content, context_variables)
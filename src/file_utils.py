@@ -1,13 +1,51 @@
+import glob
 import os
 import logging
+import re
 
-def save_updated_requirements_file(base_file_path, content):
-    version = 1
+def highest_file_number(base, ext):
+    """
+    Returns the highest N of the `{base}_vN{ext}` files on disk, or 0 if there are none.
+    """
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"_v(\d+)" + re.escape(ext) + "$")
+    matches = (pattern.match(os.path.basename(path)) for path in glob.glob(f"{glob.escape(base)}_v*{ext}"))
+    return max((int(match.group(1)) for match in matches if match), default=0)
+
+def save_updated_requirements_file(base_file_path, content, artifact_store, run_id, name=None):
+    """
+    Saves `content` as the next version of a requirements file, e.g. `requirements_v3.md`.
+
+    The file number is allocated by the artifact store above the versions already on disk, so
+    concurrent sessions never pick the same one, and an existing file is never overwritten: a
+    store that does not know about a file, e.g. a new `--artifact-store`, skips its number.
+
+    Args:
+        base_file_path (str): The unversioned path, e.g. `requirements.md`.
+        content (str): The document to save.
+        artifact_store (ArtifactStore): Allocates the number and keeps the document's history.
+        run_id (str): The session the document belongs to.
+        name (str, optional): The document's name in the artifact store, which its numbers are
+            allocated under; defaults to `base_file_path`.
+
+    Returns:
+        tuple: The path of the versioned file and the document's version in the run.
+    """
     base, ext = os.path.splitext(base_file_path)
-    while os.path.exists(f"{base}_v{version}{ext}"):
-        version += 1
-    new_file_path = f"{base}_v{version}{ext}"
-    with open(new_file_path, 'w') as file:
-        file.write(content)
+    version, number = artifact_store.publish(
+        run_id, name or os.path.normpath(base_file_path), content, after=highest_file_number(base, ext)
+    )
+    while True:
+        new_file_path = f"{base}_v{number}{ext}"
+        try:
+            with open(new_file_path, 'x') as file:
+                file.write(content)
+            break
+        except FileExistsError:
+            with open(new_file_path) as file:
+                if file.read() == content:
+                    # A resumed session saving the document it already saved
+                    break
+            logging.warning(f"{new_file_path} already exists and was changed; saving under the next free number")
+            number += 1
     logging.info(f"Updated requirements saved to {new_file_path}")
-    return new_file_path
+    return new_file_path, version
@@ -0,0 +1,222 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+import agents
+from tracing import submit_in_context
+
+# Specific Requirements subsections used when the outline cannot be parsed
+DEFAULT_SPECIFIC_SUBSECTIONS = [
+    ("3.1", "External Interface Requirements"),
+    ("3.2", "Functional Requirements"),
+    ("3.3", "Performance Requirements"),
+    ("3.4", "Logical Database Requirements"),
+    ("3.5", "Design Constraints"),
+    ("3.6", "Software System Attributes"),
+]
+
+SECTION_GUIDANCE = {
+    "Introduction": "purpose, scope, definitions/acronyms/abbreviations (use the glossary), references and overview",
+    "Overall Description": "product perspective, product functions, user characteristics, constraints, assumptions and dependencies",
+    "Appendices": "supporting material such as traceability notes or open issues; keep it brief if there is little to add",
+}
+
+NUMBERED_HEADING_RE = re.compile(r"^(#{1,6})\s+(\d+(?:\.\d+)*)\.?\s+(.*)$")
+
+def build_outline(client, final_requirements):
+    """
+    Asks the IEEE 830 agent for the shared outline and glossary all sections are written against.
+
+    Args:
+        client (Swarm): The swarm client to execute the agent.
+        final_requirements (str): The final requirements text.
+
+    Returns:
+        tuple: The list of `(number, title)` Specific Requirements subsections and the glossary text.
+    """
+    prompt = f"""Plan an IEEE 830 software requirements specification for the final requirements below.
+    Respond strictly in this format, with no additional text:
+
+    GLOSSARY:
+    - [Term]: [Definition]
+
+    SPECIFIC REQUIREMENTS:
+    3.1 [Subsection title]
+    3.2 [Subsection title]
+
+    List every Specific Requirements subsection the document needs (external interfaces,
+    one subsection per functional area, performance, logical database, design constraints,
+    software system attributes).
+
+    Final Requirements:
+    {final_requirements}
+    """
+    response = client.run(
+        agent=agents.ieee_830_agent,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return parse_outline(response.messages[-1]["content"])
+
+def parse_outline(outline_text):
+    """
+    Parses the outline response into Specific Requirements subsections and a glossary.
+    """
+    glossary_lines = []
+    subsections = []
+    mode = None
+    for line in outline_text.strip().split("\n"):
+        stripped = line.strip().strip("*")
+        upper = stripped.upper()
+        if upper.startswith("GLOSSARY"):
+            mode = "glossary"
+            continue
+        if upper.startswith("SPECIFIC REQUIREMENTS"):
+            mode = "specific"
+            continue
+        if mode == "glossary" and stripped.startswith(("-", "*")):
+            glossary_lines.append(stripped)
+        elif mode == "specific":
+            match = re.match(r"^3\.(\d+)\.?\s+(.+)$", stripped)
+            if match:
+                subsections.append(match.group(2).strip())
+
+    if not subsections:
+        logging.warning("Could not parse the IEEE 830 outline; using the default Specific Requirements subsections")
+        return list(DEFAULT_SPECIFIC_SUBSECTIONS), "\n".join(glossary_lines)
+
+    # Number subsections ourselves so the document is consistent whatever the outline said
+    numbered = [(f"3.{index}", title) for index, title in enumerate(subsections, 1)]
+    return numbered, "\n".join(glossary_lines)
+
+def generate_section(client, final_requirements, outline_text, glossary, number, title, level):
+    """
+    Generates one section of the specification.
+    """
+    heading = f"{'#' * level} {number} {title}"
+    guidance = SECTION_GUIDANCE.get(title, "every requirement that belongs in this subsection")
+    prompt = f"""You are writing one section of an IEEE 830 software requirements specification.
+    Write only this section, covering {guidance}.
+    Start with the heading line `{heading}` and number any subsections {number}.1, {number}.2 and so on
+    using deeper markdown headings. Use the glossary terms consistently and do not repeat content
+    that belongs to other sections of the outline. Cite the [REQ-n] identifier of every requirement
+    the section covers.
+
+    Document outline:
+    {outline_text}
+
+    Glossary:
+    {glossary or "(none)"}
+
+    Final Requirements:
+    {final_requirements}
+    """
+    response = client.run(
+        agent=agents.ieee_830_agent,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return response.messages[-1]["content"]
+
+def is_section_heading(line, number, level):
+    # The section's own heading, possibly misnumbered or unnumbered, rather than one of its subheadings
+    stripped = line.strip()
+    if not stripped.startswith("#"):
+        return False
+    match = NUMBERED_HEADING_RE.match(stripped)
+    if match:
+        return match.group(2).count(".") <= number.count(".")
+    return len(stripped) - len(stripped.lstrip("#")) <= level
+
+def normalize_section_numbering(text, number, title, level):
+    """
+    Forces a generated section onto its expected heading and renumbers its numbered subheadings.
+
+    Args:
+        text (str): The generated section.
+        number (str): The expected section number, e.g. "3.2".
+        title (str): The expected section title.
+        level (int): The markdown heading level of the section.
+
+    Returns:
+        tuple: The corrected section text and the number of headings that were changed.
+    """
+    lines = text.strip().split("\n")
+    heading = f"{'#' * level} {number} {title}"
+    corrections = 0
+    if lines and is_section_heading(lines[0], number, level):
+        if lines[0].strip() != heading:
+            corrections += 1
+        lines = lines[1:]
+    else:
+        # The section's own heading is missing; a subheading in its place is kept
+        corrections += 1
+
+    # Nesting is measured from the shallowest numbered subheading, whatever level the agent used
+    subheading_levels = [len(m.group(1)) for m in map(NUMBERED_HEADING_RE.match, lines) if m]
+    base_level = min(subheading_levels, default=level + 1)
+
+    counters = []
+    result = [heading]
+    for line in lines:
+        match = NUMBERED_HEADING_RE.match(line)
+        if not match:
+            result.append(line)
+            continue
+        depth = max(1, len(match.group(1)) - base_level + 1)
+        counters = counters[:depth]
+        counters += [0] * (depth - len(counters))
+        counters[depth - 1] += 1
+        expected = ".".join([number] + [str(c) for c in counters])
+        if match.group(2) != expected:
+            corrections += 1
+        result.append(f"{'#' * (level + depth)} {expected} {match.group(3)}")
+    return "\n".join(result), corrections
+
+def generate_sectioned_ieee_830(client, final_requirements, max_workers=6):
+    """
+    Generates the IEEE 830 document as concurrently written sections.
+
+    A shared outline and glossary are built first; then the Introduction, Overall Description,
+    each Specific Requirements subsection and the Appendices are generated in parallel and
+    assembled with consistent section numbering.
+
+    Args:
+        client (Swarm): The swarm client to execute the agents.
+        final_requirements (str): The final requirements text.
+        max_workers (int): Maximum number of sections generated at the same time.
+
+    Returns:
+        str: The assembled IEEE 830 compliant requirements document.
+    """
+    subsections, glossary = build_outline(client, final_requirements)
+    jobs = [("1", "Introduction", 2), ("2", "Overall Description", 2)]
+    jobs += [(number, title, 3) for number, title in subsections]
+    jobs += [("4", "Appendices", 2)]
+
+    outline_text = "\n".join(
+        f"{number} {title}" for number, title, _ in jobs[:2]
+    ) + "\n3 Specific Requirements\n" + "\n".join(
+        f"  {number} {title}" for number, title in subsections
+    ) + "\n4 Appendices"
+    logging.info(f"IEEE 830 outline with {len(jobs)} section(s):\n{outline_text}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            submit_in_context(
+                executor,
+                generate_section, client, final_requirements, outline_text, glossary, number, title, level
+            )
+            for number, title, level in jobs
+        ]
+        generated = [future.result() for future in futures]
+
+    parts = ["# Software Requirements Specification"]
+    total_corrections = 0
+    for (number, title, level), text in zip(jobs, generated):
+        if number == "3.1":
+            parts.append("## 3 Specific Requirements")
+        section_text, corrections = normalize_section_numbering(text, number, title, level)
+        total_corrections += corrections
+        parts.append(section_text)
+
+    if total_corrections:
+        logging.warning(f"Corrected the numbering of {total_corrections} heading(s) while assembling the IEEE 830 document")
+    return "\n\n".join(parts) + "\n"
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from question_index import cosine_similarity, smoothed_idf
+from text_terms import content_terms
+
+# An earlier answer offered for a new question; `sessions` is how many sessions gave it
+Suggestion = namedtuple("Suggestion", ["answer", "confidence", "question", "sessions"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    terms TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answer_terms (
+    term TEXT NOT NULL,
+    answer_id INTEGER NOT NULL,
+    PRIMARY KEY (term, answer_id)
+) WITHOUT ROWID;
+"""
+
+# SQLite's default limit on parameters per statement is 999
+MAX_QUERY_PARAMETERS = 900
+
+class KnowledgeBase:
+    """
+    Answers to clarification questions from every earlier session, indexed for lookup by question.
+
+    Each answer is stored with its question, the options offered and the question's normalized
+    terms, and an inverted index maps terms to answers. `suggest` fetches the answers whose
+    questions share terms with a new question, scores them by TF-IDF cosine similarity and
+    ranks the distinct answers. The confidence of a suggestion is the similarity of its closest
+    question, times the share of similar earlier questions that agree on it, times its support
+    `n / (n + 1)` for `n` sessions that gave it, so one earlier answer never counts as certain.
+    """
+
+    def __init__(self, path=os.path.join("artifacts", "knowledge.db")):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, session_id, question, options, answer):
+        """
+        Stores the answer a user gave to a clarification question.
+        """
+        terms = Counter(content_terms(question))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO answers (session_id, question, options, answer, terms, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, question, json.dumps(list(options or [])), answer, json.dumps(terms), time.time()),
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO answer_terms (term, answer_id) VALUES (?, ?)",
+                    [(term, cursor.lastrowid) for term in terms],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _document_frequencies(self, terms):
+        frequencies = {}
+        terms = list(terms)
+        for start in range(0, len(terms), MAX_QUERY_PARAMETERS):
+            batch = terms[start:start + MAX_QUERY_PARAMETERS]
+            rows = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM answer_terms WHERE term IN ({', '.join('?' * len(batch))}) GROUP BY term",
+                batch,
+            ).fetchall()
+            frequencies.update(rows)
+        return frequencies
+
+    def suggest(self, question, options=None, limit=3, min_similarity=0.8, max_candidates=500):
+        """
+        Ranks earlier answers to questions similar to `question`.
+
+        Args:
+            question (str): The new clarification question.
+            options (list, optional): The options offered; a suggestion matching one of them
+                (ignoring case) is returned with the option's wording.
+            limit (int): Maximum number of suggestions.
+            min_similarity (float): Earlier questions less similar than this are ignored.
+            max_candidates (int): Maximum number of earlier answers scored, those sharing the
+                most of the question's rarest terms first.
+
+        Returns:
+            list: `Suggestion`s, most confident first.
+        """
+        terms = Counter(content_terms(question))
+        if not terms:
+            return []
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            frequencies = self._document_frequencies(terms)
+            weights = {
+                term: (count * smoothed_idf(documents, frequencies.get(term, 0))) ** 2
+                for term, count in terms.items()
+            }
+
+            # An earlier question lacking terms that carry a share `m` of the query's weight is
+            # at most sqrt(1 - m) similar, so a similar one must contain one of the heaviest terms
+            lookup_terms = []
+            covered = 0.0
+            for term in sorted(weights, key=weights.get, reverse=True)[:MAX_QUERY_PARAMETERS]:
+                lookup_terms.append(term)
+                covered += weights[term]
+                if covered / sum(weights.values()) >= 1 - min_similarity ** 2:
+                    break
+
+            rows = self._conn.execute(
+                f"""SELECT a.session_id, a.question, a.answer, a.terms FROM answers a
+                JOIN (
+                    SELECT answer_id, COUNT(*) AS shared FROM answer_terms
+                    WHERE term IN ({', '.join('?' * len(lookup_terms))})
+                    GROUP BY answer_id ORDER BY shared DESC, answer_id DESC LIMIT ?
+                ) candidates ON a.id = candidates.answer_id""",
+                (*lookup_terms, max_candidates),
+            ).fetchall()
+            if not rows:
+                return []
+            candidates = [
+                (session_id, text, answer, Counter(json.loads(entry_terms)))
+                for session_id, text, answer, entry_terms in rows
+            ]
+            vocabulary = set(terms).union(*(entry_terms for _, _, _, entry_terms in candidates))
+            frequencies.update(self._document_frequencies(vocabulary - set(terms)))
+
+        idf = {term: smoothed_idf(documents, frequencies.get(term, 0)) for term in vocabulary}
+        option_wording = {option.strip().lower(): option for option in options or []}
+        ranked = {}  # answer key -> [answer, score, best similarity, closest question, sessions]
+        for session_id, text, answer, entry_terms in candidates:
+            similarity = cosine_similarity(terms, entry_terms, idf)
+            if similarity < min_similarity:
+                continue
+            key = answer.strip().lower()
+            entry = ranked.setdefault(key, [option_wording.get(key, answer), 0.0, 0.0, text, set()])
+            entry[1] += similarity
+            entry[4].add(session_id)
+            if similarity > entry[2]:
+                entry[2], entry[3] = similarity, text
+
+        total_score = sum(entry[1] for entry in ranked.values())
+        suggestions = []
+        for answer, score, similarity, text, sessions in ranked.values():
+            support = len(sessions) / (len(sessions) + 1)
+            suggestions.append(Suggestion(answer, similarity * score / total_score * support, text, len(sessions)))
+        suggestions.sort(key=lambda suggestion: suggestion.confidence, reverse=True)
+        return suggestions[:limit]
+
+    def stats(self):
+        """
+        Returns the number of stored answers, the sessions they came from and the indexed terms.
+        """
+        with self._lock:
+            answers, sessions = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT session_id) FROM answers").fetchone()
+            terms = self._conn.execute("SELECT COUNT(DISTINCT term) FROM answer_terms").fetchone()[0]
+        return {"answers": answers, "sessions": sessions, "terms": terms}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,80 +1,124 @@
+import argparse
+import json
 import logging
 import os
-from swarm import Swarm
-from agents import reader_agent, clarification_agent, ieee_830_agent
+import re
+from collections import Counter
+from datetime import datetime
+from answer_script import UNANSWERED_POLICIES, AnswerScript, UnansweredQuestion, answer_lines, load_answers
+from artifact_store import ArtifactStore
+from cache import CachedClient
+from chunking import CHUNKED_EXTRACTION_THRESHOLD, extract_requirements_chunked
+from scheduler import PRIORITY_BULK, SchedulingClient, request_priority
+import agents
 from utils import (
     setup_logging,
-    clean_agent_outputs,
+    prune_agent_outputs,
     log_agent_action,
     log_agent_output,
+    artifact_writer,
 )
 from clarification import (
+    DefaultAnswer,
     ask_clarification_question,
+    choose_amendments,
+    confirm_continue,
     parse_clarification_response,
     update_requirements_content,
 )
+from clarification_context import ClarificationContext
 from file_utils import save_updated_requirements_file
+from knowledge_base import KnowledgeBase
+from ieee830 import generate_sectioned_ieee_830
+from pipeline import Stage, StageGraph
+from prefetch import ClarificationPrefetcher
+from routing import (
+    RoutingClient,
+    RoutingPolicy,
+    format_tier_report,
+    model_tiers,
+    parse_route,
+    tier_report,
+)
+from session_store import SessionStore
+from streaming import stream_agent_output
+from tracing import TracingClient, load_jsonl, tracer
+from traceability import (
+    amend_requirements,
+    assign_requirement_ids,
+    build_traceability,
+    changed_requirements,
+    link_clarifications,
+    load_traceability,
+    requirement_index,
+    save_traceability,
+)
+from structured_questions import (
+    STRUCTURED_FORMAT_INSTRUCTIONS,
+    StructuredQuestionStream,
+    parse_questions_with_repair,
+)
 
-def start_planning_process(client, context_variables):
+def extract_high_level_requirements(client, original_requirements, file_path, chunked=False):
     """
-    Starts the planning process by running the Reader Agent to extract high-level requirements from a file.
+    Runs the Reader Agent to extract high-level requirements from a requirements document.
 
     Args:
         client (Swarm): The swarm client to execute the agent.
-        context_variables (dict): Context information that includes the file path for the requirements file.
+        original_requirements (str): The document's content, which is sent with the prompt.
+        file_path (str): Path of the document, read chunk by chunk when `chunked` is set.
+        chunked (bool): Extract from the file chunk by chunk in parallel and merge the results, for
+            documents too large for one context.
 
     Returns:
-        dict: The updated context with high-level requirements extracted.
+        str: The high-level requirements.
     """
     logging.info("Starting the planning process")
-    file_path = context_variables["initial_requirements_file_path"]
 
-    # Log and run the Reader Agent to extract high-level requirements from the file
+    if chunked:
+        log_agent_action("Reader Agent", "Extracting requirements chunk by chunk")
+        content = extract_requirements_chunked(client, file_path)
+        log_agent_action("Reader Agent", "Extracted high-level requirements", content)
+        return content
+
+    # The document is already in memory, so it goes in the prompt instead of being read by a tool call
     log_agent_action("Reader Agent", "Reading requirements file")
     response = client.run(
-        agent=reader_agent,
+        agent=agents.reader_agent,
         messages=[
             {
                 "role": "user",
-                "content": f"Please read the requirements from {file_path} and extract high-level requirements."
+                "content": f"""Please extract high-level requirements from the requirements document below.
+
+    Requirements Document:
+    {original_requirements}
+    """
             }
         ],
-        context_variables=context_variables,
     )
-    log_agent_action(
-        "Reader Agent",
-        "Extracted high-level requirements",
-        response.messages[-1]["content"]
-    )
-
-    # Store the extracted high-level requirements in the context
-    response.context_variables["high_level_requirements"] = response.messages[-1]["content"]
-    return response
+    content = response.messages[-1]["content"]
+    log_agent_action("Reader Agent", "Extracted high-level requirements", content)
+    return content
 
-def get_clarification_questions(client, agent, current_requirements, previous_clarifications):
+def build_clarification_message(current_requirements, clarification_context, loop_number=None, structured=False):
     """
-    Identifies ambiguities in the high-level requirements and generates clarification questions.
+    Builds the Clarification Agent prompt for the current requirements.
 
     Args:
-        client (Swarm): The swarm client to execute the agent.
-        agent (Agent): The agent responsible for generating clarification questions.
         current_requirements (str): The current version of the requirements to be clarified.
-        previous_clarifications (list): A list of previously answered clarification questions.
+        clarification_context (ClarificationContext): The answered topics of earlier loops.
+        loop_number (int, optional): The clarification loop number, used for logging.
+        structured (bool): Ask for JSON questions instead of the line-based format.
 
     Returns:
-        str: The agent's response with new clarification questions.
+        str: The prompt.
     """
-    # Combine current requirements with previous clarifications to avoid redundancy
-    if previous_clarifications:
-        clarification_text = "\n\n".join(
-            [f"Question: {q}\nAnswer: {a}" for q, a in previous_clarifications]
-        )
-        combined_requirements = f"{current_requirements}\n\nPrevious Clarifications:\n{clarification_text}"
+    # Earlier answers are already part of the current requirements, so only a bounded digest of
+    # settled topics is added.
+    if structured:
+        instructions = STRUCTURED_FORMAT_INSTRUCTIONS
     else:
-        combined_requirements = current_requirements
-
-    # Generate a prompt for the Clarification Agent to identify ambiguities
-    message = f"""Please identify all ambiguous or vague requirements that need clarification.
+        instructions = """Please identify all ambiguous or vague requirements that need clarification.
 Provide clear questions and possible options for clarification for each one.
 Ensure your response is strictly formatted as follows, with no additional text:
 
@@ -85,63 +129,52 @@ Question 1: [Your question here]
 
 ... and so on.
 
-Do not include any introductions, explanations, or closing remarks.
+Do not include any introductions, explanations, or closing remarks."""
+    return clarification_context.build_prompt(instructions, current_requirements, loop_number)
 
-Current requirements:
-{combined_requirements}"""
-    
-    # Run the Clarification Agent to generate questions
-    response = client.run(
-        agent=agent,
-        messages=[{"role": "user", "content": message}],
-    )
-    return response.messages[-1]["content"]
-
-def generate_final_requirements(client, initial_requirements, clarifications):
+def get_clarification_questions(client, agent, current_requirements, clarification_context, loop_number=None, structured=False):
     """
-    Generates a final detailed requirements document based on initial requirements and clarifications.
+    Identifies ambiguities in the high-level requirements and generates clarification questions.
 
     Args:
         client (Swarm): The swarm client to execute the agent.
-        initial_requirements (str): The initial requirements text.
-        clarifications (list): List of tuples containing questions and answers from the clarification process.
+        agent (Agent): The agent responsible for generating clarification questions.
+        current_requirements (str): The current version of the requirements to be clarified.
+        clarification_context (ClarificationContext): The answered topics of earlier loops.
+        loop_number (int, optional): The clarification loop number, used for logging.
+        structured (bool): Ask for JSON questions instead of the line-based format.
 
     Returns:
-        str: The final detailed requirements document.
-    """
-    clarification_text = "\n\n".join(
-        [f"Question: {q}\nAnswer: {a}" for q, a in clarifications]
-    )
-    prompt = f"""Based on the initial requirements and the clarifications provided, 
-    generate a comprehensive and detailed final requirements document. 
-    Incorporate all the clarifications into the appropriate sections of the requirements.
-
-    Initial Requirements:
-    {initial_requirements}
-
-    Clarifications:
-    {clarification_text}
-
-    Please provide a well-structured, detailed requirements document that incorporates all this information.
+        str: The agent's response with new clarification questions.
     """
+    # Generate a prompt for the Clarification Agent to identify ambiguities
+    message = build_clarification_message(current_requirements, clarification_context, loop_number, structured)
 
+    # Run the Clarification Agent to generate questions
     response = client.run(
-        agent=reader_agent,  # Using the reader agent for this task
-        messages=[{"role": "user", "content": prompt}],
+        agent=agent,
+        messages=[{"role": "user", "content": message}],
     )
     return response.messages[-1]["content"]
 
-def generate_ieee_830_requirements(client, final_requirements):
+def generate_ieee_830_requirements(client, final_requirements, sectioned=False, stream_path=None, echo=print):
     """
     Generates an IEEE 830 compliant requirements document based on the final requirements.
 
     Args:
         client (Swarm): The swarm client to execute the agent.
         final_requirements (str): The final requirements text.
+        sectioned (bool): Generate the document's sections concurrently instead of in one completion.
+        stream_path (str, optional): Stream the document into this file and `echo` as it is generated.
+            Ignored for sectioned generation.
+        echo (callable): Receives the streamed content.
 
     Returns:
         str: The IEEE 830 compliant requirements document.
     """
+    if sectioned:
+        return generate_sectioned_ieee_830(client, final_requirements)
+
     prompt = f"""Based on the final requirements provided, generate a comprehensive 
     IEEE 830 compliant software requirements specification document. 
     Ensure that the document follows the structure and guidelines of the IEEE 830 standard.
@@ -150,167 +183,348 @@ def generate_ieee_830_requirements(client, final_requirements):
     {final_requirements}
 
     Please provide a well-structured, detailed IEEE 830 compliant requirements document.
+    Cite the [REQ-n] identifier of every requirement each section covers.
     """
+    messages = [{"role": "user", "content": prompt}]
+
+    if stream_path:
+        content, _ = stream_agent_output(
+            client, agents.ieee_830_agent, messages, stream_path, echo=echo, stage="IEEE 830 Requirements"
+        )
+        return content
 
     response = client.run(
-        agent=ieee_830_agent,
-        messages=[{"role": "user", "content": prompt}],
+        agent=agents.ieee_830_agent,
+        messages=messages,
     )
     return response.messages[-1]["content"]
 
-def main():
+def run_session(
+    client,
+    initial_requirements_file_path,
+    session_id="12345",
+    output_dir="agent_outputs",
+    artifact_dir=".",
+    answer_fn=ask_clarification_question,
+    continue_fn=confirm_continue,
+    max_loops=10,
+    context_token_budget=6000,
+    sectioned_ieee=False,
+    prefetch=False,
+    session_store=None,
+    stream=False,
+    structured_questions=False,
+    artifact_store=None,
+    chunked_extraction=None,
+    knowledge_base=None,
+    auto_fill_threshold=None,
+    echo=print,
+):
     """
-    Main function to orchestrate the reading, extraction, and clarification of requirements.
-    Sets up logging, runs the Reader and Clarification Agents, and outputs results.
+    Runs the full pipeline for one requirements file: extraction, clarification loop,
+    final requirements, the IEEE 830 document and its traceability index.
+
+    Every requirement is tagged with a `[REQ-n]` id, and the index records which clarification
+    changed which requirement and which IEEE 830 sections cite it, so `--amend` can later
+    regenerate only the sections a changed answer reaches.
+
+    Args:
+        client (Swarm): The swarm client to execute the agents.
+        initial_requirements_file_path (str): Path to the initial requirements file.
+        session_id (str): Identifier stored in the agents' context variables.
+        output_dir (str): Directory that receives the numbered agent outputs.
+        artifact_dir (str): Directory that receives the `requirements_vN.md` document.
+        answer_fn (callable): Called with `(question, options)` to obtain each answer, plus
+            `suggestions` when the knowledge base has any. It returns a `DefaultAnswer` for an
+            answer it chose without asking anyone.
+        continue_fn (callable): Called between loops; returns False to stop clarifying.
+        max_loops (int): Maximum number of clarification loops.
+        context_token_budget (int): Token budget for each Clarification Agent prompt.
+        sectioned_ieee (bool): Generate the IEEE 830 document as concurrent sections.
+        prefetch (bool): Update requirements and prepare the next questions while the user answers.
+        session_store (SessionStore, optional): Journal that checkpoints every stage; stages it
+            already holds for the same inputs are replayed instead of re-run. Defaults to an
+            in-memory journal.
+        stream (bool): Stream the IEEE 830 document to its output file and the console.
+        structured_questions (bool): Request JSON clarification questions and ask each one as soon as
+            it has been received.
+        artifact_store (ArtifactStore, optional): Keeps the versioned history of every output and
+            allocates the `requirements_vN.md` version. Defaults to an in-memory store.
+        chunked_extraction (bool, optional): Extract the high-level requirements chunk by chunk.
+            By default this is used for files larger than `CHUNKED_EXTRACTION_THRESHOLD` bytes.
+        knowledge_base (KnowledgeBase, optional): Answers from earlier sessions. They are offered to
+            `answer_fn` as `suggestions`, and every new answer that is not a `DefaultAnswer` is
+            added to it.
+        auto_fill_threshold (float, optional): Use the top suggestion without asking when its
+            confidence reaches this value.
+        echo (callable): Receives console output; pass a no-op to run quietly.
+
+    Returns:
+        Response: The Reader Agent's extraction, with the final requirements in its context.
     """
-    log_filename = setup_logging()
-    clean_agent_outputs()
+    os.makedirs(artifact_dir, exist_ok=True)
+    if session_store is None:
+        session_store = SessionStore(session_id, session_dir=None)
+    if artifact_store is None:
+        artifact_store = ArtifactStore(":memory:")
+    artifact_store.start_run(session_id)
 
-    client = Swarm()  # Initialize Swarm client
+    def record_output(agent_name, content, step, filename, write_file=True):
+        # Outputs go to the run's directory and, in the background, to the artifact history
+        if write_file:
+            log_agent_output(agent_name, content, step, filename=filename, output_dir=output_dir)
+        artifact_writer.submit(artifact_store.put, session_id, filename, content)
 
-    # Context for the initial requirements file path
-    initial_requirements_file_path = "requirements.txt"
-    initial_context = {
-        "session_id": "12345",
-        "initial_requirements_file_path": initial_requirements_file_path,
-        "next_agent": "Reader Agent"
-    }
+    def stage(name, fn, *args, **kwargs):
+        # Every stage is checkpointed in the session journal and timed as a trace span
+        loop_match = re.match(r"loop_(\d+)_", name)
+        with tracer.span(
+            name,
+            stage=name,
+            loop=int(loop_match.group(1)) if loop_match else None,
+            replayed=session_store.has(name, kwargs.get("key")),
+        ):
+            return session_store.run_stage(name, fn, *args, **kwargs)
 
     step_counter = 1  # Initialize step counter for output file numbering
+    streamed = set()  # Stages whose output file was written while streaming
 
-    # Read and log the original requirements file content
-    with open(initial_requirements_file_path, 'r') as f:
-        original_requirements_content = f.read()
-    log_agent_output(
-        "Original Requirements",
-        original_requirements_content,
-        step_counter,
-        filename=f"{step_counter:03d}_original_requirements.txt"
-    )
-    step_counter += 1
-
-    # Start the planning process and extract high-level requirements using the Reader Agent
-    response = start_planning_process(client, initial_context)
-
-    # Loop through agents to run the Reader Agent followed by Clarification Agent
-    while response.context_variables.get("next_agent"):
-        next_agent_name = response.context_variables["next_agent"]
-        if next_agent_name == "Reader Agent":
-            next_agent = reader_agent
-        elif next_agent_name == "Clarification Agent":
-            next_agent = clarification_agent
+    def answer_question(question, options):
+        # Earlier sessions' answers are offered as suggestions, or used directly when confident enough
+        suggestions = knowledge_base.suggest(question, options) if knowledge_base else []
+        if suggestions and auto_fill_threshold is not None and suggestions[0].confidence >= auto_fill_threshold:
+            echo(f"Answered from earlier sessions: {question} -> {suggestions[0].answer}")
+            logging.info(
+                f"Auto-filled '{question}' with '{suggestions[0].answer}' (confidence {suggestions[0].confidence:.2f})"
+            )
+            return suggestions[0].answer
+        if suggestions:
+            answer = answer_fn(question, options, suggestions=suggestions)
         else:
-            logging.error(f"Agent {next_agent_name} not found")
-            break
+            answer = answer_fn(question, options)
+        # Only answers someone gave are remembered, or defaults would outweigh them in later suggestions
+        if knowledge_base and not isinstance(answer, DefaultAnswer):
+            artifact_writer.submit(knowledge_base.record, session_id, question, options, answer)
+        return answer
+
+    def next_step():
+        nonlocal step_counter
+        step = step_counter
+        step_counter += 1
+        return step
+
+    # Read and log the original requirements file content
+    def read_original_requirements(requirements_file):
+        with open(requirements_file, 'r') as f:
+            return f.read()
+
+    def report_original_requirements(original_requirements):
+        step = next_step()
+        record_output("Original Requirements", original_requirements, step, f"{step:03d}_original_requirements.txt")
+
+    def report_high_level_requirements(high_level_requirements):
+        step = next_step()
+        record_output(agents.reader_agent.name, high_level_requirements, step, f"{step:03d}_high_level_requirements.txt")
 
+    def clarify(high_level_requirements):
+        # The loop checkpoints each question, answer and update itself, so its steps replay one by one
+        nonlocal step_counter
+        next_agent = agents.clarification_agent
+        next_agent_name = next_agent.name
         logging.info(f"Calling {next_agent_name}")
+        current_requirements = high_level_requirements
+        clarifications = []
+        clarification_context = ClarificationContext(token_budget=context_token_budget)
+        loop_count = 0
+        prefetcher = None
 
-        if next_agent_name == "Reader Agent":
-            # Call the Reader Agent to extract high-level requirements
-            log_agent_action(next_agent_name, "Reading requirements file")
-            response = client.run(
-                agent=next_agent,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"Please read the requirements from {response.context_variables['initial_requirements_file_path']} and extract high-level requirements."
-                    }
-                ],
-                context_variables=response.context_variables,
-            )
+        def update(requirements, clarified):
+            # Requirements added by the update get the next free ids; existing ones keep theirs
+            return assign_requirement_ids(update_requirements_content(client, requirements, clarified))
 
-            # Log and output the high-level requirements
-            log_agent_action(
-                next_agent_name,
-                "Extracted high-level requirements",
-                response.messages[-1]["content"]
-            )
-            log_agent_output(
-                next_agent_name,
-                response.messages[-1]["content"],
-                step_counter,
-                filename=f"{step_counter:03d}_high_level_requirements.txt"
+        if prefetch:
+            prefetcher = ClarificationPrefetcher(
+                update,
+                lambda requirements, context, loop: get_clarification_questions(
+                    client, next_agent, requirements, context, loop, structured=structured_questions
+                ),
+                current_requirements,
+                clarification_context,
             )
-            step_counter += 1
-
-            # Store high-level requirements in the context
-            response.context_variables['high_level_requirements'] = response.messages[-1]['content']
-            response.context_variables["next_agent"] = "Clarification Agent"
 
-        elif next_agent_name == "Clarification Agent":
-            # Call the Clarification Agent to clarify ambiguous requirements
-            current_requirements = response.context_variables['high_level_requirements']
-            clarifications = []
-            previously_asked_questions = set()
-            loop_count = 0
-            max_loops = 10
+        def already_answered(question):
+            # A repeated or rephrased question takes the earlier answer instead of being asked again
+            earlier = clarification_context.earlier_answer(question)
+            if earlier:
+                earlier_question, earlier_answer, similarity = earlier
+                echo(f"Already answered: {question} -> {earlier_answer}")
+                logging.info(
+                    f"Skipping question '{question}': repeats '{earlier_question}' (similarity {similarity:.2f})"
+                )
+            return earlier is not None
 
+        # Background updates and speculation must not outlive the loop, e.g. on Ctrl-C or a stage error
+        finished = False
+        try:
             while loop_count < max_loops:
                 loop_count += 1
 
-                # Generate new clarification questions
-                previous_clarifications = clarifications
-                clarification_content = get_clarification_questions(
-                    client, next_agent, current_requirements, previous_clarifications
-                )
-                log_agent_action(
-                    next_agent_name,
-                    "Identified clarification needs",
-                    clarification_content
-                )
-                print(f"\nClarification content:\n{clarification_content}\n")
-                logging.info(f"Clarification content: {clarification_content}")
-
-                # Output the clarification questions
-                log_agent_output(
-                    next_agent_name,
-                    clarification_content,
-                    step_counter,
-                    filename=f"{step_counter:03d}_clarification_loop_{loop_count}_questions.txt"
-                )
+                questions_stage = f"loop_{loop_count}_questions"
+                update_stage = f"loop_{loop_count}_update"
+                replaying_update = session_store.has(update_stage)
+                questions_step = step_counter
+                questions_file = f"{questions_step:03d}_clarification_loop_{loop_count}_questions.txt"
                 step_counter += 1
+                stream_questions = structured_questions and not prefetcher and not session_store.has(questions_stage)
+
+                if stream_questions:
+                    # Questions are asked as soon as each one has been received
+                    echo(f"\nClarification Loop {loop_count}")
+                    logging.info(f"Clarification Loop {loop_count} - streaming questions")
+                    # The stage's span lasts until the whole response was read, not until every answer
+                    question_stream = StructuredQuestionStream(
+                        client,
+                        next_agent,
+                        build_clarification_message(
+                            current_requirements, clarification_context, loop_count, structured=True
+                        ),
+                        span=questions_stage,
+                        span_attributes={"stage": questions_stage, "loop": loop_count},
+                    )
+                    candidate_questions = question_stream
+                else:
+                    # Generate new clarification questions
+                    if prefetcher:
+                        clarification_content = stage(questions_stage, prefetcher.next_questions, loop_count)
+                    else:
+                        clarification_content = stage(
+                            questions_stage,
+                            get_clarification_questions,
+                            client, next_agent, current_requirements, clarification_context, loop_count,
+                            structured=structured_questions,
+                        )
+                    log_agent_action(
+                        next_agent_name,
+                        "Identified clarification needs",
+                        clarification_content
+                    )
+                    echo(f"\nClarification content:\n{clarification_content}\n")
+                    logging.info(f"Clarification content: {clarification_content}")
+
+                    # Output the clarification questions
+                    record_output(
+                        next_agent_name,
+                        clarification_content,
+                        questions_step,
+                        questions_file,
+                    )
 
-                # Parse and handle questions
-                questions = parse_clarification_response(clarification_content)
-                print(f"Parsed questions: {questions}")
-                logging.info(f"Parsed questions: {questions}")
-
-                if not questions:
-                    print("No clarifications needed or unable to parse questions.")
-                    logging.warning("No clarifications needed or unable to parse questions.")
-                    break
-
-                # Eliminate duplicate questions and store unique ones
-                unique_questions = [
-                    (q, opts) for q, opts in questions if q not in previously_asked_questions
-                ]
-                previously_asked_questions.update(q for q, _ in unique_questions)
-
-                if not unique_questions:
-                    print("No new clarifications needed.")
-                    logging.info("No new clarifications needed.")
-                    break
-
-                num_questions = len(unique_questions)
-                print(f"\nClarification Loop {loop_count} - {num_questions} question(s)")
-                logging.info(f"Clarification Loop {loop_count} - {num_questions} question(s)")
+                    # Parse and handle questions
+                    if structured_questions:
+                        questions = parse_questions_with_repair(client, next_agent, clarification_content)
+                    else:
+                        questions = parse_clarification_response(clarification_content)
+                    echo(f"Parsed questions: {questions}")
+                    logging.info(f"Parsed questions: {questions}")
+
+                    if not questions:
+                        echo("No clarifications needed or unable to parse questions.")
+                        logging.warning("No clarifications needed or unable to parse questions.")
+                        break
+
+                    # Eliminate duplicate questions and store unique ones
+                    candidate_questions = [(q, opts) for q, opts in questions if not already_answered(q)]
+
+                    if not candidate_questions:
+                        echo("No new clarifications needed.")
+                        logging.info("No new clarifications needed.")
+                        break
+
+                    num_questions = len(candidate_questions)
+                    echo(f"\nClarification Loop {loop_count} - {num_questions} question(s)")
+                    logging.info(f"Clarification Loop {loop_count} - {num_questions} question(s)")
                 loop_clarifications = []
+                loop_records = []
 
                 # Ask user for clarification responses
-                for idx, (question, options) in enumerate(unique_questions, 1):
-                    user_clarification = ask_clarification_question(question, options)
+                next_questions_stage = f"loop_{loop_count + 1}_questions"
+                speculate = (
+                    prefetcher and not replaying_update and loop_count < max_loops
+                    and not session_store.has(next_questions_stage)
+                )
+                idx = 0
+                for position, (question, options) in enumerate(candidate_questions, 1):
+                    if speculate and position == len(candidate_questions):
+                        # The next round's questions are prepared while the user answers the last
+                        # question; speculative calls yield to calls someone is waiting for
+                        with tracer.span(next_questions_stage, kind="prefetch", stage=next_questions_stage, loop=loop_count + 1), \
+                                request_priority(PRIORITY_BULK):
+                            prefetcher.speculate(loop_count + 1, question)
+                    if already_answered(question):
+                        continue
+                    idx += 1
+                    # Keyed by the question, so a resumed loop whose questions changed asks them again
+                    # instead of matching the saved answers to them by position
+                    user_clarification = stage(
+                        f"loop_{loop_count}_answer_{idx}", answer_question, question, options, key=question
+                    )
                     loop_clarifications.append((question, user_clarification))
-                    clarifications.append((question, user_clarification))
+                    loop_records.append({
+                        "id": f"C{len(clarifications) + len(loop_records) + 1}",
+                        "loop": loop_count,
+                        "question": question,
+                        "options": list(options or []),
+                        "answer": user_clarification,
+                        "requirements": [],
+                    })
+                    clarification_context.add(question, user_clarification)
+                    if prefetcher and not replaying_update:
+                        # Background work is attributed to the stage that will consume it
+                        with tracer.span(update_stage, kind="prefetch", stage=update_stage, loop=loop_count):
+                            prefetcher.submit_answer(question, user_clarification)
+
+                if stream_questions:
+                    clarification_content = question_stream.content
+                    session_store.record(questions_stage, clarification_content)
+                    log_agent_action(next_agent_name, "Identified clarification needs", clarification_content)
+                    record_output(
+                        next_agent_name,
+                        clarification_content,
+                        questions_step,
+                        questions_file,
+                    )
+                    if not question_stream.questions:
+                        echo("No clarifications needed or unable to parse questions.")
+                        logging.warning("No clarifications needed or unable to parse questions.")
+                        break
+                    if not loop_clarifications:
+                        echo("No new clarifications needed.")
+                        logging.info("No new clarifications needed.")
+                        break
+                    logging.info(f"Clarification Loop {loop_count} - {len(loop_clarifications)} question(s)")
 
                 # Update requirements with clarified content
-                current_requirements = update_requirements_content(client, current_requirements, loop_clarifications)
-                response.context_variables['high_level_requirements'] = current_requirements
+                previous_requirements = current_requirements
+                if prefetcher and replaying_update:
+                    current_requirements = stage(update_stage, prefetcher.requirements)
+                    prefetcher.restore(current_requirements)
+                elif prefetcher:
+                    current_requirements = stage(update_stage, prefetcher.requirements)
+                else:
+                    current_requirements = stage(update_stage, update, current_requirements, loop_clarifications)
+
+                # Link the loop's answers to the requirements the update added or reworded
+                changed = changed_requirements(previous_requirements, current_requirements)
+                links = link_clarifications(changed, requirement_index(current_requirements), loop_clarifications)
+                for record, requirement_ids in zip(loop_records, links):
+                    record["requirements"] = requirement_ids
+                clarifications.extend(loop_records)
 
-                log_agent_output(
+                record_output(
                     next_agent_name,
                     current_requirements,
                     step_counter,
-                    filename=f"{step_counter:03d}_clarification_loop_{loop_count}_updated_high_level_requirements.md"
+                    f"{step_counter:03d}_clarification_loop_{loop_count}_updated_high_level_requirements.md",
                 )
                 step_counter += 1
 
@@ -322,66 +536,607 @@ def main():
 
                 # Prompt to continue with more clarifications
                 if loop_count < max_loops:
-                    continue_prompt = input("\nDo you want to continue with more clarifications? (yes/no): ").lower()
-                    if continue_prompt != 'yes':
+                    if not stage(f"loop_{loop_count}_continue", continue_fn):
                         break
-
-            # After the clarification loop ends
-            final_requirements = generate_final_requirements(
-                client, 
-                original_requirements_content, 
-                clarifications
+            finished = True
+        finally:
+            if prefetcher:
+                prefetcher.close(wait=finished)
+        if prefetcher:
+            logging.info(
+                f"Speculative questions used {prefetcher.speculation_hits} time(s), "
+                f"regenerated after a failure {prefetcher.speculation_failures} time(s)"
             )
 
-            # Output the final requirements
-            log_agent_output(
-                "Final Requirements",
-                final_requirements,
-                step_counter,
-                filename=f"{step_counter:03d}_final_detailed_requirements.txt"
-            )
-            step_counter += 1
-
-            # Save the final requirements to a new file
-            version = 1
-            while True:
-                new_requirements_file = f"requirements_v{version}.txt"
-                if not os.path.exists(new_requirements_file):
-                    break
-                version += 1
-
-            # with open(new_requirements_file, 'w') as f:
-            #     f.write(final_requirements)
-
-            print(f"Final detailed requirements saved to {new_requirements_file}")
-            logging.info(f"Final detailed requirements saved to {new_requirements_file}")
-
-            # Generate IEEE 830 compliant requirements document
-            ieee_830_requirements = generate_ieee_830_requirements(client, final_requirements)
-
-            # Output the IEEE 830 compliant requirements
-            log_agent_output(
-                "IEEE 830 Requirements",
-                ieee_830_requirements,
-                step_counter,
-                filename=f"{step_counter:03d}_requirements.txt"
+        # Every answer has already been folded into the current requirements, so they are the
+        # final requirements; rewriting them from the original text would only repeat that work
+        return current_requirements, clarifications
+
+    def report_final_requirements(final_requirements, clarifications):
+        step = next_step()
+        final_filename = f"{step:03d}_final_detailed_requirements.txt"
+        record_output("Final Requirements", final_requirements, step, final_filename)
+        final_requirements_file = os.path.join(output_dir, final_filename)
+        echo(f"Final detailed requirements saved to {final_requirements_file}")
+        logging.info(f"Final detailed requirements saved to {final_requirements_file}")
+
+    def generate_ieee_830(final_requirements, sectioned_ieee):
+        # Only called when the stage is not replayed, so streaming here reaches the console once
+        stream_path = None
+        if stream and not sectioned_ieee:
+            echo("\nIEEE 830 requirements:\n")
+            stream_path = os.path.join(output_dir, f"{step_counter:03d}_requirements.txt")
+            streamed.add("ieee_830_requirements")
+        return generate_ieee_830_requirements(
+            client, final_requirements, sectioned=sectioned_ieee, stream_path=stream_path, echo=echo
+        )
+
+    def report_ieee_830_requirements(ieee_830_requirements):
+        step = next_step()
+        # The file is already written when streamed
+        record_output(
+            "IEEE 830 Requirements",
+            ieee_830_requirements,
+            step,
+            f"{step:03d}_requirements.txt",
+            write_file="ieee_830_requirements" not in streamed,
+        )
+
+    def save_requirements_document(ieee_830_requirements):
+        # Save the IEEE 830 compliant requirements as the next version of requirements.md; a
+        # resumed session saving the same document gets its existing version back
+        base_file_path = os.path.join(artifact_dir, "requirements.md")
+        path, version = save_updated_requirements_file(
+            base_file_path, ieee_830_requirements, artifact_store, session_id
+        )
+        return {"run_id": session_id, "name": os.path.normpath(base_file_path), "version": version, "path": path}
+
+    def report_requirements_document(requirements_document):
+        echo(f"IEEE 830 compliant requirements saved to {requirements_document['path']}")
+        logging.info(f"IEEE 830 compliant requirements saved to {requirements_document['path']}")
+
+    def trace_requirements(final_requirements, clarifications, ieee_830_requirements, requirements_document):
+        return build_traceability(
+            session_id,
+            final_requirements,
+            clarifications,
+            ieee_830_requirements,
+            requirements_document,
+        )
+
+    def report_traceability(traceability):
+        step = next_step()
+        record_output("Traceability", json.dumps(traceability, indent=2), step, f"{step:03d}_traceability.json")
+        # Stored now rather than in the background, so the session can be amended as soon as it ends
+        save_traceability(artifact_store, traceability)
+        untraced = [r for r, entry in traceability["requirements"].items() if not entry["srs_sections"]]
+        if untraced:
+            logging.warning(f"Requirements not cited by the IEEE 830 document: {', '.join(untraced)}")
+
+    if chunked_extraction is None:
+        chunked_extraction = os.path.getsize(initial_requirements_file_path) > CHUNKED_EXTRACTION_THRESHOLD
+
+    pipeline = StageGraph([
+        Stage(
+            "original_requirements",
+            read_original_requirements,
+            inputs=("requirements_file",),
+            outputs=("original_requirements",),
+            report=report_original_requirements,
+        ),
+        Stage(
+            "high_level_requirements",
+            lambda original_requirements, requirements_file, chunked_extraction: assign_requirement_ids(
+                extract_high_level_requirements(
+                    client, original_requirements, requirements_file, chunked=chunked_extraction
+                )
+            ),
+            inputs=("original_requirements", "requirements_file", "chunked_extraction"),
+            outputs=("high_level_requirements",),
+            report=report_high_level_requirements,
+        ),
+        Stage(
+            "clarification",
+            clarify,
+            inputs=("high_level_requirements",),
+            outputs=("final_requirements", "clarifications"),
+            memoize=False,
+            report=report_final_requirements,
+        ),
+        Stage(
+            "ieee_830_requirements",
+            generate_ieee_830,
+            inputs=("final_requirements", "sectioned_ieee"),
+            outputs=("ieee_830_requirements",),
+            report=report_ieee_830_requirements,
+        ),
+        Stage(
+            "requirements_document",
+            save_requirements_document,
+            inputs=("ieee_830_requirements",),
+            outputs=("requirements_document",),
+            memoize=False,
+            report=report_requirements_document,
+        ),
+        Stage(
+            "traceability",
+            trace_requirements,
+            inputs=("final_requirements", "clarifications", "ieee_830_requirements", "requirements_document"),
+            outputs=("traceability",),
+            memoize=False,
+            report=report_traceability,
+        ),
+    ])
+    values = pipeline.run(
+        session_store,
+        requirements_file=initial_requirements_file_path,
+        chunked_extraction=chunked_extraction,
+        sectioned_ieee=sectioned_ieee,
+    )
+
+    # Output files are written in the background; make sure the session's are on disk
+    artifact_writer.flush()
+    from swarm.types import Response
+
+    return Response(
+        messages=[{"role": "assistant", "content": values["high_level_requirements"], "sender": agents.reader_agent.name}],
+        agent=agents.reader_agent,
+        context_variables={
+            "session_id": session_id,
+            "initial_requirements_file_path": initial_requirements_file_path,
+            "high_level_requirements": values["final_requirements"],
+            "next_agent": None,
+        },
+    )
+
+def add_client_arguments(parser):
+    """
+    Adds the rate limit and retry options of the model client to an argument parser.
+    """
+    group = parser.add_argument_group("model client")
+    group.add_argument("--requests-per-minute", type=int, default=500, help="Request rate limit (default: 500)")
+    group.add_argument("--tokens-per-minute", type=int, default=200000, help="Token rate limit (default: 200000)")
+    group.add_argument("--max-concurrency", type=int, default=16, help="Upper bound on concurrent model calls")
+    group.add_argument("--max-retries", type=int, default=5, help="Retries of rate-limited or failed calls")
+    group = parser.add_argument_group("model routing")
+    group.add_argument("--fast-model", default="gpt-4o-mini", help="Model of the fast tier (default: gpt-4o-mini)")
+    group.add_argument("--strong-model", default="gpt-4o", help="Model of the strong tier (default: gpt-4o)")
+    group.add_argument(
+        "--route",
+        action="append",
+        type=parse_route,
+        metavar="STAGE=TIER",
+        help="Send a stage (e.g. loop_N_update) or agent (e.g. 'Reader Agent') to the fast or strong tier; repeatable",
+    )
+    group.add_argument(
+        "--no-escalation",
+        action="store_true",
+        help="Keep fast-tier responses that fail validation instead of retrying them on the strong tier",
+    )
+    group.add_argument(
+        "--no-routing",
+        action="store_true",
+        help="Send every call to its agent's own model",
+    )
+
+def create_client(args):
+    """
+    Builds the model client every entry point uses: calls are routed to a model tier, traced,
+    served from the response cache when possible, and otherwise scheduled under the rate limits
+    before reaching Swarm.
+    """
+    # Swarm imports the OpenAI SDK, so it is only loaded by commands that call a model
+    from swarm import Swarm
+
+    scheduler = SchedulingClient(
+        Swarm(),
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        max_concurrency=args.max_concurrency,
+        max_retries=args.max_retries,
+    )
+    return RoutingClient(TracingClient(CachedClient(scheduler)), routing_policy(args))
+
+def find_wrapper(client, wrapper_type):
+    """
+    Returns the wrapper of the given type in a client stack built by `create_client`, or None.
+    """
+    while client is not None and not isinstance(client, wrapper_type):
+        client = getattr(client, "client", None)
+    return client
+
+def routing_policy(args):
+    """
+    Builds the model routing policy from the command line, or None with `--no-routing`.
+    """
+    if args.no_routing:
+        return None
+    return RoutingPolicy(
+        model_tiers({"fast": args.fast_model, "strong": args.strong_model}),
+        routes=dict(args.route or []),
+        escalate=not args.no_escalation,
+    )
+
+def write_run_report(trace_dir, run_id, client=None):
+    """
+    Exports the run's trace spans and summary, and prints the summary tables.
+
+    A resumed session's spans are added to the trace of its earlier attempts, and the summary
+    covers every attempt, so the calls of an interrupted attempt are not lost.
+
+    Args:
+        trace_dir (str): Directory receiving `<run_id>.jsonl` and `<run_id>_summary.json`.
+        run_id (str): Name of the run, usually the session id.
+        client (RoutingClient, optional): Adds latency and cost by model tier to the report.
+    """
+    summary_path = os.path.join(trace_dir, f"{run_id}_summary.json")
+    escalations = Counter()
+    if os.path.exists(summary_path):
+        with open(summary_path, 'r') as f:
+            escalations.update({row["tier"]: row["escalations"] for row in json.load(f).get("tiers", [])})
+    trace_path = tracer.export_jsonl(os.path.join(trace_dir, f"{run_id}.jsonl"), append=True)
+    spans = load_jsonl(trace_path)
+    summary = tracer.summary(spans)
+    if client is not None:
+        escalations.update(client.escalations)
+        summary["tiers"] = tier_report(spans, client.policy, escalations)
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"\n{tracer.format_summary(spans)}\n")
+    if client is not None:
+        print(f"{format_tier_report(summary['tiers'])}\n")
+    print(f"Trace written to {trace_path}")
+
+def amend_session(parser, args):
+    """
+    Asks which answers of a finished session to change and applies them as a new run.
+    """
+    artifact_store = ArtifactStore(args.artifact_store)
+    traceability = load_traceability(artifact_store, args.amend)
+    if traceability is None:
+        parser.error(f"No traceability index for session {args.amend} in {args.artifact_store}")
+    changes = choose_amendments(traceability["clarifications"])
+    if not changes:
+        print("No answers changed.")
+        return
+
+    run_id = f"{args.amend}_amend_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    artifact_store.start_run(run_id, amends=args.amend, changes=changes)
+    client = create_client(args)
+    try:
+        with tracer.span("session", kind="session", session=run_id):
+            traceability, path, regenerated = amend_requirements(
+                client, artifact_store, traceability, changes, run_id
             )
-            step_counter += 1
+    finally:
+        write_run_report(args.trace_dir, run_id, client)
 
-            # Save the IEEE 830 compliant requirements to a new file
-            ieee_830_file = f"requirements_v{version}.md"
-            with open(ieee_830_file, 'w') as f:
-                f.write(ieee_830_requirements)
+    # The new answers are what later sessions should be offered
+    knowledge_base = KnowledgeBase(args.knowledge_base)
+    for clarification in traceability["clarifications"]:
+        if clarification["id"] in changes:
+            knowledge_base.record(run_id, clarification["question"], clarification["options"], clarification["answer"])
 
-            print(f"IEEE 830 compliant requirements saved to {ieee_830_file}")
-            logging.info(f"IEEE 830 compliant requirements saved to {ieee_830_file}")
+    if regenerated is None:
+        print("The document had no numbered sections, so it was regenerated whole")
+    else:
+        print(f"Regenerated section(s): {', '.join(regenerated) or '(none)'}")
+    print(f"Amended IEEE 830 requirements saved to {path}")
+    logging.info(f"Amended session {args.amend} as run {run_id}: regenerated {regenerated}, saved {path}")
 
-            response.context_variables["next_agent"] = None
+def new_session_options(args):
+    # The options a new session is started with; a resumed session reads them from its journal
+    return {
+        "requirements_file": args.requirements_file,
+        "sectioned_ieee": args.sectioned_ieee,
+        "prefetch": args.prefetch,
+        "stream": args.stream,
+        "structured_questions": args.structured_questions,
+        "chunked_extraction": args.chunked,
+        "auto_fill_threshold": args.auto_fill_threshold,
+        "max_loops": args.max_loops,
+    }
+
+def describe_run(parser, args, answer_script=None):
+    """
+    Prints what a run with these arguments would do, without starting a session or calling a model.
+    """
+    if args.resume:
+        session_store = SessionStore(args.resume, session_dir=args.session_dir)
+        if not session_store.exists():
+            parser.error(f"No session {args.resume} found in {args.session_dir}")
+        options = session_store.metadata
+        session = f"resume {args.resume} ({len(session_store.results)} completed stage(s))"
+    else:
+        options = new_session_options(args)
+        session = "new"
+    requirements_file = options["requirements_file"]
+    if not os.path.isfile(requirements_file):
+        parser.error(f"Requirements file {requirements_file} not found")
+    size = os.path.getsize(requirements_file)
+
+    chunked = options.get("chunked_extraction")
+    if chunked is None:
+        chunked = size > CHUNKED_EXTRACTION_THRESHOLD
+    clarification = [f"up to {options.get('max_loops', 10)} loop(s)"]
+    if options.get("structured_questions"):
+        clarification.append("structured questions")
+    if options.get("prefetch"):
+        clarification.append("prefetch")
+    if answer_script is not None:
+        answers = (
+            f"{args.answers} ({len(answer_script)} scripted, "
+            f"unanswered questions: {args.unanswered})"
+        )
+    else:
+        answers = "asked in the terminal"
+    if options.get("auto_fill_threshold") is not None:
+        answers += f"; auto-filled from earlier sessions at confidence {options['auto_fill_threshold']}"
+
+    print("Dry run: no session is started and no model is called.")
+    print(f"Session:            {session}")
+    print(f"Requirements file:  {requirements_file} ({size} bytes)")
+    print(f"Extraction:         {'chunked map-reduce' if chunked else 'single call'}")
+    print(f"Clarification:      {', '.join(clarification)}")
+    print(f"Answers:            {answers}")
+    print(
+        f"IEEE 830 document:  {'concurrent sections' if options.get('sectioned_ieee') else 'one completion'}"
+        f"{', streamed' if options.get('stream') else ''}"
+    )
+    print(f"Outputs:            {os.path.join(args.output_dir, '<session_id>')}, {args.artifact_store}, {args.trace_dir}")
+
+    policy = routing_policy(args)
+    if policy is None:
+        print("Model routing:      off; every call uses its agent's own model")
+        return
+    print("Model routing (by stage, then by agent):")
+    for target, tier in list(policy.stage_tiers.items()) + list(policy.agent_tiers.items()):
+        print(f"  {target:<32} {tier:<8} {policy.tiers[tier].model}")
+    print(f"  Escalation on failed checks:     {'on' if policy.escalate else 'off'}")
+
+def inspect_artifacts(parser, args):
+    """
+    Prints runs, artifacts or a session's answers from the artifact store.
+    """
+    if not os.path.exists(args.artifact_store):
+        parser.error(f"No artifact store at {args.artifact_store}")
+    artifact_store = ArtifactStore(args.artifact_store)
+
+    if args.list_runs:
+        for run_id, created, metadata in artifact_store.runs():
+            source = f"amends {metadata['amends']}" if "amends" in metadata else metadata.get("requirements_file", "")
+            started = datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{run_id:<40} {started}  {len(artifact_store.run_artifacts(run_id)):>3} artifact(s)  {source}")
+    elif args.show_run:
+        artifacts = artifact_store.run_artifacts(args.show_run)
+        if not artifacts:
+            parser.error(f"No artifacts for run {args.show_run}")
+        for name, version, size in artifacts:
+            print(f"{name} v{version} ({size} bytes)")
+    elif args.show_artifact:
+        run_id, artifact = args.show_artifact
+        name, _, version = artifact.rpartition("@")
+        if not name or not version.isdigit():
+            name, version = artifact, None
+        content = artifact_store.get(run_id, name, int(version) if version else None)
+        if content is None:
+            parser.error(f"Run {run_id} has no artifact {artifact}")
+        print(content, end="" if content.endswith("\n") else "\n")
+    elif args.export_answers:
+        traceability = load_traceability(artifact_store, args.export_answers)
+        if traceability is None:
+            parser.error(f"No traceability index for session {args.export_answers} in {args.artifact_store}")
+        for line in answer_lines(traceability["clarifications"]):
+            print(line)
+
+def main():
+    """
+    Main function to orchestrate the reading, extraction, and clarification of requirements.
+    Sets up logging, runs the Reader and Clarification Agents, and outputs results.
+    """
+    parser = argparse.ArgumentParser(description="Clarify a requirements file into an IEEE 830 specification.")
+    parser.add_argument(
+        "requirements_file",
+        nargs="?",
+        default="requirements.txt",
+        help="Initial requirements file (default: requirements.txt)",
+    )
+    parser.add_argument(
+        "--sectioned-ieee",
+        action="store_true",
+        help="Generate the IEEE 830 document as concurrent sections instead of one long completion",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Update requirements and prepare the next questions in the background while you answer",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the IEEE 830 document to the console and output file as it is generated",
+    )
+    parser.add_argument(
+        "--structured-questions",
+        action="store_true",
+        help="Request clarification questions as JSON and ask each one as soon as it arrives",
+    )
+    parser.add_argument(
+        "--chunked",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help=f"Extract requirements chunk by chunk in parallel (default: for files over {CHUNKED_EXTRACTION_THRESHOLD} bytes)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="SESSION",
+        help="Resume an interrupted session, skipping every stage it already completed",
+    )
+    parser.add_argument(
+        "--amend",
+        metavar="SESSION",
+        help="Change answers of a finished session and regenerate only the IEEE 830 sections they affect",
+    )
+    parser.add_argument("--max-loops", type=int, default=10, help="Maximum clarification loops (default: 10)")
+    parser.add_argument(
+        "--answers",
+        metavar="FILE",
+        help="Answer questions from a JSONL script of {\"question\", \"answer\"} objects instead of the terminal",
+    )
+    parser.add_argument(
+        "--unanswered",
+        choices=UNANSWERED_POLICIES,
+        default="default",
+        help="With --answers, answer other questions with their first option, ask in the terminal, or stop (default: default)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print what the run would do, including the model of each stage, and exit without calling a model",
+    )
+    inspection = parser.add_argument_group("artifact inspection")
+    inspection = inspection.add_mutually_exclusive_group()
+    inspection.add_argument("--list-runs", action="store_true", help="List the runs in the artifact store")
+    inspection.add_argument("--show-run", metavar="RUN", help="List the artifacts a run stored")
+    inspection.add_argument(
+        "--show-artifact",
+        nargs=2,
+        metavar=("RUN", "NAME[@VERSION]"),
+        help="Print a run's artifact, by default its latest version",
+    )
+    inspection.add_argument(
+        "--export-answers",
+        metavar="SESSION",
+        help="Print a finished session's answers as an answer script for --answers",
+    )
+    parser.add_argument("--session-dir", default="sessions", help="Directory holding session journals")
+    parser.add_argument("--trace-dir", default="traces", help="Directory receiving the run's trace and summary")
+    parser.add_argument("--output-dir", default="agent_outputs", help="Directory receiving one output directory per run")
+    parser.add_argument(
+        "--keep-runs",
+        type=int,
+        default=10,
+        help="Number of earlier run output directories kept; older ones remain in the artifact store",
+    )
+    parser.add_argument(
+        "--artifact-store",
+        default=os.path.join("artifacts", "artifacts.db"),
+        help="SQLite database holding the versioned history of every run's outputs",
+    )
+    parser.add_argument(
+        "--knowledge-base",
+        default=os.path.join("artifacts", "knowledge.db"),
+        help="SQLite database of earlier sessions' answers, offered as suggestions",
+    )
+    parser.add_argument(
+        "--auto-fill-threshold",
+        type=float,
+        help="Answer a question from earlier sessions without asking when the suggestion's confidence reaches this value (0-1)",
+    )
+    parser.add_argument(
+        "--log-payload-chars",
+        type=int,
+        default=2000,
+        help="Truncate longer log messages; full outputs stay in agent_outputs (0 disables truncation)",
+    )
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    # Commands that only read files return before logging is set up or a model client is built
+    if args.list_runs or args.show_run or args.show_artifact or args.export_answers:
+        inspect_artifacts(parser, args)
+        return
+
+    answer_script = None
+    if args.answers:
+        try:
+            answer_script = AnswerScript(load_answers(args.answers), unanswered=args.unanswered)
+        except (OSError, ValueError) as error:
+            parser.error(f"Cannot read the answer script: {error}")
+
+    if args.dry_run:
+        describe_run(parser, args, answer_script)
+        return
+
+    log_filename = setup_logging(max_payload_chars=args.log_payload_chars)
+
+    if args.amend:
+        amend_session(parser, args)
+        return
+
+    if args.resume:
+        session_store = SessionStore(args.resume, session_dir=args.session_dir)
+        if not session_store.exists():
+            parser.error(f"No session {args.resume} found in {args.session_dir}")
+        options = session_store.metadata
+        print(f"Resuming session {args.resume} ({len(session_store.results)} completed stage(s))")
+    else:
+        if not os.path.isfile(args.requirements_file):
+            parser.error(f"Requirements file {args.requirements_file} not found")
+        session_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        session_store = SessionStore(session_id, session_dir=args.session_dir)
+        options = new_session_options(args)
+        session_store.start(**options)
+        prune_agent_outputs(args.output_dir, keep=args.keep_runs)
+        print(f"Session {session_id} (resume with --resume {session_id})")
+
+    client = create_client(args)
+    artifact_store = ArtifactStore(args.artifact_store)
+    artifact_store.start_run(session_store.session_id, **options)
+    knowledge_base = KnowledgeBase(args.knowledge_base)
+    answer_fn, continue_fn = ask_clarification_question, confirm_continue
+    if answer_script is not None:
+        answer_fn, continue_fn = answer_script.answer_fn, answer_script.continue_fn
+
+    try:
+        with tracer.span("session", kind="session", session=session_store.session_id):
+            response = run_session(
+                client,
+                options["requirements_file"],
+                session_id=session_store.session_id,
+                output_dir=os.path.join(args.output_dir, session_store.session_id),
+                sectioned_ieee=options["sectioned_ieee"],
+                prefetch=options["prefetch"],
+                session_store=session_store,
+                answer_fn=answer_fn,
+                continue_fn=continue_fn,
+                max_loops=options.get("max_loops", 10),
+                stream=options.get("stream", False),
+                structured_questions=options.get("structured_questions", False),
+                artifact_store=artifact_store,
+                chunked_extraction=options.get("chunked_extraction"),
+                knowledge_base=knowledge_base,
+                auto_fill_threshold=options.get("auto_fill_threshold"),
+            )
+    except UnansweredQuestion as error:
+        print(f"{error}\nAdd it to {args.answers} and resume with --resume {session_store.session_id}")
+        logging.error(str(error))
+        raise SystemExit(1)
+    finally:
+        write_run_report(args.trace_dir, session_store.session_id, client)
+
+    if answer_script is not None:
+        print(f"Answer script: {answer_script.scripted} scripted answer(s), {answer_script.unscripted} unscripted")
 
     # Output final response from the agent
     if response.messages:
         print(response.messages[-1]["content"])
         logging.info(f"Final response: {response.messages[-1]['content']}")
 
+    cache_stats = find_wrapper(client, CachedClient).stats()
+    print(f"Cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es), {cache_stats['entries']} entries")
+    logging.info(f"Cache stats: {cache_stats}")
+
+    store_stats = artifact_store.stats()
+    print(
+        f"Artifact store: {store_stats['artifacts']} artifact version(s), "
+        f"{store_stats['logical_bytes']} bytes stored in {store_stats['stored_bytes']}"
+    )
+    logging.info(f"Artifact store stats: {store_stats}")
+
+    knowledge_stats = knowledge_base.stats()
+    print(f"Knowledge base: {knowledge_stats['answers']} answer(s) from {knowledge_stats['sessions']} session(s)")
+    logging.info(f"Knowledge base stats: {knowledge_stats}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+from collections import namedtuple
+from tracing import tracer
+
+# One step of the pipeline. `fn` is called with the values named in `inputs` as keyword arguments
+# and returns the value named in `outputs` (or a tuple of them, in order). `report`, if set, is
+# called with the outputs every time the stage completes, whether it ran or was replayed.
+Stage = namedtuple("Stage", ["name", "fn", "inputs", "outputs", "memoize", "report"], defaults=(True, None))
+
+def input_key(stage, inputs):
+    """
+    Fingerprints a stage's inputs, so a recorded result is only reused for the same inputs.
+    """
+    payload = json.dumps({"stage": stage.name, "inputs": inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class StageGraph:
+    """
+    Pipeline stated as stages that declare the values they read and the values they produce.
+
+    The graph is checked when it is built: every value has exactly one producing stage, so no work
+    is done twice, and stages run in dependency order. A memoized stage is checkpointed in the
+    session journal together with a fingerprint of its inputs; running the graph again replays it
+    while its inputs are unchanged and runs it again when they change. Stages that checkpoint
+    their own steps, such as the interactive clarification loop, are not memoized.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"{output} is produced by both {self.producers[output]} and {stage.name}")
+                self.producers[output] = stage.name
+
+    def order(self, available=()):
+        """
+        Returns the stages in an order where each runs after the stages producing its inputs.
+
+        Args:
+            available (iterable): Names of the values supplied before any stage runs.
+        """
+        known = set(available)
+        pending = list(self.stages)
+        ordered = []
+        while pending:
+            ready = [stage for stage in pending if all(name in known for name in stage.inputs)]
+            if not ready:
+                missing = sorted({
+                    name for stage in pending for name in stage.inputs
+                    if name not in known and name not in self.producers
+                })
+                if missing:
+                    raise ValueError(f"No stage produces {', '.join(missing)}")
+                raise ValueError(f"Stages {', '.join(stage.name for stage in pending)} depend on each other")
+            for stage in ready:
+                ordered.append(stage)
+                known.update(stage.outputs)
+                pending.remove(stage)
+        return ordered
+
+    def run_stage(self, stage, inputs, session_store):
+        key = input_key(stage, inputs) if stage.memoize else None
+        replayed = stage.memoize and session_store.has(stage.name, key)
+        with tracer.span(stage.name, stage=stage.name, replayed=replayed):
+            if stage.memoize:
+                result = session_store.run_stage(stage.name, stage.fn, key=key, **inputs)
+            else:
+                result = stage.fn(**inputs)
+        if len(stage.outputs) == 1:
+            outputs = {stage.outputs[0]: result}
+        else:
+            outputs = dict(zip(stage.outputs, result))
+        if stage.report:
+            stage.report(**outputs)
+        return outputs
+
+    def run(self, session_store, **values):
+        """
+        Runs every stage and returns all values, supplied and produced.
+
+        Args:
+            session_store (SessionStore): Journal in which memoized stages are checkpointed.
+            **values: The values no stage produces, such as the input file and options.
+
+        Returns:
+            dict: The values by name.
+        """
+        for stage in self.order(values):
+            inputs = {name: values[name] for name in stage.inputs}
+            values.update(self.run_stage(stage, inputs, session_store))
+        logging.info(f"Pipeline finished: {', '.join(stage.name for stage in self.stages)}")
+        return values
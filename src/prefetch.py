@@ -0,0 +1,129 @@
+import copy
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from tracing import start_thread_in_context, submit_in_context
+
+class ClarificationPrefetcher:
+    """
+    Overlaps the clarification loop's LLM work with the time the user spends answering.
+
+    Answers are folded into the requirements on a background thread as soon as they arrive;
+    answers given while an update is running are folded in together by the next one, so quick
+    answers cost one update call rather than one each. The next round's questions are generated
+    speculatively while the user answers the round's last question and decides whether to
+    continue. They are based on every earlier answer, and the question being answered is listed
+    as settled in their clarification context so it is not asked again. They are thrown away
+    only if the user stops, and regenerated only if the speculative call failed.
+    """
+
+    def __init__(self, update_fn, question_fn, requirements, clarification_context):
+        """
+        Args:
+            update_fn (callable): `(requirements, clarifications) -> requirements`.
+            question_fn (callable): `(requirements, clarification_context, loop_number) -> str`.
+            requirements (str): The requirements before the first answer.
+            clarification_context (ClarificationContext): The loop's context; read, never modified.
+        """
+        self.update_fn = update_fn
+        self.question_fn = question_fn
+        self.clarification_context = clarification_context
+        # Updates build on each other, so they run one at a time in arrival order
+        self._update_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-update")
+        self._requirements = requirements
+        self._unapplied = []  # answers not folded in yet: waiting for an update, or whose update failed
+        self._lock = threading.Lock()
+        self._latest_update = Future()
+        self._latest_update.set_result(requirements)
+        self._speculation = None  # (loop number, future)
+        self.speculation_hits = 0
+        self.speculation_failures = 0
+
+    def _apply(self):
+        # Takes every answer submitted so far; an update queued behind this one may find none left
+        with self._lock:
+            pending, self._unapplied = self._unapplied, []
+        if not pending:
+            return self._requirements
+        try:
+            self._requirements = self.update_fn(self._requirements, pending)
+        except Exception:
+            with self._lock:
+                self._unapplied = pending + self._unapplied
+            raise
+        return self._requirements
+
+    def submit_answer(self, question, answer):
+        """
+        Starts folding an answer into the requirements in the background.
+        """
+        with self._lock:
+            self._unapplied.append((question, answer))
+        self._latest_update = submit_in_context(self._update_executor, self._apply)
+
+    def requirements(self):
+        """
+        Returns the requirements with every submitted answer applied, waiting if necessary.
+        """
+        return self._latest_update.result()
+
+    def restore(self, requirements):
+        """
+        Adopts requirements recovered from a checkpoint in place of applying the answers again.
+        """
+        self.requirements()
+        self._requirements = requirements
+        self._latest_update = Future()
+        self._latest_update.set_result(requirements)
+
+    def speculate(self, loop_number, pending_question=None):
+        """
+        Starts generating the questions for `loop_number` from the answers given so far.
+
+        Args:
+            loop_number (int): The round the questions are for.
+            pending_question (str, optional): A question the user is answering meanwhile.
+        """
+        update = self._latest_update
+        context_snapshot = copy.deepcopy(self.clarification_context)
+        if pending_question:
+            context_snapshot.add(pending_question, "(being answered)")
+        future = Future()
+
+        def generate():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self.question_fn(update.result(), context_snapshot, loop_number))
+            except BaseException as error:
+                future.set_exception(error)
+
+        start_thread_in_context("prefetch-questions", generate)
+        self._speculation = (loop_number, future)
+        logging.info(f"Speculatively generating clarification questions for loop {loop_number}")
+
+    def next_questions(self, loop_number):
+        """
+        Returns the questions for `loop_number`, reusing the speculative result when there is one.
+        """
+        if self._speculation and self._speculation[0] == loop_number:
+            _, future = self._speculation
+            self._speculation = None
+            try:
+                result = future.result()
+                self.speculation_hits += 1
+                logging.info(f"Using speculative clarification questions for loop {loop_number}")
+                return result
+            except Exception:
+                self.speculation_failures += 1
+                logging.exception("Speculative clarification questions failed; regenerating")
+        return self.question_fn(self.requirements(), self.clarification_context, loop_number)
+
+    def close(self, wait=True):
+        """
+        Stops the background work; with `wait` False, pending updates are cancelled instead of applied.
+        """
+        if self._speculation:
+            self._speculation[1].cancel()
+            self._speculation = None
+        self._update_executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,89 @@
+import math
+from collections import Counter
+from text_terms import content_terms, words
+
+def normalize_question(question):
+    """
+    Normalizes a question for exact-match lookups (case, punctuation and spacing).
+    """
+    return " ".join(words(question))
+
+def smoothed_idf(documents, document_frequency):
+    # Smoothed so a term found in every document still counts a little
+    return math.log((1 + documents) / (1 + document_frequency)) + 1
+
+def cosine_similarity(terms, other_terms, idf):
+    """
+    Cosine similarity of two term-count vectors weighted by `idf` (term -> weight).
+    """
+    vector = {term: count * idf[term] for term, count in terms.items()}
+    other = {term: count * idf[term] for term, count in other_terms.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    other_norm = math.sqrt(sum(weight * weight for weight in other.values()))
+    if not norm or not other_norm:
+        return 0.0
+    return sum(weight * other.get(term, 0.0) for term, weight in vector.items()) / (norm * other_norm)
+
+class QuestionIndex:
+    """
+    Local TF-IDF index over answered questions for finding rephrasings of them.
+
+    A question is compared only with the answered questions that share a term with it, found
+    through an inverted index, and matches one when the cosine similarity of their TF-IDF vectors
+    reaches `threshold`. Rare terms such as the feature a question is about outweigh the words
+    every question shares, so "Which DBMS will the system use?" matches "What database should be
+    used?" but "Which users can access search?" does not match "Which users can access reports?".
+    """
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.entries = []  # (question, answer, term counts)
+        self.exact = {}  # normalized question -> entry position
+        self.postings = {}  # term -> positions of the entries containing it
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, question, answer):
+        position = len(self.entries)
+        terms = Counter(content_terms(question))
+        self.entries.append((question, answer, terms))
+        self.exact[normalize_question(question)] = position
+        for term in terms:
+            self.postings.setdefault(term, []).append(position)
+
+    def _idf(self, term):
+        return smoothed_idf(len(self.entries), len(self.postings.get(term, ())))
+
+    def match(self, question):
+        """
+        Finds the answered question that `question` repeats, exactly or rephrased.
+
+        Returns:
+            tuple: `(question, answer, similarity)` of the best match, or None if no answered
+            question is similar enough.
+        """
+        position = self.exact.get(normalize_question(question))
+        if position is not None:
+            earlier_question, answer, _ = self.entries[position]
+            return earlier_question, answer, 1.0
+
+        terms = Counter(content_terms(question))
+        candidates = {position for term in terms for position in self.postings.get(term, ())}
+        if not candidates:
+            return None
+
+        idf = {}
+        for position in candidates:
+            for term in self.entries[position][2]:
+                idf.setdefault(term, self._idf(term))
+        for term in terms:
+            idf.setdefault(term, self._idf(term))
+
+        best = None
+        for position in sorted(candidates):
+            earlier_question, answer, entry_terms = self.entries[position]
+            similarity = cosine_similarity(terms, entry_terms, idf)
+            if similarity >= self.threshold and (best is None or similarity > best[2]):
+                best = (earlier_question, answer, similarity)
+        return best
@@ -0,0 +1,241 @@
+import logging
+import threading
+from collections import Counter, namedtuple
+from chunking import BULLET_RE
+from clarification import parse_clarification_response
+from structured_questions import parse_structured_questions
+from traceability import REQUIREMENT_ID_RE
+from tracing import LOOP_NUMBER_RE, current_span
+
+# A class of model the router can send a call to; costs are USD per million tokens, None if unknown
+ModelTier = namedtuple("ModelTier", ["name", "model", "input_cost", "output_cost"])
+
+# List prices used to estimate the cost of a run, USD per million prompt and completion tokens
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Tiers from cheapest to strongest; a call escalates one tier at a time
+TIER_ORDER = ("fast", "strong")
+
+DEFAULT_TIER_MODELS = {"fast": "gpt-4o-mini", "strong": "gpt-4o"}
+
+# Stage (loop numbers folded to N) -> tier. Extraction, merging and question generation are
+# mechanical enough for the fast tier; the specification is written by the strong one.
+DEFAULT_STAGE_TIERS = {
+    "high_level_requirements": "fast",
+    "loop_N_questions": "fast",
+    "loop_N_update": "fast",
+    "ieee_830_requirements": "strong",
+}
+
+# Agent -> tier, for calls made outside the stages above (e.g. `--amend`)
+DEFAULT_AGENT_TIERS = {
+    "Reader Agent": "fast",
+    "Clarification Agent": "fast",
+    "IEEE 830 Requirements Writer": "strong",
+}
+
+def lists_requirements(messages, content):
+    # An extraction must produce at least one requirement bullet
+    return any(BULLET_RE.match(line) for line in content.split("\n"))
+
+def parses_as_questions(messages, content):
+    # Questions must be in the line-based or JSON format, unless the agent asked none
+    if "No further clarification needed" in content or parse_clarification_response(content):
+        return True
+    try:
+        parse_structured_questions(content)
+    except ValueError:
+        return False
+    return True
+
+def keeps_requirement_ids(messages, content):
+    # A merge must keep every requirement of the text it was given
+    expected = set(REQUIREMENT_ID_RE.findall(messages[-1]["content"]))
+    return bool(content.strip()) and expected <= set(REQUIREMENT_ID_RE.findall(content))
+
+# Stage -> check of a response; a response failing it is requested again from the next tier
+STAGE_VALIDATORS = {
+    "high_level_requirements": lists_requirements,
+    "loop_N_questions": parses_as_questions,
+    "loop_N_update": keeps_requirement_ids,
+}
+
+def model_tiers(models=None):
+    """
+    Builds the tiers from tier name -> model, with costs from `MODEL_PRICES`.
+    """
+    models = {**DEFAULT_TIER_MODELS, **(models or {})}
+    return {
+        name: ModelTier(name, models[name], *MODEL_PRICES.get(models[name], (None, None)))
+        for name in TIER_ORDER
+    }
+
+def parse_route(route):
+    """
+    Parses a `STAGE=TIER` or `AGENT=TIER` override as given on the command line.
+
+    Returns:
+        tuple: The stage or agent name and the tier name.
+    """
+    target, separator, tier = route.rpartition("=")
+    if not separator or not target.strip() or tier.strip() not in TIER_ORDER:
+        raise ValueError(f"Invalid route {route!r}: expected STAGE=TIER or AGENT=TIER with TIER one of {', '.join(TIER_ORDER)}")
+    return target.strip(), tier.strip()
+
+class RoutingPolicy:
+    """
+    Chooses the model tier of each call from the stage it belongs to, or else from its agent.
+
+    Args:
+        tiers (dict): Tier name -> `ModelTier`.
+        routes (dict, optional): Stage or agent name -> tier name, overriding the defaults.
+        escalate (bool): Request a response that fails its stage's check again from the next tier.
+    """
+
+    def __init__(self, tiers=None, routes=None, escalate=True):
+        self.tiers = tiers or model_tiers()
+        self.stage_tiers = dict(DEFAULT_STAGE_TIERS)
+        self.agent_tiers = dict(DEFAULT_AGENT_TIERS)
+        for target, tier in (routes or {}).items():
+            if target in self.agent_tiers:
+                self.agent_tiers[target] = tier
+            else:
+                self.stage_tiers[LOOP_NUMBER_RE.sub("N", target)] = tier
+        self.escalate = escalate
+
+    def tier_for(self, agent_name, stage):
+        name = self.stage_tiers.get(stage) or self.agent_tiers.get(agent_name)
+        return self.tiers.get(name) if name else None
+
+    def next_tier(self, tier):
+        position = TIER_ORDER.index(tier.name)
+        if not self.escalate or position + 1 >= len(TIER_ORDER):
+            return None
+        return self.tiers[TIER_ORDER[position + 1]]
+
+    def validator(self, stage):
+        return STAGE_VALIDATORS.get(stage)
+
+    def tier_of_model(self, model):
+        for tier in self.tiers.values():
+            if tier.model == model:
+                return tier
+        return None
+
+def current_stage():
+    span = current_span.get()
+    stage = span["attributes"].get("stage") if span else None
+    return LOOP_NUMBER_RE.sub("N", stage) if stage else None
+
+class RoutingClient:
+    """
+    Wraps a Swarm client and sends each call to the model of the tier its policy chooses.
+
+    A call made with an explicit `model_override` is passed through unchanged. When a response
+    from a cheaper tier fails its stage's check, such as questions that do not parse or a merge
+    that dropped requirements, it is requested again from the next tier up. Streamed calls are
+    not checked. Without a policy every call goes to its agent's own model.
+    """
+
+    def __init__(self, client, policy=None):
+        self.client = client
+        self.policy = policy
+        self.escalations = Counter()  # tier -> responses that failed their check
+        self._lock = threading.Lock()
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        stage = current_stage()
+        tier = None
+        if self.policy and not model_override:
+            tier = self.policy.tier_for(agent.name, stage)
+        validate = self.policy.validator(stage) if tier and not stream else None
+        while True:
+            response = self.client.run(
+                agent=agent,
+                messages=messages,
+                context_variables=context_variables,
+                model_override=tier.model if tier else model_override,
+                stream=stream,
+                **kwargs,
+            )
+            if validate is None or validate(messages, response.messages[-1].get("content") or ""):
+                return response
+            next_tier = self.policy.next_tier(tier)
+            with self._lock:
+                self.escalations[tier.name] += 1
+            if next_tier is None:
+                logging.warning(f"{agent.name} response for {stage} failed its check on the {tier.name} tier; keeping it")
+                return response
+            logging.warning(
+                f"{agent.name} response for {stage} failed its check on {tier.model}; escalating to {next_tier.model}"
+            )
+            tier = next_tier
+
+def tier_report(spans, policy=None, escalations=None):
+    """
+    Aggregates call spans by model tier: calls, latency, tokens and estimated cost.
+
+    Cache hits are counted but cost nothing. Calls to a model outside the policy's tiers are
+    reported under the model's name.
+
+    Args:
+        spans (list): Finished tracer spans.
+        policy (RoutingPolicy, optional): Maps models to tiers and prices.
+        escalations (Counter, optional): Tier -> responses that failed their check.
+
+    Returns:
+        list: One row per tier or model, cheapest tier first.
+    """
+    rows = {}
+    for span in spans:
+        if span["kind"] != "call":
+            continue
+        attributes = span["attributes"]
+        model = attributes.get("model") or "default"
+        tier = policy.tier_of_model(model) if policy else None
+        name = tier.name if tier else model
+        row = rows.setdefault(name, {
+            "tier": name, "model": model, "calls": 0, "cache_hits": 0, "escalations": 0, "seconds": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+            "cost": 0.0 if tier and tier.input_cost is not None else None,
+        })
+        row["calls"] += 1
+        row["seconds"] += span["duration"]
+        row["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+        row["completion_tokens"] += attributes.get("completion_tokens", 0)
+        if attributes.get("cache") == "hit":
+            row["cache_hits"] += 1
+        elif row["cost"] is not None:
+            row["cost"] += (
+                attributes.get("prompt_tokens", 0) * tier.input_cost
+                + attributes.get("completion_tokens", 0) * tier.output_cost
+            ) / 1_000_000
+    for name, count in (escalations or {}).items():
+        if name in rows:
+            rows[name]["escalations"] = count
+    order = {name: position for position, name in enumerate(TIER_ORDER)}
+    return sorted(rows.values(), key=lambda row: (order.get(row["tier"], len(order)), row["tier"]))
+
+def format_tier_report(rows):
+    """
+    Renders `tier_report()` as a plain-text table.
+    """
+    lines = [
+        f"{'Tier':<12} {'Model':<16} {'Calls':>5} {'Hits':>4} {'Escal.':>6} {'Seconds':>9} {'Avg s':>6} "
+        f"{'Prompt tok':>10} {'Compl. tok':>10} {'Cost $':>8}"
+    ]
+    for row in rows:
+        average = row["seconds"] / row["calls"] if row["calls"] else 0.0
+        cost = f"{row['cost']:.4f}" if row["cost"] is not None else "-"
+        lines.append(
+            f"{row['tier'][:12]:<12} {row['model'][:16]:<16} {row['calls']:>5} {row['cache_hits']:>4} "
+            f"{row['escalations']:>6} {row['seconds']:>9.2f} {average:>6.2f} "
+            f"{row['prompt_tokens']:>10} {row['completion_tokens']:>10} {cost:>8}"
+        )
+    return "\n".join(lines)
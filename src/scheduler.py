@@ -0,0 +1,277 @@
+import contextvars
+import heapq
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from tracing import annotate, count_message_tokens, increment, start_thread_in_context
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Priority of the calls made by the current thread (or copied context); lower runs first
+current_priority = contextvars.ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+# Errors worth retrying, recognised by class name so the scheduler does not depend on the openai package
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "Timeout",
+    "TimeoutError",
+    "ConnectionError",
+}
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+@contextmanager
+def request_priority(priority):
+    """
+    Runs the enclosed block's model calls at `priority`, e.g. `PRIORITY_BULK` for batch work.
+    """
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+def error_status(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def is_retryable(error):
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return error_status(error) in RETRYABLE_STATUS_CODES
+
+def retry_after(error):
+    # Seconds the provider asked us to wait, if it said so
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute up to a burst of one minute's worth.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Returns how long to wait until `amount` units are available (0 if they are now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.available) / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+class SchedulingClient:
+    """
+    Wraps a Swarm client with rate limiting, retries and prioritized, adaptive concurrency.
+
+    Every call waits for a request and its estimated tokens from per-minute token buckets and for
+    a free concurrency slot; waiting calls are admitted by priority, then arrival. The concurrency
+    cap grows by one slot per cap's worth of successes and is cut multiplicatively on retryable
+    errors or when a stream's first chunk takes well above its moving average (AIMD). A call's
+    total latency mostly follows the length of its response, so only the wait for the first
+    chunk, which grows as the provider queues requests, is taken as a sign of load. Retryable errors
+    (rate limits, timeouts, 5xx) are retried with jittered exponential backoff. A streamed call
+    is started at once and read into a queue on its own thread, so its slot is held only while
+    the model generates, however slowly the caller consumes the chunks.
+    """
+
+    def __init__(
+        self,
+        client,
+        requests_per_minute=500,
+        tokens_per_minute=200000,
+        max_concurrency=16,
+        min_concurrency=1,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=60.0,
+        completion_token_estimate=1024,
+        latency_tolerance=2.0,
+    ):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_token_estimate = completion_token_estimate
+        self.latency_tolerance = latency_tolerance
+        self.retries = 0
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._first_chunk_average = None
+        self._waiting = []  # heap of (priority, arrival) tickets
+        self._arrivals = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency_limit(self):
+        return max(self.min_concurrency, int(self._limit))
+
+    def _acquire(self, tokens):
+        ticket = (current_priority.get(), next(self._arrivals))
+        queued_at = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self._in_flight < self.concurrency_limit:
+                        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                        if wait <= 0:
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._in_flight += 1
+            self._condition.notify_all()
+        annotate(queue_seconds=time.monotonic() - queued_at)
+        return time.monotonic()
+
+    def _release(self, error=None, first_chunk_latency=None):
+        with self._condition:
+            self._in_flight -= 1
+            if error is not None and is_retryable(error):
+                self._limit = max(self.min_concurrency, self._limit * 0.5)
+            elif error is None:
+                average = self._first_chunk_average
+                if first_chunk_latency is not None and average is not None and first_chunk_latency > average * self.latency_tolerance:
+                    self._limit = max(self.min_concurrency, self._limit * 0.7)
+                else:
+                    self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+                if first_chunk_latency is not None:
+                    self._first_chunk_average = (
+                        first_chunk_latency if average is None else 0.8 * average + 0.2 * first_chunk_latency
+                    )
+            self._condition.notify_all()
+
+    def _backoff(self, error, attempt, agent_name):
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        delay = retry_after(error)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        with self._condition:
+            self.retries += 1
+        increment("retries")
+        logging.warning(
+            f"{agent_name} call failed with {type(error).__name__} (attempt {attempt + 1}); retrying in {delay:.1f}s"
+        )
+        time.sleep(delay)
+        return True
+
+    def _drain(self, run_kwargs, tokens, agent_name, chunks):
+        # Reads the upstream stream inside its slot, so the slot is released when the model
+        # finishes, not when the consumer has read every chunk
+        for attempt in itertools.count():
+            started = self._acquire(tokens)
+            first_chunk_latency = None
+            try:
+                for chunk in self.client.run(stream=True, **run_kwargs):
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.monotonic() - started
+                    chunks.put(("chunk", chunk))
+            except Exception as error:
+                self._release(error)
+                # A stream can only be retried before any of it was received
+                if first_chunk_latency is not None or not self._backoff(error, attempt, agent_name):
+                    chunks.put(("error", error))
+                    return
+                continue
+            except BaseException as error:
+                self._release()
+                chunks.put(("error", error))
+                return
+            self._release(first_chunk_latency=first_chunk_latency)
+            chunks.put(("done", None))
+            return
+
+    def _stream(self, run_kwargs, tokens, agent_name):
+        chunks = queue.Queue()
+        start_thread_in_context("scheduled-stream", self._drain, run_kwargs, tokens, agent_name, chunks)
+
+        def consume():
+            while True:
+                kind, item = chunks.get()
+                if kind == "error":
+                    raise item
+                if kind == "done":
+                    return
+                yield item
+
+        return consume()
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        """
+        Runs the agent through the wrapped client once a slot and rate budget are available,
+        retrying transient failures.
+        """
+        tokens = count_message_tokens(agent, messages) + self.completion_token_estimate
+        run_kwargs = dict(
+            agent=agent,
+            messages=messages,
+            context_variables=context_variables or {},
+            model_override=model_override,
+            **kwargs,
+        )
+        if stream:
+            return self._stream(run_kwargs, tokens, agent.name)
+
+        for attempt in itertools.count():
+            self._acquire(tokens)
+            try:
+                response = self.client.run(**run_kwargs)
+            except Exception as error:
+                self._release(error)
+                if not self._backoff(error, attempt, agent.name):
+                    raise
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._release()
+            return response
+
+    def stats(self):
+        with self._condition:
+            return {
+                "concurrency_limit": self.concurrency_limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "retries": self.retries,
+            }
@@ -0,0 +1,108 @@
+import re
+from collections import namedtuple
+from text_terms import content_terms
+
+# A document section: a stable id, its heading line ("" for the preamble) and its body text
+Section = namedtuple("Section", ["id", "heading", "body"])
+
+HEADING_RE = re.compile(r"^(#{1,6}\s+\S.*|\*\*[^*]+\*\*:?)\s*$")
+
+ADDITIONAL_SECTION_ID = "additional-requirements"
+ADDITIONAL_SECTION_HEADING = "## Additional Requirements"
+
+def heading_title(heading):
+    """
+    Strips markdown markers and leading numbering from a heading line.
+    """
+    title = heading.strip().lstrip("#").strip().strip("*").rstrip(":").strip()
+    return re.sub(r"^\d+(\.\d+)*\.?\s+", "", title)
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "section"
+
+def parse_sections(content):
+    """
+    Splits a markdown document into sections at its heading lines.
+
+    Section ids are derived from the heading text, so they stay stable across revisions as long
+    as the headings do. Text before the first heading becomes the `preamble` section.
+
+    Args:
+        content (str): The document text.
+
+    Returns:
+        list: The document's sections, in order.
+    """
+    sections = []
+    seen_ids = {}
+    heading = ""
+    section_id = "preamble"
+    body_lines = []
+
+    def flush():
+        if heading or any(line.strip() for line in body_lines):
+            sections.append(Section(section_id, heading, "\n".join(body_lines).strip("\n")))
+
+    in_code_block = False
+    for line in content.split("\n"):
+        if line.strip().startswith("```"):
+            in_code_block = not in_code_block
+        if not in_code_block and HEADING_RE.match(line):
+            flush()
+            heading = line.rstrip()
+            base_id = slugify(heading_title(heading))
+            seen_ids[base_id] = seen_ids.get(base_id, 0) + 1
+            section_id = base_id if seen_ids[base_id] == 1 else f"{base_id}-{seen_ids[base_id]}"
+            body_lines = []
+        else:
+            body_lines.append(line)
+    flush()
+    return sections
+
+def stitch_sections(sections):
+    """
+    Reassembles sections into a single document.
+    """
+    parts = []
+    for section in sections:
+        parts.append("\n".join(part for part in (section.heading, section.body) if part))
+    return "\n\n".join(parts).strip() + "\n"
+
+def route_clarifications(sections, clarifications, threshold=0.2, max_sections=2):
+    """
+    Assigns each clarification to the sections it most likely touches.
+
+    Clarifications are scored against every section by term overlap, with heading terms weighted
+    above body terms. Those that match no section well enough are routed to
+    `ADDITIONAL_SECTION_ID`.
+
+    Args:
+        sections (list): The parsed document sections.
+        clarifications (list): `(question, answer)` tuples.
+        threshold (float): Minimum score for a section to be considered touched.
+        max_sections (int): Maximum number of sections a single clarification is routed to.
+
+    Returns:
+        dict: Section id -> list of clarifications routed to it.
+    """
+    section_terms = [
+        (section.id, set(content_terms(heading_title(section.heading))), set(content_terms(section.body)))
+        for section in sections
+        if section.id != "preamble" or len(sections) == 1
+    ]
+    routes = {}
+    for question, answer in clarifications:
+        query = set(content_terms(f"{question} {answer}"))
+        scored = []
+        for section_id, heading_terms, body_terms in section_terms:
+            if not query:
+                break
+            overlap = 3 * len(query & heading_terms) + len(query & body_terms)
+            score = overlap / len(query)
+            if score >= threshold:
+                scored.append((score, section_id))
+        scored.sort(reverse=True)
+        targets = [section_id for _, section_id in scored[:max_sections]] or [ADDITIONAL_SECTION_ID]
+        for section_id in targets:
+            routes.setdefault(section_id, []).append((question, answer))
+    return routes
@@ -0,0 +1,448 @@
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+from artifact_store import ArtifactStore
+from clarification import CONTINUE_QUESTION, parse_yes_no
+from knowledge_base import KnowledgeBase
+from main import add_client_arguments, create_client, run_session
+from session_store import SessionStore
+from tracing import tracer
+from utils import (
+    setup_logging,
+    add_session_log,
+    remove_session_log,
+    current_session_id,
+)
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Session options a client may set when creating a session, with their defaults
+SESSION_OPTIONS = {
+    "max_loops": 10,
+    "sectioned_ieee": False,
+    "prefetch": False,
+    "structured_questions": False,
+}
+
+HTTP_REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class ServiceSession:
+    """
+    A clarification session driven over HTTP instead of `input()`.
+
+    The pipeline runs on its own thread; its `answer_fn` and `continue_fn` publish a pending
+    question and block until a client submits the answer or `answer_timeout` expires.
+    """
+
+    def __init__(self, session_id, session_dir, requirements_file, options, answer_timeout=3600):
+        self.session_id = session_id
+        self.session_dir = session_dir
+        self.requirements_file = requirements_file
+        self.options = options
+        self.answer_timeout = answer_timeout
+        self.status = "queued"
+        self.error = None
+        self.answered = 0
+        self.finished_at = None  # monotonic time the session completed or failed
+        self._pending = {}  # question id -> question
+        self._answers = {}  # question id -> queue receiving its answer
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def ask(self, question, options=None, kind="clarification", suggestions=None):
+        question_id = next(self._ids)
+        answers = queue.Queue(maxsize=1)
+        with self._lock:
+            self._pending[question_id] = {
+                "id": question_id,
+                "kind": kind,
+                "question": question,
+                "options": list(options or []),
+                "suggestions": [
+                    {"answer": s.answer, "confidence": round(s.confidence, 3), "sessions": s.sessions}
+                    for s in suggestions or []
+                ],
+            }
+            self._answers[question_id] = answers
+            self.status = "waiting"
+        try:
+            return answers.get(timeout=self.answer_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No answer to question {question_id} within {self.answer_timeout}s")
+        finally:
+            with self._lock:
+                self._pending.pop(question_id, None)
+                self._answers.pop(question_id, None)
+                if self.status == "waiting" and not self._pending:
+                    self.status = "running"
+
+    def answer_fn(self, question, options=None, suggestions=None):
+        return self.ask(question, options, suggestions=suggestions)
+
+    def continue_fn(self):
+        answer = self.ask(CONTINUE_QUESTION, ["yes", "no"], kind="continue")
+        return parse_yes_no(answer) is True
+
+    def pending_questions(self):
+        with self._lock:
+            return list(self._pending.values())
+
+    def submit(self, question_id, answer=None, option=None):
+        """
+        Answers a pending question with free text or the 1-based number of one of its options.
+        """
+        with self._lock:
+            question = self._pending.pop(question_id, None)
+            if question is None:
+                raise HTTPError(409, f"Question {question_id} is not pending")
+            if option is not None:
+                if isinstance(option, bool) or not isinstance(option, int) or not 1 <= option <= len(question["options"]):
+                    self._pending[question_id] = question
+                    raise HTTPError(400, f"Option must be between 1 and {len(question['options'])}")
+                answer = question["options"][option - 1]
+            if not isinstance(answer, str) or not answer.strip():
+                self._pending[question_id] = question
+                raise HTTPError(400, "Each answer needs a non-empty 'answer' or an 'option' number")
+            self.answered += 1
+            self._answers[question_id].put_nowait(answer.strip())
+
+    def describe(self):
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "status": self.status,
+                "error": self.error,
+                "pending_questions": len(self._pending),
+                "answered": self.answered,
+                "options": self.options,
+            }
+
+class ClarificationService:
+    """
+    Serves many concurrent clarification sessions from one process.
+
+    Every session runs the normal pipeline on a worker thread, in a fresh context so its session
+    id, trace spans and log routing never leak into another session. All sessions share one
+    model client, and therefore its connection pool and response cache, plus one artifact store
+    and one knowledge base, so an answer given in one session is suggested in the next. A
+    finished session stays available for `session_ttl` seconds and is then forgotten; its outputs
+    remain on disk and in the artifact store. A session nobody answers fails after
+    `answer_timeout`, so abandoned sessions are forgotten too.
+    """
+
+    def __init__(
+        self,
+        client,
+        output_root="service_outputs",
+        max_sessions=256,
+        answer_timeout=3600,
+        artifact_store=None,
+        knowledge_base=None,
+        auto_fill_threshold=None,
+        session_ttl=3600,
+    ):
+        self.client = client
+        self.output_root = output_root
+        self.answer_timeout = answer_timeout
+        self.session_ttl = session_ttl
+        self.artifact_store = artifact_store or ArtifactStore(os.path.join(output_root, "artifacts.db"))
+        self.knowledge_base = knowledge_base or KnowledgeBase(os.path.join(output_root, "knowledge.db"))
+        self.auto_fill_threshold = auto_fill_threshold
+        self.sessions = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="session")
+
+    def evict_finished_sessions(self):
+        """
+        Forgets the sessions that finished more than `session_ttl` seconds ago.
+        """
+        cutoff = time.monotonic() - self.session_ttl
+        expired = [
+            session_id for session_id, session in list(self.sessions.items())
+            if session.finished_at is not None and session.finished_at <= cutoff
+        ]
+        for session_id in expired:
+            self.sessions.pop(session_id, None)
+        if expired:
+            logging.info(f"Evicted {len(expired)} finished service session(s)")
+        return expired
+
+    def create_session(self, requirements, options):
+        self.evict_finished_sessions()
+        session_id = uuid.uuid4().hex[:12]
+        session_dir = os.path.join(self.output_root, session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        requirements_file = os.path.join(session_dir, "requirements.txt")
+        with open(requirements_file, 'w') as f:
+            f.write(requirements)
+
+        session = ServiceSession(session_id, session_dir, requirements_file, options, self.answer_timeout)
+        self.sessions[session_id] = session
+        self.artifact_store.start_run(session_id, service=True, **options)
+        # A fresh context per session: nothing from the event loop's context is inherited
+        self._executor.submit(contextvars.Context().run, self._run_session, session)
+        logging.info(f"Service session {session_id} created")
+        return session
+
+    def _run_session(self, session):
+        current_session_id.set(session.session_id)
+        handler = add_session_log(session.session_id, os.path.join(session.session_dir, "session.log"))
+        session.status = "running"
+        try:
+            with tracer.span("session", kind="session", session=session.session_id):
+                run_session(
+                    self.client,
+                    session.requirements_file,
+                    session_id=session.session_id,
+                    output_dir=os.path.join(session.session_dir, "agent_outputs"),
+                    artifact_dir=session.session_dir,
+                    answer_fn=session.answer_fn,
+                    continue_fn=session.continue_fn,
+                    session_store=SessionStore(session.session_id, session_dir=session.session_dir),
+                    artifact_store=self.artifact_store,
+                    knowledge_base=self.knowledge_base,
+                    auto_fill_threshold=self.auto_fill_threshold,
+                    echo=lambda *args, **kwargs: None,
+                    **session.options,
+                )
+            session.status = "completed"
+        except Exception as error:
+            session.status = "failed"
+            session.error = str(error)
+            logging.exception(f"Service session {session.session_id} failed")
+        finally:
+            tracer.export_jsonl(
+                os.path.join(session.session_dir, "trace.jsonl"), tracer.pop_session(session.session_id)
+            )
+            remove_session_log(handler)
+            session.finished_at = time.monotonic()
+
+    def _session(self, session_id):
+        self.evict_finished_sessions()
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"No session {session_id}")
+        return session
+
+    async def create(self, body, query):
+        requirements = body.get("requirements")
+        if not isinstance(requirements, str) or not requirements.strip():
+            raise HTTPError(400, "'requirements' must be the text of the initial requirements")
+        options = dict(SESSION_OPTIONS)
+        for name, default in SESSION_OPTIONS.items():
+            if name in body:
+                if type(body[name]) is not type(default):
+                    raise HTTPError(400, f"'{name}' must be of type {type(default).__name__}")
+                options[name] = body[name]
+        session = self.create_session(requirements, options)
+        return 201, session.describe()
+
+    async def status(self, body, query, session_id):
+        return 200, self._session(session_id).describe()
+
+    async def questions(self, body, query, session_id):
+        """
+        Returns the pending questions; `?wait=N` long-polls up to N seconds for one to arrive.
+        """
+        session = self._session(session_id)
+        try:
+            wait = min(float(query.get("wait", ["0"])[0]), 60.0)
+        except ValueError:
+            raise HTTPError(400, "'wait' must be a number of seconds")
+        deadline = asyncio.get_running_loop().time() + wait
+        while (
+            not session.pending_questions()
+            and session.status not in ("completed", "failed")
+            and asyncio.get_running_loop().time() < deadline
+        ):
+            await asyncio.sleep(0.1)
+        return 200, {"status": session.status, "questions": session.pending_questions()}
+
+    async def answers(self, body, query, session_id):
+        session = self._session(session_id)
+        answers = body.get("answers")
+        if not isinstance(answers, list) or not answers:
+            raise HTTPError(400, "'answers' must be a non-empty list of {id, answer | option}")
+        for item in answers:
+            if not isinstance(item, dict) or isinstance(item.get("id"), bool) or not isinstance(item.get("id"), int):
+                raise HTTPError(400, "Each answer needs the integer 'id' of its question")
+            session.submit(item["id"], answer=item.get("answer"), option=item.get("option"))
+        return 200, {"accepted": len(answers), "status": session.status}
+
+    async def artifacts(self, body, query, session_id):
+        self._session(session_id)
+        rows = await asyncio.to_thread(self.artifact_store.run_artifacts, session_id)
+        return 200, {
+            "artifacts": [{"name": name, "version": version, "size": size} for name, version, size in rows]
+        }
+
+    async def artifact(self, body, query, session_id, name):
+        self._session(session_id)
+        content = await asyncio.to_thread(self.artifact_store.get, session_id, name)
+        if content is None:
+            raise HTTPError(404, f"Session {session_id} has no artifact {name}")
+        return 200, content
+
+    ROUTES = [
+        ("POST", re.compile(r"^/sessions$"), "create"),
+        ("GET", re.compile(r"^/sessions/(?P<session_id>[^/]+)$"), "status"),
+        ("GET", re.compile(r"^/sessions/(?P<session_id>[^/]+)/questions$"), "questions"),
+        ("POST", re.compile(r"^/sessions/(?P<session_id>[^/]+)/answers$"), "answers"),
+        ("GET", re.compile(r"^/sessions/(?P<session_id>[^/]+)/artifacts$"), "artifacts"),
+        ("GET", re.compile(r"^/sessions/(?P<session_id>[^/]+)/artifacts/(?P<name>.+)$"), "artifact"),
+    ]
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = unquote(url.path)
+        allowed = False
+        for route_method, pattern, handler_name in self.ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            payload = {}
+            if body:
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    raise HTTPError(400, "The request body must be JSON")
+                if not isinstance(payload, dict):
+                    raise HTTPError(400, "The request body must be a JSON object")
+            return await getattr(self, handler_name)(payload, parse_qs(url.query), **match.groupdict())
+        if allowed:
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        raise HTTPError(404, f"No route for {path}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            status, payload = await self._handle_request(reader)
+        except HTTPError as error:
+            status, payload = error.status, {"error": error.message}
+        except Exception:
+            logging.exception("Unhandled error while serving a request")
+            status, payload = 500, {"error": "Internal server error"}
+
+        if isinstance(payload, str):
+            content_type, data = "text/plain; charset=utf-8", payload.encode("utf-8")
+        else:
+            content_type, data = "application/json", json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"The request body exceeds {MAX_BODY_BYTES} bytes")
+        try:
+            body = (await reader.readexactly(length)).decode("utf-8") if length else ""
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, "The request body is shorter than its Content-Length")
+        except UnicodeDecodeError:
+            raise HTTPError(400, "The request body must be UTF-8")
+        return await self.dispatch(method.upper(), target, body)
+
+async def serve(service, host="127.0.0.1", port=8080):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"Serving ClarifyLoop sessions on {addresses}")
+    logging.info(f"Service listening on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """
+    Runs ClarifyLoop as an HTTP service hosting many concurrent clarification sessions.
+    """
+    parser = argparse.ArgumentParser(description="Serve ClarifyLoop sessions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--output-dir", default="service_outputs", help="Directory for per-session outputs")
+    parser.add_argument("--max-sessions", type=int, default=256, help="Sessions running at the same time")
+    parser.add_argument(
+        "--answer-timeout", type=float, default=3600, help="Seconds a session waits for an answer before failing"
+    )
+    parser.add_argument(
+        "--session-ttl", type=float, default=3600, help="Seconds a finished session stays available before it is forgotten"
+    )
+    parser.add_argument(
+        "--auto-fill-threshold",
+        type=float,
+        help="Answer a question from earlier sessions without asking when the suggestion's confidence reaches this value (0-1)",
+    )
+    add_client_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    # One client for every session: the underlying HTTP connection pool and response cache are shared
+    client = create_client(args)
+    service = ClarificationService(
+        client,
+        output_root=args.output_dir,
+        max_sessions=args.max_sessions,
+        answer_timeout=args.answer_timeout,
+        auto_fill_threshold=args.auto_fill_threshold,
+        session_ttl=args.session_ttl,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
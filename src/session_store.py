@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import threading
+import time
+
+class SessionStore:
+    """
+    Append-only journal of a session's completed stages.
+
+    Every stage result is written to `<session_dir>/<session_id>.jsonl` as soon as the stage
+    finishes. Re-running a session against the same journal replays recorded results instead
+    of calling the model or asking the user again, so an interrupted session resumes where it
+    stopped. With `session_dir=None` the journal is kept in memory only.
+    """
+
+    def __init__(self, session_id, session_dir="sessions"):
+        self.session_id = session_id
+        self.path = os.path.join(session_dir, f"{session_id}.jsonl") if session_dir else None
+        self.metadata = {}
+        self.results = {}
+        self.keys = {}
+        self.replayed = 0
+        self._lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half-written; everything before it is intact
+                    logging.warning(f"Ignoring unreadable line {line_number} of {self.path}")
+                    continue
+                if record.get("type") == "session":
+                    self.metadata.update(record["metadata"])
+                else:
+                    self.results[record["stage"]] = record["result"]
+                    self.keys[record["stage"]] = record.get("key")
+        logging.info(f"Loaded session {self.session_id} with {len(self.results)} completed stage(s)")
+
+    def _append(self, record):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def exists(self):
+        return bool(self.metadata or self.results)
+
+    def start(self, **metadata):
+        """
+        Records the session's inputs and options so it can be resumed later.
+        """
+        with self._lock:
+            self.metadata.update(metadata)
+            self._append({"type": "session", "time": time.time(), "metadata": metadata})
+
+    def has(self, stage, key=None):
+        # With a key, only a result recorded under the same key counts
+        return stage in self.results and (key is None or self.keys.get(stage) == key)
+
+    def get(self, stage, default=None):
+        return self.results.get(stage, default)
+
+    def record(self, stage, result, key=None):
+        with self._lock:
+            self.results[stage] = result
+            self.keys[stage] = key
+            record = {"type": "stage", "stage": stage, "time": time.time(), "result": result}
+            if key is not None:
+                record["key"] = key
+            self._append(record)
+
+    def run_stage(self, stage, fn, *args, serialize=None, deserialize=None, key=None, **kwargs):
+        """
+        Runs a stage once per session, replaying its recorded result on later runs.
+
+        Args:
+            stage (str): Unique name of the stage within the session.
+            fn (callable): Produces the stage result from `*args` and `**kwargs`.
+            serialize (callable, optional): Converts the result to a JSON-serializable value.
+            deserialize (callable, optional): Rebuilds the result from its recorded value.
+            key (str, optional): Fingerprint of the stage's inputs. A result recorded under a
+                different key is stale: the stage runs again and its new result replaces it.
+
+        Returns:
+            The stage result, recorded or freshly computed.
+        """
+        if self.has(stage, key):
+            self.replayed += 1
+            logging.info(f"Session {self.session_id}: replaying completed stage {stage}")
+            value = self.results[stage]
+            return deserialize(value) if deserialize else value
+
+        if stage in self.results:
+            logging.info(f"Session {self.session_id}: inputs of stage {stage} changed; running it again")
+        result = fn(*args, **kwargs)
+        self.record(stage, serialize(result) if serialize else result, key=key)
+        return result
@@ -0,0 +1,73 @@
+import logging
+import os
+import time
+
+def stream_agent_output(client, agent, messages, file_path, echo=print, buffer_chars=2048, stage=None):
+    """
+    Runs an agent with streaming enabled, writing its output to a file and the console as it arrives.
+
+    At most `buffer_chars` characters are held before being flushed to `file_path`, so the file
+    fills in while the completion is still being generated.
+
+    Args:
+        client (Swarm): The swarm client to execute the agent.
+        agent (Agent): The agent to run.
+        messages (list): The messages to send.
+        file_path (str): The output file the completion is streamed into.
+        echo (callable): Receives each content delta; pass a no-op to stream to the file only.
+        buffer_chars (int): Number of buffered characters that triggers a write to the file.
+        stage (str, optional): Stage name used when logging the stream metrics.
+
+    Returns:
+        tuple: The completed content and a dict with `time_to_first_token`, `tokens`,
+            `tokens_per_second` and `total_seconds`.
+    """
+    stage = stage or agent.name
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+
+    start = time.perf_counter()
+    first_token_at = None
+    token_count = 0
+    buffer = []
+    buffered_chars = 0
+    final_response = None
+
+    with open(file_path, 'w') as f:
+        for chunk in client.run(agent=agent, messages=messages, stream=True):
+            if "response" in chunk:
+                final_response = chunk["response"]
+                continue
+            content = chunk.get("content")
+            if not content:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            token_count += 1  # each streamed delta carries roughly one token
+            echo(content, end="", flush=True)
+            buffer.append(content)
+            buffered_chars += len(content)
+            if buffered_chars >= buffer_chars:
+                f.write("".join(buffer))
+                f.flush()
+                buffer = []
+                buffered_chars = 0
+        f.write("".join(buffer))
+    echo("")
+
+    end = time.perf_counter()
+    time_to_first_token = (first_token_at or end) - start
+    generation_seconds = end - (first_token_at or end)
+    metrics = {
+        "time_to_first_token": time_to_first_token,
+        "tokens": token_count,
+        "tokens_per_second": token_count / generation_seconds if generation_seconds > 0 else 0.0,
+        "total_seconds": end - start,
+    }
+    logging.info(
+        f"{stage} streamed to {file_path}: first token after {time_to_first_token:.2f}s, "
+        f"{token_count} tokens at {metrics['tokens_per_second']:.1f} tokens/sec"
+    )
+
+    if final_response is None:
+        raise RuntimeError(f"{stage} stream ended without a final response")
+    return final_response.messages[-1]["content"], metrics
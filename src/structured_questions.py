@@ -0,0 +1,235 @@
+import json
+import logging
+import queue
+import re
+from contextlib import nullcontext
+from clarification import parse_clarification_response
+from tracing import start_thread_in_context, tracer
+
+STRUCTURED_FORMAT_INSTRUCTIONS = """Please identify all ambiguous or vague requirements that need clarification.
+Provide clear questions and possible options for clarification for each one.
+Respond with a single JSON object and nothing else, following this schema:
+
+{"questions": [{"question": "[Your question here]", "options": ["[Option 1]", "[Option 2]", "[Option 3]"]}]}
+
+If no further clarification is needed, respond with {"questions": []}.
+Do not wrap the JSON in code fences and do not include any other text."""
+
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+class IncrementalQuestionParser:
+    """
+    Extracts question objects from a JSON response while it is still being received.
+
+    Text is fed in arbitrary chunks; every `{"question": ..., "options": [...]}` object that is
+    an element of an array is returned as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._position = 0
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, text):
+        """
+        Consumes the next chunk of the response.
+
+        Args:
+            text (str): The chunk.
+
+        Returns:
+            list: `(question, options)` tuples completed by this chunk.
+        """
+        completed = []
+        for char in text:
+            self._buffer.append(char)
+            index = self._position
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._stack and self._stack[-1] == "[" and self._item_start is None:
+                    self._item_start = index
+                self._stack.append(char)
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._item_start is not None and self._stack and self._stack[-1] == "[":
+                    item = question_from_object("".join(self._buffer[self._item_start:index + 1]))
+                    self._item_start = None
+                    if item:
+                        completed.append(item)
+        return completed
+
+def question_from_object(text):
+    try:
+        item = json.loads(TRAILING_COMMA_RE.sub(r"\1", text))
+    except ValueError:
+        return None
+    if not isinstance(item, dict) or not str(item.get("question", "")).strip():
+        return None
+    options = [str(option).strip() for option in item.get("options") or [] if str(option).strip()]
+    return str(item["question"]).strip(), options
+
+def parse_structured_questions(content):
+    """
+    Parses a complete structured response, repairing common formatting slips.
+
+    Code fences, text around the JSON and trailing commas are tolerated.
+
+    Args:
+        content (str): The Clarification Agent's response.
+
+    Returns:
+        list: `(question, options)` tuples.
+
+    Raises:
+        ValueError: If no JSON questions can be recovered from the response.
+    """
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON found in the clarification response")
+    text = text[min(starts):]
+    text = text[:max(text.rfind("}"), text.rfind("]")) + 1]
+    text = TRAILING_COMMA_RE.sub(r"\1", text)
+
+    data = json.loads(text)
+    items = data.get("questions") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("The clarification response has no questions list")
+    questions = []
+    for item in items:
+        question = question_from_object(json.dumps(item))
+        if question:
+            questions.append(question)
+    return questions
+
+def repair_structured_questions(client, agent, content):
+    """
+    Asks the agent to restate a malformed response as valid JSON, instead of discarding the loop.
+    """
+    prompt = f"""The following clarification questions were supposed to be a single JSON object of the form
+{{"questions": [{{"question": "...", "options": ["..."]}}]}} but could not be parsed.
+Return the same questions and options as valid JSON in exactly that form, with no other text.
+
+{content}"""
+    response = client.run(
+        agent=agent,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return parse_structured_questions(response.messages[-1]["content"])
+
+def parse_questions_with_repair(client, agent, content):
+    """
+    Parses a structured response, falling back to a repair call and then to the line-based parser.
+
+    Returns:
+        list: `(question, options)` tuples; empty if nothing could be recovered.
+    """
+    try:
+        return parse_structured_questions(content)
+    except ValueError as error:
+        logging.warning(f"Malformed structured clarification response ({error}); asking the agent to repair it")
+    try:
+        return repair_structured_questions(client, agent, content)
+    except ValueError as error:
+        logging.warning(f"Repaired clarification response is still malformed ({error}); using the line parser")
+    return parse_clarification_response(content)
+
+def questions_to_content(questions):
+    return json.dumps({"questions": [{"question": q, "options": opts} for q, opts in questions]}, indent=2)
+
+class StructuredQuestionStream:
+    """
+    Streams the Clarification Agent's JSON response and yields each question as soon as it is complete.
+
+    The request is sent when the stream is created and read to the end on a background thread,
+    which queues each question as it completes, so the call, its connection and its scheduler
+    slot are released as soon as the model finishes, however long the user takes to answer.
+    With `span`, a trace span of that name times the request until the whole response was read.
+    After iteration, `content` holds the response to record for the loop: the raw reply when it
+    parsed cleanly, or the recovered questions re-encoded as JSON when it needed repair.
+    """
+
+    def __init__(self, client, agent, message, span=None, span_attributes=None):
+        self.client = client
+        self.agent = agent
+        self.message = message
+        self.content = None
+        self.questions = []
+        self._items = queue.Queue()  # ("question", (question, options)), then ("done", content) or ("error", error)
+        start_thread_in_context("question-stream", self._read, span, span_attributes or {})
+
+    def _read(self, span, span_attributes):
+        try:
+            with tracer.span(span, **span_attributes) if span else nullcontext():
+                content = self._receive()
+        except BaseException as error:
+            self._items.put(("error", error))
+            return
+        self._items.put(("done", content))
+
+    def _receive(self):
+        chunks = self.client.run(
+            agent=self.agent,
+            messages=[{"role": "user", "content": self.message}],
+            stream=True,
+        )
+        parser = IncrementalQuestionParser()
+        parts = []
+        content = None
+        for chunk in chunks:
+            if "response" in chunk:
+                content = chunk["response"].messages[-1]["content"]
+                continue
+            delta = chunk.get("content")
+            if not delta:
+                continue
+            parts.append(delta)
+            for question in parser.feed(delta):
+                self._items.put(("question", question))
+        return content if content is not None else "".join(parts)
+
+    def __iter__(self):
+        while True:
+            kind, item = self._items.get()
+            if kind == "error":
+                raise item
+            if kind == "done":
+                content = item
+                break
+            self.questions.append(item)
+            yield item
+
+        # Validate the complete reply; recover anything the incremental parser could not emit
+        try:
+            all_questions = parse_structured_questions(content)
+            self.content = content
+        except ValueError:
+            if self.questions:
+                logging.warning("Structured clarification response ended malformed; keeping the questions already received")
+                all_questions = []
+            else:
+                all_questions = parse_questions_with_repair(self.client, self.agent, content)
+            self.content = None
+
+        emitted = {question for question, _ in self.questions}
+        for question, options in all_questions:
+            if question not in emitted:
+                self.questions.append((question, options))
+                yield question, options
+        if self.content is None:
+            self.content = questions_to_content(self.questions)
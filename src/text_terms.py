@@ -0,0 +1,53 @@
+import re
+
+# Words that appear in text about any topic and so do not tell two questions, requirements or
+# sections apart
+STOPWORDS = {
+    "a", "able", "an", "and", "any", "app", "application", "are", "be", "by", "can", "could", "do",
+    "does", "for", "from", "has", "have", "how", "in", "is", "it", "kind", "may", "must", "need",
+    "of", "on", "or", "please", "preferred", "require", "required", "requirement", "should",
+    "software", "specify", "support", "supported", "system", "that", "the", "there", "this", "to",
+    "type", "use", "used", "using", "what", "when", "where", "which", "who", "will", "with",
+    "would", "you", "your",
+}
+
+# Abbreviations and inflections of one term, folded so rephrased questions still match. Only
+# spellings of the same thing belong here: folding related concepts (browser and device, login
+# and SSO, role and permission) would make different questions match and reuse the wrong answer.
+TERM_VARIANTS = {
+    "db": "database",
+    "dbms": "database",
+    "rdbms": "database",
+    "signin": "login",
+    "logon": "login",
+    "encrypt": "encryption",
+    "encrypted": "encryption",
+    "deploy": "deployment",
+    "deployed": "deployment",
+    "notify": "notification",
+    "pricing": "price",
+}
+
+def words(text):
+    """
+    Splits a text into lower-case runs of letters and digits.
+    """
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def content_terms(text):
+    """
+    Reduces a text to its content terms: lower case, no stopwords, and plurals and variant
+    spellings folded into one term.
+    """
+    terms = []
+    for word in words(text):
+        if word in TERM_VARIANTS:
+            word = TERM_VARIANTS[word]
+        elif len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        word = TERM_VARIANTS.get(word, word)
+        if word not in STOPWORDS:
+            terms.append(word)
+    return terms
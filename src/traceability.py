@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from chunking import requirement_tokens
+from clarification import update_requirements_content
+from file_utils import save_updated_requirements_file
+from ieee830 import NUMBERED_HEADING_RE, generate_section, generate_sectioned_ieee_830, normalize_section_numbering
+from sections import Section, parse_sections, route_clarifications
+from tracing import submit_in_context
+
+REQUIREMENT_ID_RE = re.compile(r"\[(REQ-\d+)\]")
+
+# Generated documents do not always keep the brackets when they cite a requirement
+CITATION_RE = re.compile(r"\b(REQ-\d+)\b")
+
+# A requirement bullet: its marker, its id if it has one, and its text
+REQUIREMENT_LINE_RE = re.compile(r"^(\s*(?:[-*+]|\d+[.)])\s+)(?:\[(REQ-\d+)\]\s*)?(.*)$")
+
+# A numbered part of the specification that is generated and replaced as a whole:
+# a top-level section ("1", "2", "4") or a subsection ("3.1", "3.2")
+SrsUnit = namedtuple("SrsUnit", ["number", "title", "level", "text"])
+
+def assign_requirement_ids(text):
+    """
+    Tags every requirement bullet that has no id yet with the next free `[REQ-nnn]` id.
+
+    Existing ids are kept, so a requirement keeps its id for as long as later revisions keep its
+    tag, and the result depends only on the text, so replayed stages get the same ids.
+    """
+    numbers = [int(requirement_id.split("-")[1]) for requirement_id in REQUIREMENT_ID_RE.findall(text)]
+    next_number = max(numbers, default=0) + 1
+    lines = text.split("\n")
+    in_code_block = False
+    for position, line in enumerate(lines):
+        if line.strip().startswith("```"):
+            in_code_block = not in_code_block
+        match = None if in_code_block else REQUIREMENT_LINE_RE.match(line)
+        if not match or match.group(2) or not match.group(3).strip():
+            continue
+        lines[position] = f"{match.group(1)}[REQ-{next_number:03d}] {match.group(3)}"
+        next_number += 1
+    return "\n".join(lines)
+
+def requirement_index(text):
+    """
+    Maps each requirement id to `(section id, requirement text)`.
+    """
+    index = {}
+    for section in parse_sections(text):
+        for line in section.body.split("\n"):
+            match = REQUIREMENT_LINE_RE.match(line)
+            if match and match.group(2):
+                index[match.group(2)] = (section.id, match.group(3).strip())
+    return index
+
+def changed_requirements(before, after):
+    """
+    Lists the ids of the requirements that are new or reworded in `after`.
+    """
+    old = requirement_index(before)
+    return [
+        requirement_id for requirement_id, (_, text) in requirement_index(after).items()
+        if requirement_id not in old or old[requirement_id][1] != text
+    ]
+
+def link_clarifications(requirement_ids, requirements, clarifications):
+    """
+    Attributes changed requirements to the clarifications that caused them.
+
+    A requirement is linked to the clarifications sharing the most content words with it, or to
+    all of them if it shares words with none.
+
+    Args:
+        requirement_ids (list): The requirements changed by the clarifications.
+        requirements (dict): The requirement index of the updated document.
+        clarifications (list): `(question, answer)` tuples.
+
+    Returns:
+        list: For each clarification, the ids of the requirements linked to it.
+    """
+    links = [[] for _ in clarifications]
+    clarification_terms = [requirement_tokens(f"{question} {answer}") for question, answer in clarifications]
+    for requirement_id in requirement_ids:
+        terms = requirement_tokens(requirements[requirement_id][1])
+        overlaps = [len(terms & other) for other in clarification_terms]
+        best = max(overlaps, default=0)
+        matches = [position for position, overlap in enumerate(overlaps) if best and overlap == best]
+        for position in matches or range(len(clarifications)):
+            links[position].append(requirement_id)
+    return links
+
+def srs_units(document):
+    """
+    Splits a specification into the text before its first numbered heading and its units.
+    """
+    preamble = []
+    units = []
+    for line in document.strip("\n").split("\n"):
+        match = NUMBERED_HEADING_RE.match(line)
+        if match and match.group(2).count(".") <= 1:
+            units.append([match.group(2), match.group(3).strip(), len(match.group(1)), [line]])
+        elif units:
+            units[-1][3].append(line)
+        else:
+            preamble.append(line)
+    return "\n".join(preamble).strip("\n"), [
+        SrsUnit(number, title, level, "\n".join(lines).strip("\n")) for number, title, level, lines in units
+    ]
+
+def is_subunit(unit, parent):
+    return unit.number.startswith(parent.number + ".")
+
+def join_srs_units(preamble, units):
+    return "\n\n".join([preamble] * bool(preamble) + [unit.text for unit in units]) + "\n"
+
+def srs_requirement_map(document):
+    """
+    Maps each requirement id to the numbers of the specification units citing it.
+    """
+    mapping = {}
+    for unit in srs_units(document)[1]:
+        for requirement_id in dict.fromkeys(CITATION_RE.findall(unit.text)):
+            mapping.setdefault(requirement_id, []).append(unit.number)
+    return mapping
+
+def build_traceability(session_id, final_requirements, clarifications, document, document_ref):
+    """
+    Builds the traceability index of a session: clarification -> requirement -> SRS section.
+
+    Args:
+        session_id (str): The session the index describes.
+        final_requirements (str): The final requirements, with requirement ids.
+        clarifications (list): The session's clarifications, each a dict with `id`, `loop`,
+            `question`, `options`, `answer` and the ids of the `requirements` it changed.
+        document (str): The IEEE 830 document.
+        document_ref (dict): Where the document is kept: the `run_id`, `name` and `version` it was
+            stored under in the artifact store and the `path` of its `requirements_vN.md` file.
+
+    Returns:
+        dict: The index, JSON-serializable.
+    """
+    srs_map = srs_requirement_map(document)
+    requirements = {
+        requirement_id: {"section": section_id, "text": text, "clarifications": [], "srs_sections": srs_map.get(requirement_id, [])}
+        for requirement_id, (section_id, text) in requirement_index(final_requirements).items()
+    }
+    for clarification in clarifications:
+        for requirement_id in clarification["requirements"]:
+            if requirement_id in requirements:
+                requirements[requirement_id]["clarifications"].append(clarification["id"])
+    return {
+        "session_id": session_id,
+        "document": {
+            "run_id": document_ref["run_id"],
+            "name": document_ref["name"],
+            "version": document_ref["version"],
+            "path": os.path.abspath(document_ref["path"]),
+        },
+        "final_requirements": final_requirements,
+        "clarifications": clarifications,
+        "requirements": requirements,
+    }
+
+# The index is an artifact of the session's run; each amendment stores a new version of it there
+TRACEABILITY_NAME = "traceability.json"
+
+def load_traceability(artifact_store, session_id):
+    """
+    Returns the latest traceability index of a session, including amendments, or None.
+    """
+    content = artifact_store.get(session_id, TRACEABILITY_NAME)
+    return json.loads(content) if content else None
+
+def save_traceability(artifact_store, traceability):
+    return artifact_store.put(traceability["session_id"], TRACEABILITY_NAME, json.dumps(traceability, indent=2))
+
+def affected_units(traceability, units, new_requirements, changed, clarifications):
+    # Units citing a changed or removed requirement; a new requirement reaches the units citing
+    # the other requirements of its section
+    entries = traceability["requirements"]
+    new_index = requirement_index(new_requirements)
+    numbers = set()
+    for requirement_id in changed + [r for r in entries if r not in new_index]:
+        if requirement_id in entries:
+            numbers.update(entries[requirement_id]["srs_sections"])
+        else:
+            section_id = new_index[requirement_id][0]
+            for entry in entries.values():
+                if entry["section"] == section_id:
+                    numbers.update(entry["srs_sections"])
+    if not numbers:
+        # Nothing cites the requirements: fall back to the units whose wording matches the answers
+        unit_sections = [Section(unit.number, f"## {unit.title}", unit.text) for unit in units]
+        numbers.update(route_clarifications(unit_sections, clarifications))
+    return [unit for unit in units if unit.number in numbers]
+
+def amend_requirements(client, artifact_store, traceability, changes, run_id, max_workers=4):
+    """
+    Applies changed answers to a finished session, regenerating only the SRS sections they reach.
+
+    The requirement sections holding the requirements linked to each changed answer are updated,
+    the specification units citing the requirements that changed are regenerated, and the units
+    are spliced into the session's latest IEEE 830 document. A top-level section with
+    subsections is regenerated together with them. A document without numbered sections cannot
+    be spliced and is regenerated whole. The result is saved as the next `requirements_vN.md`,
+    next to the session's document, under the amendment's run, and the updated traceability
+    index is stored as a new version of the session's index.
+
+    Args:
+        client (Swarm): The swarm client to execute the agents.
+        artifact_store (ArtifactStore): Holds the session's documents and traceability index.
+        traceability (dict): The session's latest traceability index.
+        changes (dict): Clarification id -> new answer.
+        run_id (str): The amendment's run id in the artifact store.
+        max_workers (int): Maximum number of sections generated at the same time.
+
+    Returns:
+        tuple: The updated traceability index, the path of the amended document and the numbers
+        of the regenerated units, or None if the whole document was regenerated.
+    """
+    clarifications = [dict(clarification) for clarification in traceability["clarifications"]]
+    by_id = {clarification["id"]: clarification for clarification in clarifications}
+    unknown = sorted(set(changes) - set(by_id))
+    if unknown:
+        raise ValueError(f"Unknown clarification id(s): {', '.join(unknown)}")
+
+    old_requirements = traceability["final_requirements"]
+    sections = parse_sections(old_requirements)
+    index = requirement_index(old_requirements)
+    changed_clarifications = []
+    routes = {}
+    for clarification_id, answer in changes.items():
+        clarification = by_id[clarification_id]
+        pair = (clarification["question"], answer)
+        changed_clarifications.append(pair)
+        targets = {index[r][0] for r in clarification["requirements"] if r in index}
+        if not targets:
+            targets = set(route_clarifications(sections, [pair]))
+        for section_id in targets:
+            routes.setdefault(section_id, []).append(pair)
+        clarification["answer"] = answer
+
+    new_requirements = assign_requirement_ids(
+        update_requirements_content(client, old_requirements, changed_clarifications, routes=routes)
+    )
+    changed = changed_requirements(old_requirements, new_requirements)
+    new_index = requirement_index(new_requirements)
+    for clarification_id, requirement_ids in zip(
+        changes, link_clarifications(changed, new_index, changed_clarifications)
+    ):
+        linked = by_id[clarification_id]["requirements"]
+        linked.extend(r for r in requirement_ids if r not in linked)
+
+    document_ref = traceability["document"]
+    document = artifact_store.get(document_ref["run_id"], document_ref["name"], document_ref["version"])
+    preamble, units = srs_units(document)
+    if units:
+        amended, regenerated_numbers = regenerate_units(
+            client, new_requirements, preamble, units,
+            affected_units(traceability, units, new_requirements, changed, changed_clarifications),
+            max_workers,
+        )
+        logging.info(
+            f"Amending session {traceability['session_id']}: {len(changed)} requirement(s) changed, "
+            f"regenerated {len(regenerated_numbers)} of {len(units)} section(s): {', '.join(regenerated_numbers)}"
+        )
+    else:
+        logging.warning(
+            f"The IEEE 830 document of session {traceability['session_id']} has no numbered sections to "
+            "regenerate one by one; regenerating the whole document"
+        )
+        amended = generate_sectioned_ieee_830(client, new_requirements, max_workers=max_workers)
+        regenerated_numbers = None
+
+    # Saved next to the session's document, wherever the amendment is run from
+    directory = os.path.dirname(document_ref.get("path") or document_ref["name"])
+    path, version = save_updated_requirements_file(
+        os.path.join(directory, os.path.basename(document_ref["name"])),
+        amended,
+        artifact_store,
+        run_id,
+        name=document_ref["name"],
+    )
+    updated = build_traceability(
+        traceability["session_id"],
+        new_requirements,
+        clarifications,
+        amended,
+        {"run_id": run_id, "name": document_ref["name"], "version": version, "path": path},
+    )
+    save_traceability(artifact_store, updated)
+    return updated, path, regenerated_numbers
+
+def regenerate_units(client, final_requirements, preamble, units, targets, max_workers=4):
+    """
+    Regenerates the target units of a specification and splices them back into it.
+
+    A target with subsections is generated with them, so the subsections are replaced by the
+    ones it brings rather than kept alongside them.
+
+    Returns:
+        tuple: The spliced document and the numbers of the regenerated units.
+    """
+    targets = [unit for unit in targets if not any(is_subunit(unit, other) for other in targets)]
+    outline_text = "\n".join(f"{unit.number} {unit.title}" for unit in units)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            unit.number: submit_in_context(
+                executor,
+                generate_section, client, final_requirements, outline_text, "", unit.number, unit.title, unit.level,
+            )
+            for unit in targets
+        }
+        regenerated = {
+            unit.number: unit._replace(
+                text=normalize_section_numbering(futures[unit.number].result(), unit.number, unit.title, unit.level)[0]
+            )
+            for unit in targets
+        }
+    spliced = [
+        regenerated.get(unit.number, unit) for unit in units
+        if not any(is_subunit(unit, target) for target in targets)
+    ]
+    return join_srs_units(preamble, spliced), [unit.number for unit in targets]
@@ -0,0 +1,295 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from clarification_context import CHARS_PER_TOKEN, estimate_tokens
+from utils import current_session_id
+
+# The span that work on the current thread (or copied context) is attributed to
+current_span = contextvars.ContextVar("current_span", default=None)
+
+# Attributes a span passes down to the spans started inside it
+INHERITED_ATTRIBUTES = ("session", "stage", "loop")
+
+# Loop and answer numbers folded together when stages are summarized (loop_3_answer_2 -> loop_N_answer_N)
+LOOP_NUMBER_RE = re.compile(r"(?<=loop_)\d+|(?<=answer_)\d+")
+
+class Tracer:
+    """
+    Collects timed spans for pipeline stages and model calls.
+
+    Stage spans wrap each step of a session; call spans wrap each `client.run` and carry token
+    counts, cache status and retry counts. Spans nest through a context variable, so calls made
+    inside a stage, including on worker threads started with `submit_in_context`, are attributed
+    to it.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.started_at = time.time()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Discards every recorded span, e.g. between benchmark runs.
+        """
+        with self._lock:
+            self.spans = []
+            self.started_at = time.time()
+
+    def start_span(self, name, kind="stage", **attributes):
+        parent = current_span.get()
+        inherited = {}
+        if parent:
+            inherited = {k: parent["attributes"][k] for k in INHERITED_ATTRIBUTES if k in parent["attributes"]}
+        elif current_session_id.get():
+            inherited = {"session": current_session_id.get()}
+        inherited.update(attributes)
+        return {
+            "id": next(self._ids),
+            "parent_id": parent["id"] if parent else None,
+            "name": name,
+            "kind": kind,
+            "start": time.time(),
+            "_perf_start": time.perf_counter(),
+            "attributes": inherited,
+        }
+
+    def finish_span(self, span, error=None):
+        span["duration"] = time.perf_counter() - span.pop("_perf_start")
+        if error is not None:
+            span["attributes"]["error"] = repr(error)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, kind="stage", **attributes):
+        """
+        Times the enclosed block as a span nested under the current one.
+        """
+        span = self.start_span(name, kind, **attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            self.finish_span(span, error)
+            raise
+        else:
+            self.finish_span(span)
+        finally:
+            current_span.reset(token)
+
+    def pop_session(self, session_id):
+        """
+        Removes and returns the spans of one session, so a long-running process does not keep them all.
+        """
+        with self._lock:
+            popped = [span for span in self.spans if span["attributes"].get("session") == session_id]
+            self.spans = [span for span in self.spans if span["attributes"].get("session") != session_id]
+        return popped
+
+    def export_jsonl(self, path, spans=None, append=False):
+        """
+        Writes every finished span (or the given spans) as one JSON line.
+
+        With `append`, the spans follow those already in the file, e.g. the spans of the attempt
+        a resumed session continues, and are numbered after them so span ids stay unique.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if spans is None:
+            with self._lock:
+                spans = list(self.spans)
+        spans = sorted(spans, key=lambda span: span["start"])
+        offset = max((span["id"] for span in load_jsonl(path)), default=0) if append else 0
+        with open(path, 'a' if append else 'w') as f:
+            for span in spans:
+                if offset:
+                    span = dict(
+                        span,
+                        id=span["id"] + offset,
+                        parent_id=span["parent_id"] + offset if span["parent_id"] is not None else None,
+                    )
+                f.write(json.dumps(span, default=str) + "\n")
+        logging.info(f"Exported {len(spans)} span(s) to {path}")
+        return path
+
+    def summary(self, spans=None):
+        """
+        Aggregates the spans (every recorded span by default) per stage, with loop numbers folded
+        together, and per clarification loop.
+
+        Returns:
+            dict: `stages` and `loops` rows with counts, seconds and token totals.
+        """
+        if spans is None:
+            with self._lock:
+                spans = list(self.spans)
+        stages = {}
+        loops = {}
+        for span in spans:
+            attributes = span["attributes"]
+            stage_name = LOOP_NUMBER_RE.sub("N", attributes.get("stage", span["name"]))
+            row = stages.setdefault(stage_name, {
+                "stage": stage_name, "count": 0, "seconds": 0.0, "calls": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "retries": 0,
+            })
+            loop_row = None
+            if attributes.get("loop") is not None:
+                loop_row = loops.setdefault(attributes["loop"], {
+                    "loop": attributes["loop"], "seconds": 0.0, "calls": 0,
+                    "prompt_tokens": 0, "completion_tokens": 0,
+                })
+            if span["kind"] in ("stage", "session"):
+                row["count"] += 1
+                row["seconds"] += span["duration"]
+                if loop_row:
+                    loop_row["seconds"] += span["duration"]
+            elif span["kind"] == "call":
+                for target in filter(None, (row, loop_row)):
+                    target["calls"] += 1
+                    target["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+                    target["completion_tokens"] += attributes.get("completion_tokens", 0)
+                row["cache_hits"] += attributes.get("cache") == "hit"
+                row["retries"] += attributes.get("retries", 0)
+        return {
+            "stages": sorted(stages.values(), key=lambda row: row["seconds"], reverse=True),
+            "loops": [loops[loop] for loop in sorted(loops)],
+        }
+
+    def format_summary(self, spans=None):
+        """
+        Renders `summary()` as plain-text tables.
+        """
+        summary = self.summary(spans)
+        lines = [
+            f"{'Stage':<32} {'Count':>5} {'Seconds':>9} {'Calls':>5} {'Prompt tok':>10} {'Compl. tok':>10} {'Hits':>4} {'Retries':>7}"
+        ]
+        for row in summary["stages"]:
+            lines.append(
+                f"{row['stage'][:32]:<32} {row['count']:>5} {row['seconds']:>9.2f} {row['calls']:>5} "
+                f"{row['prompt_tokens']:>10} {row['completion_tokens']:>10} {row['cache_hits']:>4} {row['retries']:>7}"
+            )
+        if summary["loops"]:
+            lines.append("")
+            lines.append(f"{'Loop':<6} {'Seconds':>9} {'Calls':>5} {'Prompt tok':>10} {'Compl. tok':>10}")
+            for row in summary["loops"]:
+                lines.append(
+                    f"{row['loop']:<6} {row['seconds']:>9.2f} {row['calls']:>5} "
+                    f"{row['prompt_tokens']:>10} {row['completion_tokens']:>10}"
+                )
+        return "\n".join(lines)
+
+# Process-wide tracer used by the pipeline
+tracer = Tracer()
+
+def load_jsonl(path):
+    """
+    Reads the spans `Tracer.export_jsonl` wrote to `path`, or an empty list if there is no such file.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def annotate(**attributes):
+    """
+    Adds attributes to the current span, if any.
+    """
+    span = current_span.get()
+    if span is not None:
+        span["attributes"].update(attributes)
+
+def increment(attribute, amount=1):
+    """
+    Increments a counter attribute (such as `retries`) on the current span, if any.
+    """
+    span = current_span.get()
+    if span is not None:
+        span["attributes"][attribute] = span["attributes"].get(attribute, 0) + amount
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    Submits `fn` to an executor so it runs with a copy of the caller's context variables
+    (current span, session id).
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+def start_thread_in_context(name, fn, *args):
+    """
+    Runs `fn` on a new thread with a copy of the caller's context variables (current span,
+    session id, priority).
+
+    The thread is a daemon, so background work nobody waits for any more, such as an abandoned
+    stream or speculative call, cannot keep the process alive.
+    """
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(fn, *args), name=name, daemon=True)
+    thread.start()
+    return thread
+
+def count_message_tokens(agent, messages):
+    instructions = agent.instructions if isinstance(agent.instructions, str) else ""
+    return estimate_tokens(instructions) + sum(estimate_tokens(m.get("content") or "") for m in messages)
+
+class TracingClient:
+    """
+    Wraps a Swarm client and records a call span, with estimated token counts, for every `run`.
+    """
+
+    def __init__(self, client, tracer=tracer):
+        self.client = client
+        self.tracer = tracer
+
+    def _trace_stream(self, span, stream):
+        completion_chars = 0
+        try:
+            for chunk in stream:
+                if chunk.get("content"):
+                    if "time_to_first_token" not in span["attributes"]:
+                        span["attributes"]["time_to_first_token"] = time.perf_counter() - span["_perf_start"]
+                    completion_chars += len(chunk["content"])
+                yield chunk
+        except BaseException as error:
+            self.tracer.finish_span(span, error)
+            raise
+        else:
+            span["attributes"]["completion_tokens"] = (completion_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+            self.tracer.finish_span(span)
+
+    def run(self, agent, messages, context_variables=None, model_override=None, stream=False, **kwargs):
+        span = self.tracer.start_span(
+            f"run:{agent.name}",
+            kind="call",
+            agent=agent.name,
+            model=model_override or agent.model,
+            prompt_tokens=count_message_tokens(agent, messages),
+            stream=stream,
+        )
+        token = current_span.set(span)
+        try:
+            response = self.client.run(
+                agent=agent,
+                messages=messages,
+                context_variables=context_variables or {},
+                model_override=model_override,
+                stream=stream,
+                **kwargs,
+            )
+        except BaseException as error:
+            self.tracer.finish_span(span, error)
+            raise
+        finally:
+            current_span.reset(token)
+
+        if stream:
+            return self._trace_stream(span, response)
+        span["attributes"]["completion_tokens"] = estimate_tokens(response.messages[-1].get("content") or "")
+        self.tracer.finish_span(span)
+        return response
@@ -1,23 +1,190 @@
+import atexit
+import contextvars
 import logging
 import os
+import queue
 import shutil
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Identifies the session a worker thread is running, so its log records can be routed
+current_session_id = contextvars.ContextVar("current_session_id", default=None)
+
+# Records are written by a listener thread through this logger, so handlers can be attached at any time
+SINK_LOGGER_NAME = "clarifyloop.sink"
+
+_log_queue = queue.Queue()
+_log_listener = None
+_log_filename = None
+
+class SessionQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread, stamped with the current session id. Messages longer
+    than `max_payload_chars` are truncated; records carrying a traceback are kept whole.
+
+    The session id is read here because the listener thread does not share the emitting
+    thread's context variables.
+    """
+
+    def __init__(self, log_queue, max_payload_chars=2000):
+        super().__init__(log_queue)
+        self.max_payload_chars = max_payload_chars
+
+    def prepare(self, record):
+        has_traceback = record.exc_info is not None
+        record = super().prepare(record)
+        record.session_id = current_session_id.get()
+        if self.max_payload_chars and not has_traceback and len(record.msg) > self.max_payload_chars:
+            omitted = len(record.msg) - self.max_payload_chars
+            record.msg = f"{record.msg[:self.max_payload_chars]}... [{omitted} more chars truncated]"
+            record.message = record.msg
+        return record
+
+def setup_logging(log_dir='logs', max_bytes=10 * 1024 * 1024, backup_count=5, max_payload_chars=2000):
+    """
+    Routes logging through a queue to a size-rotated file written by a background thread.
+
+    Args:
+        log_dir (str): Directory receiving `swarm_<timestamp>.log`.
+        max_bytes (int): Size at which the log file is rotated.
+        backup_count (int): Number of rotated files kept.
+        max_payload_chars (int): Longer messages are truncated; 0 keeps them whole.
+
+    Returns:
+        str: The log file name.
+    """
+    global _log_listener, _log_filename
+    if _log_listener is not None:
+        return _log_filename
 
-def setup_logging(log_dir='logs'):
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_filename = f'swarm_{timestamp}.log'
-    logging.basicConfig(
-        filename=os.path.join(log_dir, log_filename),
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    _log_filename = f'swarm_{timestamp}.log'
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, _log_filename), maxBytes=max_bytes, backupCount=backup_count
     )
-    return log_filename
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    sink = logging.getLogger(SINK_LOGGER_NAME)
+    sink.propagate = False
+    sink.addHandler(file_handler)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(SessionQueueHandler(_log_queue, max_payload_chars))
+
+    # A logger handles records like a handler, passing them to whatever handlers it has right now
+    _log_listener = QueueListener(_log_queue, sink)
+    _log_listener.start()
+    atexit.register(stop_logging)
+    return _log_filename
+
+def flush_logs():
+    """
+    Waits until the listener thread has written every queued record.
+    """
+    if _log_listener is not None:
+        _log_queue.join()
+
+def stop_logging():
+    """
+    Flushes pending artifacts and log records and stops the listener thread.
+    """
+    global _log_listener
+    artifact_writer.flush()
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
 
-def clean_agent_outputs(output_dir="agent_outputs"):
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
+class SessionFilter(logging.Filter):
+    def __init__(self, session_id):
+        super().__init__()
+        self.session_id = session_id
+
+    def filter(self, record):
+        return getattr(record, "session_id", current_session_id.get()) == self.session_id
+
+def add_session_log(session_id, log_path):
+    # Mirror the records emitted while `session_id` is current into a dedicated file
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    handler = logging.FileHandler(log_path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(SessionFilter(session_id))
+    logger = logging.getLogger(SINK_LOGGER_NAME) if _log_listener is not None else logging.getLogger()
+    logger.addHandler(handler)
+    return handler
+
+def remove_session_log(handler):
+    # Let the listener write the session's queued records before the file is closed
+    flush_logs()
+    logging.getLogger(SINK_LOGGER_NAME).removeHandler(handler)
+    logging.getLogger().removeHandler(handler)
+    handler.close()
+
+class ArtifactWriter:
+    """
+    Writes output files on a background thread so disk I/O stays off the pipeline's critical path.
+
+    Writes are applied in submission order. `flush` blocks until every queued write is on disk,
+    and pending writes are flushed when the interpreter exits.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            fn, args = self._queue.get()
+            try:
+                fn(*args)
+            except Exception:
+                logging.exception(f"Background artifact write {fn.__name__} failed")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args):
+        """
+        Queues `fn(*args)` behind the writes already submitted.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((fn, args))
+
+    def write(self, file_path, content):
+        self.submit(write_file, file_path, content)
+
+    def flush(self):
+        self._queue.join()
+
+def write_file(file_path, content):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'w') as file:
+        file.write(content)
+
+artifact_writer = ArtifactWriter()
+atexit.register(artifact_writer.flush)
+
+def prune_agent_outputs(output_root="agent_outputs", keep=10):
+    """
+    Removes all but the `keep` most recent run directories under `output_root`.
+
+    Every run writes its outputs to its own `<output_root>/<session_id>` directory, and their
+    full history stays in the artifact store, so only the working copies of old runs are removed.
+    """
+    if not os.path.isdir(output_root):
+        return
+    run_dirs = [entry for entry in os.scandir(output_root) if entry.is_dir()]
+    run_dirs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in run_dirs[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+        logging.info(f"Removed old run outputs {entry.path}")
 
 def log_agent_action(agent_name, action, result=None):
     separator = "-" * 120  
@@ -28,10 +195,8 @@ def log_agent_action(agent_name, action, result=None):
     logging.info(separator)  
 
 def log_agent_output(agent_name, output, step_number, filename=None, output_dir="agent_outputs"):
-    os.makedirs(output_dir, exist_ok=True)
     if filename is None:
         filename = f"{step_number:03d}_{agent_name.replace(' ', '_').lower()}_output.txt"
     file_path = os.path.join(output_dir, filename)
-    with open(file_path, 'w') as file:
-        file.write(output)
+    artifact_writer.write(file_path, output)
     logging.info(f"Logged {agent_name} output to {file_path}")
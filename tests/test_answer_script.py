@@ -0,0 +1,52 @@
+import json
+import pytest
+from answer_script import AnswerScript, UnansweredQuestion, answer_lines, load_answers
+from clarification import CONTINUE_QUESTION, DefaultAnswer
+
+OPTIONS = ["All registered users", "Administrators only"]
+
+def test_scripted_answers_match_rephrased_questions_and_option_numbers():
+    script = AnswerScript([
+        ("Which users must be able to access reports?", "2"),
+        ("What response time is acceptable for reports?", "Under 1 second"),
+    ])
+    assert script.answer_fn("Which users should be able to access reports?", OPTIONS) == "Administrators only"
+    assert script.answer_fn("What response time is acceptable for reports?") == "Under 1 second"
+    assert script.scripted == 2
+
+def test_scripted_answers_are_not_defaults():
+    script = AnswerScript([("Which users must be able to access reports?", "Administrators only")])
+    assert not isinstance(script.answer_fn("Which users must be able to access reports?", OPTIONS), DefaultAnswer)
+
+def test_unscripted_questions_take_the_first_option_as_a_default():
+    script = AnswerScript([])
+    answer = script.answer_fn("Which platforms must support reports?", OPTIONS)
+    assert answer == "All registered users"
+    assert isinstance(answer, DefaultAnswer)
+    assert script.unscripted == 1
+
+def test_unscripted_questions_fail_with_the_fail_policy():
+    with pytest.raises(UnansweredQuestion):
+        AnswerScript([], unanswered="fail").answer_fn("Which platforms must support reports?", OPTIONS)
+
+def test_unknown_policies_are_rejected():
+    with pytest.raises(ValueError):
+        AnswerScript([], unanswered="guess")
+
+def test_continue_answer_comes_from_the_script():
+    assert AnswerScript([]).continue_fn() is True
+    script = AnswerScript([(CONTINUE_QUESTION, "no")])
+    assert script.continue_fn() is False
+    assert len(script) == 0
+
+def test_load_answers_round_trips_answer_lines(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    clarifications = [{"question": "Which OS?", "answer": "Linux"}, {"question": "Which DB?", "answer": "PostgreSQL"}]
+    path.write_text("\n".join(answer_lines(clarifications)) + "\n\n")
+    assert load_answers(str(path)) == [("Which OS?", "Linux"), ("Which DB?", "PostgreSQL")]
+
+def test_load_answers_reports_the_bad_line(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    path.write_text(json.dumps({"question": "Which OS?", "answer": "Linux"}) + "\n" + json.dumps({"question": "Which DB?"}) + "\n")
+    with pytest.raises(ValueError, match=":2:"):
+        load_answers(str(path))
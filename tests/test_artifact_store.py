@@ -0,0 +1,42 @@
+import pytest
+from artifact_store import ArtifactStore
+
+@pytest.fixture
+def store():
+    store = ArtifactStore(":memory:")
+    yield store
+    store.close()
+
+def test_versions_are_kept_per_run(store):
+    assert store.put("run-a", "001_original_requirements.txt", "App A") == 1
+    assert store.put("run-b", "001_original_requirements.txt", "App B") == 1
+    assert store.put("run-a", "001_original_requirements.txt", "App A, revised") == 2
+    assert store.get("run-a", "001_original_requirements.txt") == "App A, revised"
+    assert store.get("run-a", "001_original_requirements.txt", 1) == "App A"
+    assert store.get("run-b", "001_original_requirements.txt") == "App B"
+    assert [version for version, _, _ in store.versions("run-b", "001_original_requirements.txt")] == [1]
+    assert store.get("run-c", "001_original_requirements.txt") is None
+
+def test_storing_the_latest_content_again_returns_its_version(store):
+    assert store.put("run-a", "notes.md", "# Notes") == 1
+    assert store.put("run-a", "notes.md", "# Notes") == 1
+    assert store.put("run-a", "notes.md", "# Notes\nmore") == 2
+    assert store.run_artifacts("run-a") == [("notes.md", 1, 7), ("notes.md", 2, 12)]
+
+def test_unchanged_sections_share_blobs_across_runs(store):
+    document = "# SRS\n## 1 Introduction\nPurpose.\n## 2 Overall Description\nUsers.\n"
+    store.put("run-a", "requirements.md", document)
+    store.put("run-b", "requirements.md", document.replace("Users.", "Admins."))
+    assert store.stats()["blobs"] == 4
+
+def test_publication_numbers_are_shared_by_all_runs(store):
+    assert store.publish("run-a", "requirements.md", "# A") == (1, 1)
+    assert store.publish("run-b", "requirements.md", "# B") == (1, 2)
+    assert store.publish("run-a", "requirements.md", "# A, amended") == (2, 3)
+    # A resumed run publishing its latest document again keeps its number
+    assert store.publish("run-b", "requirements.md", "# B") == (1, 2)
+
+def test_publication_numbers_skip_numbers_taken_elsewhere(store):
+    assert store.publish("run-a", "requirements.md", "# A", after=3) == (1, 4)
+    assert store.publish("run-b", "requirements.md", "# B") == (1, 5)
+    assert store.publish("run-a", "requirements.md", "# A", after=9) == (1, 4)
@@ -0,0 +1,95 @@
+import os
+import time
+from types import SimpleNamespace
+from cache import CachedClient
+
+AGENT = SimpleNamespace(name="Test Agent", instructions="", model="gpt-4o", functions=[])
+
+class CountingClient:
+    """
+    Answers every call with "answer to <message>", streamed in two chunks when asked to stream.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def _response(self, messages):
+        content = f"answer to {messages[-1]['content']}"
+        return SimpleNamespace(messages=[{"role": "assistant", "content": content}], agent=AGENT, context_variables={})
+
+    def run(self, agent, messages, stream=False, **kwargs):
+        self.calls += 1
+        response = self._response(messages)
+        if not stream:
+            return response
+
+        def chunks():
+            content = response.messages[-1]["content"]
+            yield {"content": content[:5]}
+            yield {"content": content[5:]}
+            yield {"response": response}
+
+        return chunks()
+
+def cached_client(tmp_path, **kwargs):
+    client = CachedClient(CountingClient(), cache_dir=str(tmp_path / "cache"), **kwargs)
+    # Builds hits without swarm.types.Response, which is all the cache needs from Swarm
+    client._response_from_entry = lambda agent, entry, context_variables: SimpleNamespace(
+        messages=entry["messages"], agent=agent, context_variables=context_variables
+    )
+    return client
+
+def ask(client, content, stream=False):
+    return client.run(AGENT, [{"role": "user", "content": content}], stream=stream)
+
+def test_repeated_call_is_served_from_the_cache(tmp_path):
+    client = cached_client(tmp_path)
+    assert ask(client, "a").messages[-1]["content"] == "answer to a"
+    assert ask(client, "a").messages[-1]["content"] == "answer to a"
+    assert client.client.calls == 1
+    assert client.stats()["hits"] == 1
+
+def test_least_recently_used_entry_is_evicted_past_max_bytes(tmp_path):
+    client = cached_client(tmp_path)
+    ask(client, "a")
+    ask(client, "b")
+    # Room for two entries and a half, so a third one evicts exactly one
+    client.max_bytes = client.stats()["bytes"] * 5 // 4
+    ask(client, "a")  # a is now the most recently used
+    ask(client, "c")
+    assert client.stats()["evictions"] == 1
+    ask(client, "a")
+    assert client.client.calls == 3
+    ask(client, "b")
+    assert client.client.calls == 4
+
+def test_entries_older_than_max_age_are_not_served(tmp_path):
+    client = cached_client(tmp_path, max_age=60)
+    ask(client, "a")
+    client.max_age = 0
+    time.sleep(0.01)
+    ask(client, "a")
+    assert client.client.calls == 2
+    assert client.stats()["evictions"] == 1
+
+def test_expired_files_are_dropped_when_the_cache_is_opened(tmp_path):
+    ask(cached_client(tmp_path), "a")
+    for root, _, files in os.walk(tmp_path / "cache"):
+        for name in files:
+            os.utime(os.path.join(root, name), (time.time() - 120, time.time() - 120))
+    reopened = cached_client(tmp_path, max_age=60)
+    assert reopened.stats()["entries"] == 0
+    ask(reopened, "a")
+    assert reopened.client.calls == 1
+
+def test_stream_is_recorded_and_replayed_with_the_same_content(tmp_path):
+    client = cached_client(tmp_path)
+    recorded = list(ask(client, "a", stream=True))
+    replayed = list(ask(client, "a", stream=True))
+    assert client.client.calls == 1
+
+    def content(chunks):
+        return "".join(chunk.get("content") or "" for chunk in chunks)
+
+    assert content(replayed) == content(recorded) == "answer to a"
+    assert replayed[-1]["response"].messages[-1]["content"] == "answer to a"
@@ -0,0 +1,65 @@
+from chunking import iter_chunks, merge_extractions
+
+def write_document(tmp_path, text):
+    path = tmp_path / "requirements.md"
+    path.write_text(text)
+    return str(path)
+
+def test_iter_chunks_returns_small_document_whole(tmp_path):
+    text = "# Task app\n## Auth\n- Users log in\n## Reports\n- Export CSV\n"
+    chunks = list(iter_chunks(write_document(tmp_path, text), max_chars=1000))
+    assert len(chunks) == 1
+    assert chunks[0].index == 0
+    assert chunks[0].heading == ""
+    assert chunks[0].text == text
+
+def test_iter_chunks_keeps_every_character_in_order(tmp_path):
+    text = "# Task app\n" + "".join(f"## Area {n}\n- Requirement {n} of the system\n" for n in range(20))
+    chunks = list(iter_chunks(write_document(tmp_path, text), max_chars=120))
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(len(chunk.text) <= 120 for chunk in chunks)
+
+def test_iter_chunks_breaks_at_headings(tmp_path):
+    text = "## Auth\n- Users log in with email\n## Reports\n- Reports export to CSV\n"
+    chunks = list(iter_chunks(write_document(tmp_path, text), max_chars=40))
+    assert [chunk.text for chunk in chunks] == [
+        "## Auth\n- Users log in with email\n",
+        "## Reports\n- Reports export to CSV\n",
+    ]
+
+def test_iter_chunks_carries_heading_into_continued_section(tmp_path):
+    text = "## Reports\n" + "a" * 30 + "\n" + "b" * 30 + "\n"
+    chunks = list(iter_chunks(write_document(tmp_path, text), max_chars=45))
+    assert len(chunks) == 2
+    assert chunks[0].heading == ""
+    assert chunks[1].heading == "## Reports"
+    assert chunks[1].text == "b" * 30 + "\n"
+
+def test_iter_chunks_splits_lines_longer_than_a_chunk(tmp_path):
+    text = "x" * 25 + "\n"
+    chunks = list(iter_chunks(write_document(tmp_path, text), max_chars=10))
+    assert [chunk.text for chunk in chunks] == ["x" * 10, "x" * 10, "x" * 5 + "\n"]
+
+def test_merge_extractions_merges_areas_by_title():
+    merged = merge_extractions([
+        "## Auth\n- Users log in with email\n",
+        "## Reports\n- Reports export to CSV\n## auth\n- Accounts lock after five failures\n",
+    ])
+    assert merged == (
+        "## Auth\n- Users log in with email\n- Accounts lock after five failures\n\n"
+        "## Reports\n- Reports export to CSV"
+    )
+
+def test_merge_extractions_drops_near_duplicates():
+    merged = merge_extractions([
+        "## Auth\n- Users log in with email\n",
+        "## Auth\n- users log in with email.\n- Users log in with SSO\n",
+    ])
+    assert merged == "## Auth\n- Users log in with email\n- Users log in with SSO"
+
+def test_merge_extractions_files_loose_bullets_under_general():
+    assert merge_extractions(["- Runs offline\n"]) == "## General\n- Runs offline"
+
+def test_merge_extractions_skips_empty_areas():
+    assert merge_extractions(["## Empty\n\n## Auth\n- Users log in\n"]) == "## Auth\n- Users log in"
@@ -0,0 +1,41 @@
+from clarification_context import ClarificationContext, estimate_tokens
+
+def context_with(answers, **kwargs):
+    context = ClarificationContext(**kwargs)
+    for number in range(answers):
+        context.add(f"Which storage backend should service {number} use?", f"Backend {number}")
+    return context
+
+def test_digest_is_empty_before_any_answer():
+    assert ClarificationContext().digest() == ""
+
+def test_digest_lists_every_topic_within_the_budget():
+    digest = context_with(3).digest(max_tokens=200)
+    assert [line for line in digest.splitlines() if line.startswith("- ")] == [
+        f"- storage backend service {number}: Backend {number}" for number in range(3)
+    ]
+
+def test_digest_stays_within_its_budget_and_keeps_the_latest_topics():
+    digest = context_with(40).digest(max_tokens=120)
+    assert estimate_tokens(digest) <= 120
+    assert digest.endswith("- storage backend service 39: Backend 39")
+    summary = next(line for line in digest.splitlines() if line.startswith("- Also settled earlier: "))
+    # The rolling summary keeps a quarter of the budget rather than what the latest topics left
+    assert len(summary) > 60
+    assert summary.startswith("- Also settled earlier: storage backend service 0; storage backend service 1; ")
+
+def test_digest_without_rolling_summary_counts_the_omitted_topics():
+    digest = context_with(40, rolling_summary=False).digest(max_tokens=120)
+    assert estimate_tokens(digest) <= 120
+    omitted = 40 - sum(line.startswith("- storage") for line in digest.splitlines())
+    assert f"- ({omitted} earlier topic(s) omitted; already incorporated above)" in digest
+
+def test_long_answers_are_truncated():
+    context = ClarificationContext(max_answer_chars=20)
+    context.add("What is the retention policy?", "Keep everything for seven years, then archive")
+    assert context.digest().splitlines()[-1] == "- retention policy: Keep everything f..."
+
+def test_prompt_leaves_out_the_digest_when_the_requirements_fill_the_budget():
+    context = context_with(3, token_budget=100)
+    assert "Already clarified" in context.build_prompt("Ask questions.", "Short requirements.")
+    assert "Already clarified" not in context.build_prompt("Ask questions.", "x" * 400)
@@ -0,0 +1,31 @@
+import pytest
+from artifact_store import ArtifactStore
+from file_utils import save_updated_requirements_file
+
+@pytest.fixture
+def store():
+    store = ArtifactStore(":memory:")
+    yield store
+    store.close()
+
+def test_files_the_store_does_not_know_are_not_overwritten(tmp_path, store):
+    edited = tmp_path / "requirements_v1.md"
+    edited.write_text("# SRS\nEdited by hand.")
+    path, version = save_updated_requirements_file(str(tmp_path / "requirements.md"), "# SRS", store, "run-a")
+    assert path == str(tmp_path / "requirements_v2.md")
+    assert version == 1
+    assert edited.read_text() == "# SRS\nEdited by hand."
+
+def test_saving_the_same_document_again_keeps_its_file(tmp_path, store):
+    base = str(tmp_path / "requirements.md")
+    first, _ = save_updated_requirements_file(base, "# SRS", store, "run-a")
+    assert save_updated_requirements_file(base, "# SRS", store, "run-a") == (first, 1)
+
+def test_a_changed_file_of_the_same_publication_is_kept(tmp_path, store):
+    base = str(tmp_path / "requirements.md")
+    first, _ = save_updated_requirements_file(base, "# SRS", store, "run-a")
+    with open(first, "a") as file:
+        file.write("\nEdited by hand.")
+    second, _ = save_updated_requirements_file(base, "# SRS", store, "run-a")
+    assert second == str(tmp_path / "requirements_v2.md")
+    assert open(first).read() == "# SRS\nEdited by hand."
@@ -0,0 +1,47 @@
+from ieee830 import normalize_section_numbering, parse_outline
+
+def test_correct_section_is_unchanged():
+    text = "### 3.2 Functional Requirements\nIntro.\n#### 3.2.1 Login\nUsers log in."
+    assert normalize_section_numbering(text, "3.2", "Functional Requirements", 3) == (text, 0)
+
+def test_misnumbered_heading_and_subheadings_are_renumbered():
+    text = "### 3.5 Functions\n#### 3.5.1 Login\n#### 3.5.4 Reports\n##### 3.5.4.1 Export"
+    assert normalize_section_numbering(text, "3.2", "Functional Requirements", 3) == (
+        "### 3.2 Functional Requirements\n#### 3.2.1 Login\n#### 3.2.2 Reports\n##### 3.2.2.1 Export",
+        4,
+    )
+
+def test_unnumbered_heading_is_replaced():
+    text = "## Introduction\nPurpose."
+    assert normalize_section_numbering(text, "1", "Introduction", 2) == ("## 1 Introduction\nPurpose.", 1)
+
+def test_missing_heading_is_added():
+    assert normalize_section_numbering("Purpose.", "1", "Introduction", 2) == ("## 1 Introduction\nPurpose.", 1)
+
+def test_leading_subheading_is_kept_when_the_heading_is_missing():
+    text = "#### 3.2.1 Login\nUsers log in.\n#### 3.2.2 Reports\nExport CSV."
+    assert normalize_section_numbering(text, "3.2", "Functional Requirements", 3) == (
+        "### 3.2 Functional Requirements\n" + text,
+        1,
+    )
+
+def test_leading_subheading_at_the_section_level_is_kept():
+    text = "### 3.2.1 Login\nUsers log in."
+    assert normalize_section_numbering(text, "3.2", "Functional Requirements", 3) == (
+        "### 3.2 Functional Requirements\n#### 3.2.1 Login\nUsers log in.",
+        1,
+    )
+
+def test_leading_unnumbered_subheading_is_kept():
+    text = "#### Login\nUsers log in."
+    assert normalize_section_numbering(text, "3.2", "Functional Requirements", 3) == (
+        "### 3.2 Functional Requirements\n#### Login\nUsers log in.",
+        1,
+    )
+
+def test_parse_outline_numbers_subsections_and_collects_glossary():
+    outline = "GLOSSARY:\n- SRS: Software Requirements Specification\n\nSPECIFIC REQUIREMENTS:\n3.1 Interfaces\n3.4 Reports"
+    assert parse_outline(outline) == (
+        [("3.1", "Interfaces"), ("3.2", "Reports")],
+        "- SRS: Software Requirements Specification",
+    )
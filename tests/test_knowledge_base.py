@@ -0,0 +1,42 @@
+import pytest
+from knowledge_base import KnowledgeBase
+
+@pytest.fixture
+def knowledge_base():
+    knowledge_base = KnowledgeBase(":memory:")
+    yield knowledge_base
+    knowledge_base.close()
+
+def test_one_earlier_answer_is_never_certain(knowledge_base):
+    knowledge_base.record("s1", "Which database should be used?", [], "PostgreSQL")
+    [suggestion] = knowledge_base.suggest("Which database should be used?")
+    assert suggestion.answer == "PostgreSQL"
+    assert suggestion.sessions == 1
+    assert suggestion.confidence == pytest.approx(0.5)
+
+def test_confidence_grows_with_the_sessions_that_agree(knowledge_base):
+    for session_id in ("s1", "s2", "s3"):
+        knowledge_base.record(session_id, "Which database should be used?", [], "PostgreSQL")
+    [suggestion] = knowledge_base.suggest("What database is used?")
+    assert suggestion.sessions == 3
+    assert suggestion.confidence == pytest.approx(0.75)
+
+def test_disagreeing_sessions_share_the_confidence(knowledge_base):
+    knowledge_base.record("s1", "Which database should be used?", [], "PostgreSQL")
+    knowledge_base.record("s2", "Which database should be used?", [], "PostgreSQL")
+    knowledge_base.record("s3", "Which database should be used?", [], "MySQL")
+    first, second = knowledge_base.suggest("Which database should be used?")
+    assert (first.answer, second.answer) == ("PostgreSQL", "MySQL")
+    assert first.confidence == pytest.approx(2 / 3 * 2 / 3)
+    assert second.confidence == pytest.approx(1 / 3 * 1 / 2)
+
+def test_rephrased_question_finds_the_earlier_answer_in_the_offered_wording(knowledge_base):
+    knowledge_base.record("s1", "Which databases should the app use?", [], "postgresql")
+    [suggestion] = knowledge_base.suggest("What DB should be used?", options=["PostgreSQL", "MySQL"])
+    assert suggestion.answer == "PostgreSQL"
+    assert suggestion.question == "Which databases should the app use?"
+
+def test_unrelated_questions_get_no_suggestion(knowledge_base):
+    knowledge_base.record("s1", "Which database should be used?", [], "PostgreSQL")
+    knowledge_base.record("s1", "How are users notified?", [], "Email")
+    assert knowledge_base.suggest("Which payment provider is used?") == []
@@ -0,0 +1,52 @@
+import pytest
+from pipeline import Stage, StageGraph
+from session_store import SessionStore
+
+def test_stages_run_in_dependency_order_whatever_their_listing():
+    graph = StageGraph([
+        Stage("document", lambda requirements: f"doc({requirements})", ["requirements"], ["document"]),
+        Stage("requirements", lambda source: f"req({source})", ["source"], ["requirements"]),
+    ])
+    assert [stage.name for stage in graph.order(["source"])] == ["requirements", "document"]
+    values = graph.run(SessionStore("session", None), source="input")
+    assert values["document"] == "doc(req(input))"
+
+def test_a_value_with_two_producers_is_rejected():
+    with pytest.raises(ValueError, match="produced by both"):
+        StageGraph([Stage("a", lambda: 1, [], ["value"]), Stage("b", lambda: 2, [], ["value"])])
+
+def test_a_value_nothing_produces_is_rejected():
+    graph = StageGraph([Stage("a", lambda missing: 1, ["missing"], ["value"])])
+    with pytest.raises(ValueError, match="No stage produces missing"):
+        graph.order()
+
+def test_stages_that_depend_on_each_other_are_rejected():
+    graph = StageGraph([Stage("a", lambda y: 1, ["y"], ["x"]), Stage("b", lambda x: 2, ["x"], ["y"])])
+    with pytest.raises(ValueError, match="depend on each other"):
+        graph.order()
+
+def test_several_outputs_are_unpacked_in_order():
+    graph = StageGraph([Stage("split", lambda text: tuple(text.split()), ["text"], ["first", "second"])])
+    values = graph.run(SessionStore("session", None), text="left right")
+    assert (values["first"], values["second"]) == ("left", "right")
+
+def test_memoized_stage_is_replayed_until_its_inputs_change(tmp_path):
+    calls = []
+    reports = []
+
+    def graph():
+        return StageGraph([
+            Stage("upper", lambda text: calls.append(text) or text.upper(), ["text"], ["upper"],
+                  report=lambda upper: reports.append(upper)),
+            Stage("loop", lambda upper: calls.append("loop") or upper, ["upper"], ["result"], memoize=False),
+        ])
+
+    graph().run(SessionStore("session", str(tmp_path)), text="a")
+    graph().run(SessionStore("session", str(tmp_path)), text="a")
+    # Unmemoized stages checkpoint their own steps, so they always run
+    assert calls == ["a", "loop", "loop"]
+    # Reports run whether the stage ran or was replayed
+    assert reports == ["A", "A"]
+
+    graph().run(SessionStore("session", str(tmp_path)), text="b")
+    assert calls == ["a", "loop", "loop", "b", "loop"]
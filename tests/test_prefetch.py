@@ -0,0 +1,105 @@
+import threading
+import time
+from clarification_context import ClarificationContext
+from prefetch import ClarificationPrefetcher
+
+def make_prefetcher(question_fn):
+    def update(requirements, clarified):
+        return requirements + "".join(f"\n- {answer}" for _, answer in clarified)
+
+    return ClarificationPrefetcher(update, question_fn, "## Auth", ClarificationContext())
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_answers_are_applied_in_order():
+    prefetcher = make_prefetcher(lambda requirements, context, loop: "")
+    prefetcher.submit_answer("Which login?", "Email")
+    prefetcher.submit_answer("Lockout?", "After five failures")
+    assert prefetcher.requirements() == "## Auth\n- Email\n- After five failures"
+    prefetcher.close()
+
+def test_speculative_questions_are_based_on_every_answer():
+    calls = []
+
+    def questions(requirements, context, loop):
+        calls.append((requirements, loop))
+        return f"questions for loop {loop}"
+
+    prefetcher = make_prefetcher(questions)
+    prefetcher.submit_answer("Which login?", "Email")
+    prefetcher.speculate(2)
+    assert prefetcher.next_questions(2) == "questions for loop 2"
+    assert calls == [("## Auth\n- Email", 2)]
+    assert prefetcher.speculation_hits == 1
+    prefetcher.close()
+
+def test_failed_speculation_is_regenerated():
+    attempts = []
+
+    def questions(requirements, context, loop):
+        attempts.append(loop)
+        if len(attempts) == 1:
+            raise RuntimeError("model unavailable")
+        return "questions"
+
+    prefetcher = make_prefetcher(questions)
+    prefetcher.speculate(2)
+    assert prefetcher.next_questions(2) == "questions"
+    assert attempts == [2, 2]
+    assert prefetcher.speculation_failures == 1
+    prefetcher.close()
+
+def test_close_does_not_wait_for_an_abandoned_speculation():
+    release = threading.Event()
+    prefetcher = make_prefetcher(lambda requirements, context, loop: release.wait(5))
+    prefetcher.speculate(2)
+    started = time.monotonic()
+    prefetcher.close(wait=False)
+    assert time.monotonic() - started < 1
+    speculation = [thread for thread in threading.enumerate() if thread.name == "prefetch-questions"]
+    assert speculation and all(thread.daemon for thread in speculation)
+    release.set()
+
+def blocking_prefetcher():
+    # The first update waits for `release`, so later answers queue behind it
+    release = threading.Event()
+    updates = []
+
+    def update(requirements, clarified):
+        updates.append([answer for _, answer in clarified])
+        if len(updates) == 1:
+            release.wait(5)
+        return requirements + "".join(f"\n- {answer}" for _, answer in clarified)
+
+    prefetcher = ClarificationPrefetcher(update, lambda requirements, context, loop: "", "## Auth", ClarificationContext())
+    return prefetcher, updates, release
+
+def test_answers_queued_behind_an_update_are_applied_in_one_call():
+    prefetcher, updates, release = blocking_prefetcher()
+    prefetcher.submit_answer("Which login?", "Email")
+    wait_until(lambda: updates)
+    prefetcher.submit_answer("Lockout?", "After five failures")
+    prefetcher.submit_answer("Session length?", "One day")
+    release.set()
+    assert prefetcher.requirements() == "## Auth\n- Email\n- After five failures\n- One day"
+    assert updates == [["Email"], ["After five failures", "One day"]]
+    prefetcher.close()
+
+def test_speculation_lists_the_question_being_answered_as_settled():
+    contexts = []
+
+    def questions(requirements, context, loop):
+        contexts.append(context)
+        return "questions"
+
+    prefetcher = make_prefetcher(questions)
+    prefetcher.submit_answer("Which login?", "Email")
+    prefetcher.speculate(2, "How long do sessions last?")
+    assert prefetcher.next_questions(2) == "questions"
+    assert contexts[0].earlier_answer("How long do sessions last?")
+    assert not prefetcher.clarification_context.earlier_answer("How long do sessions last?")
+    prefetcher.close()
@@ -0,0 +1,58 @@
+import pytest
+from answer_script import AnswerScript
+from question_index import QuestionIndex, normalize_question
+
+def index_of(*entries):
+    index = QuestionIndex()
+    for question, answer in entries:
+        index.add(question, answer)
+    return index
+
+def test_normalize_question_ignores_case_punctuation_and_spacing():
+    assert normalize_question("  What   Database, should be USED? ") == "what database should be used"
+
+def test_exact_repeat_matches():
+    index = index_of(("What database should be used?", "Postgres"))
+    assert index.match("what database should be used") == ("What database should be used?", "Postgres", 1.0)
+
+def test_rephrased_question_matches():
+    index = index_of(("What database should be used?", "Postgres"))
+    assert index.match("Which DBMS will the system use?")[1] == "Postgres"
+    assert index.match("What databases should be used?")[1] == "Postgres"
+
+def test_question_about_another_feature_does_not_match():
+    index = index_of(("Which users can access reports?", "Managers"))
+    assert index.match("Which users can access search?") is None
+
+def test_question_sharing_no_terms_does_not_match():
+    index = index_of(("What database should be used?", "Postgres"))
+    assert index.match("How should reports be exported?") is None
+    assert index_of().match("What database should be used?") is None
+
+def test_best_match_wins():
+    index = index_of(
+        ("How should reports be exported?", "CSV"),
+        ("How often should reports be exported to storage?", "Daily"),
+    )
+    assert index.match("How should reports be exported?")[1] == "CSV"
+    assert index.match("How often are reports exported to storage?")[1] == "Daily"
+    assert len(index) == 2
+
+@pytest.mark.parametrize("answered, question", [
+    ("Which browsers must be supported?", "Which devices must be supported?"),
+    ("Which browsers must be supported?", "Which operating systems must be supported?"),
+    ("Which login method should be used?", "Should SSO be used?"),
+    ("Which roles are needed?", "Which permissions are needed?"),
+    ("Which cloud provider should host the app?", "How will the app be deployed?"),
+])
+def test_related_but_different_questions_do_not_match(answered, question):
+    assert index_of((answered, "earlier answer")).match(question) is None
+
+def test_variant_spellings_match():
+    index = index_of(("Which login flow should be used?", "Email and password"))
+    assert index.match("Which signin flow should be used?")[1] == "Email and password"
+
+def test_answer_script_does_not_reuse_an_answer_to_a_different_question():
+    script = AnswerScript([("Which browsers must be supported?", "Chrome")])
+    assert script.answer_fn("Which devices must be supported?", ["Phones", "Desktops"]) == "Phones"
+    assert script.unscripted == 1
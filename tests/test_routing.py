@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+import pytest
+from routing import (
+    RoutingClient,
+    RoutingPolicy,
+    keeps_requirement_ids,
+    lists_requirements,
+    parse_route,
+    parses_as_questions,
+)
+from tracing import tracer
+
+AGENT = SimpleNamespace(name="Clarification Agent", instructions="")
+
+def test_extraction_must_list_requirements():
+    assert lists_requirements([], "Requirements:\n- Users log in with SSO.")
+    assert not lists_requirements([], "I could not find any requirements.")
+
+def test_questions_must_parse_unless_none_are_needed():
+    assert parses_as_questions([], '{"questions": [{"question": "Which database?", "options": ["A", "B"]}]}')
+    assert parses_as_questions([], "No further clarification needed.")
+    assert not parses_as_questions([], "Here are some thoughts about your project.")
+
+def test_merge_must_keep_every_requirement_id():
+    messages = [{"role": "user", "content": "- [REQ-1] Log in.\n- [REQ-2] Log out."}]
+    assert keeps_requirement_ids(messages, "- [REQ-1] Log in with SSO.\n- [REQ-2] Log out.")
+    assert not keeps_requirement_ids(messages, "- [REQ-1] Log in with SSO.")
+
+def test_routes_are_parsed_and_checked():
+    assert parse_route("loop_2_questions=strong") == ("loop_2_questions", "strong")
+    with pytest.raises(ValueError, match="Invalid route"):
+        parse_route("loop_2_questions=huge")
+
+def test_stage_routes_apply_to_every_loop():
+    policy = RoutingPolicy(routes={"loop_2_questions": "strong", "Reader Agent": "strong"})
+    assert policy.tier_for("Clarification Agent", "loop_N_questions").name == "strong"
+    assert policy.tier_for("Reader Agent", None).name == "strong"
+    assert policy.tier_for("Unknown Agent", None) is None
+
+class ScriptedClient:
+    """
+    Answers each call with the next of `contents` and records the model it was sent to.
+    """
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.models = []
+
+    def run(self, agent, messages, model_override=None, **kwargs):
+        self.models.append(model_override)
+        return SimpleNamespace(messages=[{"role": "assistant", "content": self.contents.pop(0)}])
+
+def ask(client, stage="loop_1_questions"):
+    with tracer.span(stage, stage=stage):
+        return client.run(AGENT, [{"role": "user", "content": "questions please"}])
+
+def test_failed_check_escalates_to_the_next_tier():
+    upstream = ScriptedClient("not questions", "No further clarification needed.")
+    client = RoutingClient(upstream, RoutingPolicy())
+    assert ask(client).messages[-1]["content"] == "No further clarification needed."
+    assert upstream.models == ["gpt-4o-mini", "gpt-4o"]
+    assert client.escalations == {"fast": 1}
+
+def test_response_failing_on_the_strongest_tier_is_kept():
+    upstream = ScriptedClient("not questions", "still not questions")
+    client = RoutingClient(upstream, RoutingPolicy())
+    assert ask(client).messages[-1]["content"] == "still not questions"
+    assert client.escalations == {"fast": 1, "strong": 1}
+
+def test_no_escalation_when_disabled():
+    upstream = ScriptedClient("not questions")
+    client = RoutingClient(upstream, RoutingPolicy(escalate=False))
+    assert ask(client).messages[-1]["content"] == "not questions"
+    assert upstream.models == ["gpt-4o-mini"]
@@ -0,0 +1,189 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from scheduler import PRIORITY_BULK, SchedulingClient, request_priority
+
+AGENT = SimpleNamespace(name="Test Agent", instructions="")
+
+class RateLimitError(Exception):
+    pass
+
+class BlockingClient:
+    """
+    Holds every call until `release` is set and records the order calls started in.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def run(self, agent, messages, **kwargs):
+        with self.lock:
+            self.started.append(messages[-1]["content"])
+        self.release.wait(5)
+        return SimpleNamespace(messages=[{"role": "assistant", "content": "done"}])
+
+def call(scheduler, content):
+    return scheduler.run(AGENT, [{"role": "user", "content": content}])
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_call_waits_for_a_free_slot():
+    client = BlockingClient()
+    scheduler = SchedulingClient(client, max_concurrency=1)
+    first = threading.Thread(target=call, args=(scheduler, "first"))
+    second = threading.Thread(target=call, args=(scheduler, "second"))
+    first.start()
+    wait_until(lambda: client.started == ["first"])
+    second.start()
+    wait_until(lambda: scheduler.stats()["waiting"] == 1)
+    assert client.started == ["first"]
+    assert scheduler.stats()["in_flight"] == 1
+
+    client.release.set()
+    first.join(5)
+    second.join(5)
+    assert client.started == ["first", "second"]
+    assert scheduler.stats() == {"concurrency_limit": 1, "in_flight": 0, "waiting": 0, "retries": 0}
+
+def test_waiting_calls_are_admitted_by_priority():
+    client = BlockingClient()
+    scheduler = SchedulingClient(client, max_concurrency=1)
+
+    def bulk_call():
+        with request_priority(PRIORITY_BULK):
+            call(scheduler, "bulk")
+
+    threads = [threading.Thread(target=call, args=(scheduler, "first"))]
+    threads[0].start()
+    wait_until(lambda: client.started == ["first"])
+    threads.append(threading.Thread(target=bulk_call))
+    threads[-1].start()
+    wait_until(lambda: scheduler.stats()["waiting"] == 1)
+    threads.append(threading.Thread(target=call, args=(scheduler, "interactive")))
+    threads[-1].start()
+    wait_until(lambda: scheduler.stats()["waiting"] == 2)
+
+    client.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert client.started == ["first", "interactive", "bulk"]
+
+def test_retryable_errors_are_retried_and_halve_the_limit():
+    failures = [RateLimitError("slow down")]
+
+    class FlakyClient:
+        def run(self, agent, messages, **kwargs):
+            if failures:
+                raise failures.pop()
+            return SimpleNamespace(messages=[{"role": "assistant", "content": "done"}])
+
+    scheduler = SchedulingClient(FlakyClient(), max_concurrency=8, base_delay=0)
+    assert call(scheduler, "hello").messages[-1]["content"] == "done"
+    assert scheduler.retries == 1
+    assert scheduler.concurrency_limit == 4
+
+def test_other_errors_are_raised_without_retrying():
+    class BrokenClient:
+        def run(self, agent, messages, **kwargs):
+            raise KeyError("bad request")
+
+    scheduler = SchedulingClient(BrokenClient(), max_concurrency=8, base_delay=0)
+    with pytest.raises(KeyError):
+        call(scheduler, "hello")
+    assert scheduler.retries == 0
+    assert scheduler.concurrency_limit == 8
+    assert scheduler.stats()["in_flight"] == 0
+
+def test_limit_grows_additively_after_successes():
+    scheduler = SchedulingClient(None, max_concurrency=8)
+    scheduler._limit = 2.0
+    # Each success adds 1 / limit, so a slot is added per limit's worth of successes
+    for _ in range(2):
+        scheduler._acquire(1)
+        scheduler._release()
+    assert scheduler.concurrency_limit == 2
+    scheduler._acquire(1)
+    scheduler._release()
+    assert scheduler.concurrency_limit == 3
+
+def test_limit_is_cut_when_the_first_chunk_takes_well_above_its_average():
+    scheduler = SchedulingClient(None, max_concurrency=8, latency_tolerance=2.0)
+    scheduler._acquire(1)
+    scheduler._release(first_chunk_latency=0.1)
+    limit = scheduler._limit
+    scheduler._acquire(1)
+    scheduler._release(first_chunk_latency=1.0)
+    assert scheduler._limit == pytest.approx(limit * 0.7)
+
+def test_long_generations_do_not_cut_the_limit():
+    # Short calls mixed with long generations and no errors, which only differ in response length
+    class TimedClient:
+        def run(self, agent, messages, stream=False, **kwargs):
+            time.sleep(0.05 if messages[-1]["content"] == "long" else 0.005)
+            return SimpleNamespace(messages=[{"role": "assistant", "content": "done"}])
+
+    scheduler = SchedulingClient(TimedClient(), max_concurrency=16)
+    for _ in range(4):
+        for content in ["short"] * 5 + ["long"]:
+            call(scheduler, content)
+    assert scheduler.concurrency_limit == 16
+
+def test_limit_never_drops_below_the_minimum():
+    scheduler = SchedulingClient(None, max_concurrency=4, min_concurrency=2)
+    for _ in range(5):
+        scheduler._acquire(1)
+        scheduler._release(RateLimitError("slow down"))
+    assert scheduler.concurrency_limit == 2
+
+class StreamingClient:
+    def __init__(self, chunks=3, failures=()):
+        self.chunks = chunks
+        self.failures = list(failures)
+        self.calls = 0
+
+    def run(self, agent, messages, stream=False, **kwargs):
+        self.calls += 1
+        if not stream:
+            return SimpleNamespace(messages=[{"role": "assistant", "content": "done"}])
+
+        def chunks():
+            if self.failures:
+                raise self.failures.pop()
+            for number in range(self.chunks):
+                yield {"content": f"part {number} "}
+
+        return chunks()
+
+def test_stream_releases_its_slot_when_the_model_finishes():
+    scheduler = SchedulingClient(StreamingClient(), max_concurrency=1)
+    stream = scheduler.run(AGENT, [{"role": "user", "content": "stream"}], stream=True)
+    assert next(stream) == {"content": "part 0 "}
+    # The consumer is paused mid-stream, e.g. while a user answers; other calls still run
+    wait_until(lambda: scheduler.stats()["in_flight"] == 0)
+    started = time.monotonic()
+    assert call(scheduler, "other").messages[-1]["content"] == "done"
+    assert time.monotonic() - started < 1
+    time.sleep(0.2)
+    assert [chunk["content"] for chunk in stream] == ["part 1 ", "part 2 "]
+    # The consumer's pause is not taken for upstream latency
+    assert scheduler._first_chunk_average < 0.1
+
+def test_stream_is_retried_before_any_chunk_arrived():
+    scheduler = SchedulingClient(StreamingClient(failures=[RateLimitError("slow down")]), base_delay=0)
+    stream = scheduler.run(AGENT, [{"role": "user", "content": "stream"}], stream=True)
+    assert len(list(stream)) == 3
+    assert scheduler.retries == 1
+
+def test_stream_error_reaches_the_consumer():
+    scheduler = SchedulingClient(StreamingClient(failures=[KeyError("bad request")]), base_delay=0)
+    stream = scheduler.run(AGENT, [{"role": "user", "content": "stream"}], stream=True)
+    with pytest.raises(KeyError):
+        list(stream)
+    assert scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,52 @@
+from sections import (
+    ADDITIONAL_SECTION_ID,
+    heading_title,
+    parse_sections,
+    route_clarifications,
+    stitch_sections,
+)
+
+DOCUMENT = """Requirements for the booking service.
+
+## 1. Data Storage
+- Bookings are stored in a relational database.
+
+## 2. Notifications
+- Customers receive an email when a booking is confirmed.
+
+```
+## not a heading inside a code block
+```
+
+**Security:**
+- Passwords are hashed.
+"""
+
+def test_sections_are_split_at_headings_outside_code_blocks():
+    sections = parse_sections(DOCUMENT)
+    assert [section.id for section in sections] == ["preamble", "data-storage", "notifications", "security"]
+    assert "## not a heading inside a code block" in sections[2].body
+
+def test_repeated_headings_get_distinct_ids():
+    sections = parse_sections("## Notes\nfirst\n\n## Notes\nsecond\n")
+    assert [section.id for section in sections] == ["notes", "notes-2"]
+
+def test_heading_title_strips_markers_and_numbering():
+    assert heading_title("### 3.2.1 Functional Requirements") == "Functional Requirements"
+    assert heading_title("**Security:**") == "Security"
+
+def test_stitching_parsed_sections_gives_back_the_document():
+    assert stitch_sections(parse_sections(DOCUMENT)) == DOCUMENT
+
+def test_clarification_is_routed_to_the_section_it_is_about():
+    routes = route_clarifications(parse_sections(DOCUMENT), [("Which database engine?", "PostgreSQL")])
+    assert list(routes) == ["data-storage"]
+
+def test_clarification_matching_no_section_goes_to_additional_requirements():
+    routes = route_clarifications(parse_sections(DOCUMENT), [("Which currency is shown?", "Euro")])
+    assert routes == {ADDITIONAL_SECTION_ID: [("Which currency is shown?", "Euro")]}
+
+def test_clarification_is_routed_to_at_most_max_sections():
+    clarification = ("How are notification emails stored in the database?", "Encrypted at rest")
+    routes = route_clarifications(parse_sections(DOCUMENT), [clarification], max_sections=1)
+    assert len(routes) == 1
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import pytest
+from service import ClarificationService, HTTPError, ServiceSession
+
+@pytest.fixture
+def service(tmp_path):
+    return ClarificationService(None, output_root=str(tmp_path), session_ttl=60)
+
+def request(service, raw):
+    async def handle():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        try:
+            return await service._handle_request(reader)
+        except HTTPError as error:
+            return error.status, error.message
+
+    return asyncio.run(handle())
+
+def post(body, length=None):
+    length = len(body) if length is None else length
+    return f"POST /sessions HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1") + body
+
+@pytest.mark.parametrize("raw", [
+    post(b'{"requirements": '),
+    post(b'["requirements"]'),
+    post('{"requirements": "café"}'.encode("latin-1")),
+    post(b'{"requirements": "App"}', length=200),
+    post(b"", length=-1),
+])
+def test_malformed_bodies_are_bad_requests(service, raw):
+    assert request(service, raw)[0] == 400
+
+def test_unknown_session_is_not_found(service):
+    assert request(service, b"GET /sessions/nope HTTP/1.1\r\n\r\n")[0] == 404
+
+def pending_session():
+    session = ServiceSession("s1", "", "", {})
+    answers = []
+    thread = threading.Thread(target=lambda: answers.append(session.answer_fn("Which OS?", ["Linux", "macOS"])))
+    thread.start()
+    while not session.pending_questions():
+        time.sleep(0.01)
+    return session, thread, answers
+
+@pytest.mark.parametrize("option", [True, False, 0, 3, "1"])
+def test_invalid_option_numbers_are_rejected(option):
+    session, thread, answers = pending_session()
+    with pytest.raises(HTTPError) as error:
+        session.submit(1, option=option)
+    assert error.value.status == 400
+    assert session.pending_questions()
+    session.submit(1, option=2)
+    thread.join(5)
+    assert answers == ["macOS"]
+
+def test_boolean_question_ids_are_rejected(service):
+    service.sessions["s1"] = ServiceSession("s1", "", "", {})
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(service.answers({"answers": [{"id": True, "option": 1}]}, {}, "s1"))
+    assert error.value.status == 400
+
+def test_finished_sessions_are_evicted_after_their_ttl(service):
+    running, recent, expired = (ServiceSession(session_id, "", "", {}) for session_id in ("running", "recent", "expired"))
+    recent.finished_at = time.monotonic()
+    expired.finished_at = time.monotonic() - 61
+    service.sessions.update(running=running, recent=recent, expired=expired)
+    assert service.evict_finished_sessions() == ["expired"]
+    assert sorted(service.sessions) == ["recent", "running"]
+    assert request(service, b"GET /sessions/expired HTTP/1.1\r\n\r\n")[0] == 404
+    assert request(service, b"GET /sessions/running HTTP/1.1\r\n\r\n")[1]["status"] == "queued"
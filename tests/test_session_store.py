@@ -0,0 +1,54 @@
+from session_store import SessionStore
+
+class Work:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        return f"result of {value}"
+
+def test_resumed_session_replays_completed_stages(tmp_path):
+    work = Work()
+    store = SessionStore("session", str(tmp_path))
+    store.start(input_file="requirements.txt")
+    assert store.run_stage("high_level_requirements", work, "input") == "result of input"
+
+    resumed = SessionStore("session", str(tmp_path))
+    assert resumed.exists()
+    assert resumed.metadata == {"input_file": "requirements.txt"}
+    assert resumed.run_stage("high_level_requirements", work, "input") == "result of input"
+    assert work.calls == 1
+    assert resumed.replayed == 1
+
+def test_stage_recorded_under_another_key_runs_again(tmp_path):
+    work = Work()
+    store = SessionStore("session", str(tmp_path))
+    store.run_stage("loop_1_answer_1", work, "Which database?", key="Which database?")
+
+    resumed = SessionStore("session", str(tmp_path))
+    assert resumed.run_stage("loop_1_answer_1", work, "Which cache?", key="Which cache?") == "result of Which cache?"
+    assert work.calls == 2
+    # The new result replaces the stale one for the next resume
+    assert SessionStore("session", str(tmp_path)).has("loop_1_answer_1", "Which cache?")
+
+def test_results_are_serialized_and_rebuilt(tmp_path):
+    store = SessionStore("session", str(tmp_path))
+    store.run_stage("pair", lambda: ("a", "b"), serialize=list, deserialize=tuple)
+    assert SessionStore("session", str(tmp_path)).run_stage("pair", lambda: None, deserialize=tuple) == ("a", "b")
+
+def test_half_written_last_line_is_ignored(tmp_path):
+    store = SessionStore("session", str(tmp_path))
+    store.record("high_level_requirements", "done")
+    with open(store.path, "a") as f:
+        f.write('{"type": "stage", "stage": "loop_1_q')
+    resumed = SessionStore("session", str(tmp_path))
+    assert resumed.get("high_level_requirements") == "done"
+    assert not resumed.has("loop_1_questions")
+
+def test_in_memory_store_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = SessionStore("session", None)
+    store.record("high_level_requirements", "done")
+    assert store.get("high_level_requirements") == "done"
+    assert list(tmp_path.iterdir()) == []
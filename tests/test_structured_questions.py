@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from structured_questions import (
+    IncrementalQuestionParser,
+    StructuredQuestionStream,
+    parse_structured_questions,
+    questions_to_content,
+)
+from tracing import tracer
+
+AGENT = SimpleNamespace(name="Clarification Agent", instructions="")
+
+RESPONSE = (
+    '{"questions": [{"question": "Which database should be used?", "options": ["PostgreSQL", "MySQL"]}, '
+    '{"question": "How are users notified?", "options": ["Email", "Push"]}]}'
+)
+
+def feed_in_chunks(text, size):
+    parser = IncrementalQuestionParser()
+    questions = []
+    for start in range(0, len(text), size):
+        questions.extend(parser.feed(text[start:start + size]))
+    return questions
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(RESPONSE)])
+def test_incremental_parser_emits_questions_whatever_the_chunking(size):
+    assert feed_in_chunks(RESPONSE, size) == [
+        ("Which database should be used?", ["PostgreSQL", "MySQL"]),
+        ("How are users notified?", ["Email", "Push"]),
+    ]
+
+def test_incremental_parser_emits_each_question_when_its_object_closes():
+    parser = IncrementalQuestionParser()
+    assert parser.feed('{"questions": [{"question": "Which database?", "options": ["Postgre') == []
+    assert parser.feed('SQL", "My') == []
+    assert parser.feed('SQL"]}, {"question": "Which') == [("Which database?", ["PostgreSQL", "MySQL"])]
+    assert parser.feed(' OS?", "options": []}]}') == [("Which OS?", [])]
+
+def test_incremental_parser_ignores_braces_and_quotes_inside_strings():
+    text = r'{"questions": [{"question": "Use \"{curly}\" or [square] ids?", "options": ["{a}", "b]"]}]}'
+    assert feed_in_chunks(text, 2) == [('Use "{curly}" or [square] ids?', ["{a}", "b]"])]
+
+def test_incremental_parser_tolerates_trailing_commas():
+    text = '{"questions": [{"question": "Which OS?", "options": ["Linux", "macOS",],},]}'
+    assert feed_in_chunks(text, 4) == [("Which OS?", ["Linux", "macOS"])]
+
+def test_incremental_parser_keeps_complete_questions_of_a_truncated_response():
+    truncated = RESPONSE[:RESPONSE.index("Push")]
+    assert feed_in_chunks(truncated, 5) == [("Which database should be used?", ["PostgreSQL", "MySQL"])]
+
+def test_incremental_parser_skips_objects_without_a_question():
+    text = '{"questions": [{"options": ["x"]}, {"question": "  ", "options": []}, {"question": "Which OS?"}]}'
+    assert feed_in_chunks(text, 3) == [("Which OS?", [])]
+
+def test_parse_structured_questions_repairs_fences_text_and_trailing_commas():
+    content = 'Here you go:\n```json\n{"questions": [{"question": "Which OS?", "options": ["Linux",],},]}\n```'
+    assert parse_structured_questions(content) == [("Which OS?", ["Linux"])]
+
+def test_parse_structured_questions_accepts_a_bare_list():
+    assert parse_structured_questions('[{"question": "Which OS?", "options": []}]') == [("Which OS?", [])]
+
+@pytest.mark.parametrize("content", [
+    "No JSON here",
+    RESPONSE[:RESPONSE.index("Push")],
+    '{"questions": "none"}',
+])
+def test_parse_structured_questions_rejects_unrecoverable_responses(content):
+    with pytest.raises(ValueError):
+        parse_structured_questions(content)
+
+class StreamingClient:
+    """
+    Streams a fixed response in small chunks; `finished` is set once the whole response was read.
+    """
+
+    def __init__(self, content, repaired=None):
+        self.content = content
+        self.repaired = repaired
+        self.finished = threading.Event()
+
+    def _stream(self):
+        for start in range(0, len(self.content), 5):
+            yield {"content": self.content[start:start + 5]}
+        self.finished.set()
+
+    def run(self, agent, messages, stream=False, **kwargs):
+        if stream:
+            return self._stream()
+        return SimpleNamespace(messages=[{"role": "assistant", "content": self.repaired}])
+
+def test_stream_reads_the_whole_response_while_the_first_question_is_answered():
+    client = StreamingClient(RESPONSE)
+    stream = StructuredQuestionStream(client, AGENT, "questions please")
+    questions = iter(stream)
+    assert next(questions) == ("Which database should be used?", ["PostgreSQL", "MySQL"])
+    # The user is still answering the first question
+    assert client.finished.wait(5)
+    assert list(questions) == [("How are users notified?", ["Email", "Push"])]
+    assert stream.content == RESPONSE
+
+def test_stream_keeps_received_questions_of_a_truncated_response():
+    client = StreamingClient(RESPONSE[:RESPONSE.index("Push")])
+    stream = StructuredQuestionStream(client, AGENT, "questions please")
+    assert list(stream) == [("Which database should be used?", ["PostgreSQL", "MySQL"])]
+    assert json.loads(stream.content) == json.loads(questions_to_content(stream.questions))
+
+def test_stream_repairs_a_response_with_no_parseable_question():
+    client = StreamingClient("Which OS? Linux or macOS", repaired='{"questions": [{"question": "Which OS?", "options": ["Linux", "macOS"]}]}')
+    stream = StructuredQuestionStream(client, AGENT, "questions please")
+    assert list(stream) == [("Which OS?", ["Linux", "macOS"])]
+
+def test_stream_raises_errors_of_the_call():
+    class FailingClient:
+        def run(self, agent, messages, stream=False, **kwargs):
+            def chunks():
+                yield {"content": '{"questions": ['}
+                raise ConnectionError("connection reset")
+            return chunks()
+
+    with pytest.raises(ConnectionError):
+        list(StructuredQuestionStream(FailingClient(), AGENT, "questions please"))
+
+def test_stream_span_lasts_until_the_whole_response_was_read():
+    class SlowClient(StreamingClient):
+        def _stream(self):
+            yield {"content": RESPONSE[:RESPONSE.index(", {")]}
+            time.sleep(0.2)
+            yield {"content": RESPONSE[RESPONSE.index(", {"):]}
+            self.finished.set()
+
+    client = SlowClient(RESPONSE)
+    stream = StructuredQuestionStream(
+        client, AGENT, "questions please", span="loop_1_questions", span_attributes={"session": "span-test"}
+    )
+    assert len(list(stream)) == 2
+    spans = tracer.pop_session("span-test")
+    assert [span["name"] for span in spans] == ["loop_1_questions"]
+    assert spans[0]["duration"] >= 0.2
@@ -0,0 +1,15 @@
+from chunking import requirement_tokens
+from text_terms import content_terms, words
+
+def test_words_are_lower_case_runs_of_letters_and_digits():
+    assert words("Use OAuth2, not SAML!") == ["use", "oauth2", "not", "saml"]
+
+def test_content_terms_drop_stopwords_and_fold_plurals():
+    assert content_terms("Which policies apply to the databases?") == ["policy", "apply", "database"]
+
+def test_content_terms_fold_variant_spellings():
+    assert content_terms("Is the DB encrypted?") == ["database", "encryption"]
+
+def test_requirements_and_questions_share_the_terms():
+    # Deduplicating requirements and matching questions see the same words
+    assert requirement_tokens("Users log in with SSO.") == frozenset(content_terms("A user logs in with SSO"))
@@ -0,0 +1,149 @@
+import os
+import re
+from types import SimpleNamespace
+import pytest
+import agents
+from artifact_store import ArtifactStore
+from file_utils import save_updated_requirements_file
+from traceability import (
+    amend_requirements,
+    assign_requirement_ids,
+    build_traceability,
+    changed_requirements,
+    load_traceability,
+    requirement_index,
+    srs_units,
+)
+
+def test_assign_requirement_ids_tags_untagged_bullets():
+    text = "## Auth\n- Users log in\n1. Accounts lock\n* Sessions expire"
+    assert assign_requirement_ids(text) == (
+        "## Auth\n- [REQ-001] Users log in\n1. [REQ-002] Accounts lock\n* [REQ-003] Sessions expire"
+    )
+
+def test_assign_requirement_ids_keeps_existing_ids_and_continues_after_the_highest():
+    text = "- [REQ-004] Users log in\n- Accounts lock\n- [REQ-002] Sessions expire"
+    assert assign_requirement_ids(text) == (
+        "- [REQ-004] Users log in\n- [REQ-005] Accounts lock\n- [REQ-002] Sessions expire"
+    )
+
+def test_assign_requirement_ids_is_idempotent():
+    tagged = assign_requirement_ids("## Auth\n- Users log in\n- Accounts lock")
+    assert assign_requirement_ids(tagged) == tagged
+
+def test_assign_requirement_ids_skips_code_blocks_and_empty_bullets():
+    text = "```\n- not a requirement\n```\n- \n- Users log in"
+    assert assign_requirement_ids(text) == "```\n- not a requirement\n```\n- \n- [REQ-001] Users log in"
+
+def test_requirement_index_and_changes():
+    before = "## Auth\n- [REQ-001] Users log in\n## Reports\n- [REQ-002] Export CSV"
+    after = "## Auth\n- [REQ-001] Users log in with SSO\n## Reports\n- [REQ-002] Export CSV\n- [REQ-003] Export PDF"
+    assert requirement_index(before) == {"REQ-001": ("auth", "Users log in"), "REQ-002": ("reports", "Export CSV")}
+    assert changed_requirements(before, after) == ["REQ-001", "REQ-003"]
+
+def test_srs_units_split_at_sections_and_subsections():
+    document = (
+        "# Software Requirements Specification\n\n"
+        "## 1 Introduction\nPurpose.\n\n"
+        "## 3 Specific Requirements\n\n"
+        "### 3.1 Functional Requirements\nCites [REQ-001].\n#### 3.1.1 Login\nDetail.\n\n"
+        "### 3.2 Performance Requirements\nFast."
+    )
+    preamble, units = srs_units(document)
+    assert preamble == "# Software Requirements Specification"
+    assert [(unit.number, unit.title, unit.level) for unit in units] == [
+        ("1", "Introduction", 2),
+        ("3", "Specific Requirements", 2),
+        ("3.1", "Functional Requirements", 3),
+        ("3.2", "Performance Requirements", 3),
+    ]
+    # Deeper headings stay inside their subsection
+    assert units[2].text == "### 3.1 Functional Requirements\nCites [REQ-001].\n#### 3.1.1 Login\nDetail."
+
+REQUIREMENTS = "## Auth\n- [REQ-001] Users log in\n## Reports\n- [REQ-002] Export CSV"
+
+DOCUMENT = (
+    "# Software Requirements Specification\n\n"
+    "## 1 Introduction\nPurpose.\n\n"
+    "## 3 Specific Requirements\nCovers [REQ-001] and [REQ-002].\n\n"
+    "### 3.1 Login\nUsers log in [REQ-001].\n\n"
+    "### 3.2 Reports\nExport CSV [REQ-002]."
+)
+
+class SpecClient:
+    """
+    Answers requirement updates with a fixed body and section prompts with a fixed section.
+    """
+
+    def __init__(self, sections):
+        self.sections = sections
+        self.headings = []
+
+    def run(self, agent, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        heading = re.search(r"heading line `(.*?)`", prompt)
+        if agent.name == "Reader Agent":
+            content = "- [REQ-001] Users log in with SSO"
+        elif heading:
+            self.headings.append(heading.group(1))
+            content = self.sections[heading.group(1)]
+        else:
+            content = "GLOSSARY:\n\nSPECIFIC REQUIREMENTS:\n3.1 Login"
+        return SimpleNamespace(messages=[{"role": "assistant", "content": content}])
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    for name, title in (("reader_agent", "Reader Agent"), ("ieee_830_agent", "IEEE 830 Agent")):
+        monkeypatch.setitem(vars(agents), name, SimpleNamespace(name=title, instructions=""))
+    store = ArtifactStore(":memory:")
+    yield store, tmp_path
+    store.close()
+
+def start_session(store, directory, document):
+    base = os.path.join(directory, "out", "requirements.md")
+    os.makedirs(os.path.dirname(base))
+    path, version = save_updated_requirements_file(base, document, store, "s1")
+    clarifications = [{
+        "id": "C1", "loop": 1, "question": "How do users log in?", "options": [], "answer": "Password",
+        "requirements": ["REQ-001"],
+    }]
+    ref = {"run_id": "s1", "name": os.path.normpath(base), "version": version, "path": path}
+    return build_traceability("s1", REQUIREMENTS, clarifications, document, ref)
+
+def test_amend_regenerates_a_section_with_its_subsections_once(session, monkeypatch):
+    store, directory = session
+    traceability = start_session(store, directory, DOCUMENT)
+    client = SpecClient({
+        "## 3 Specific Requirements": (
+            "## 3 Specific Requirements\nCovers [REQ-001].\n### 3.1 Login\nSSO [REQ-001].\n### 3.2 Reports\nCSV [REQ-002]."
+        ),
+    })
+    # The amendment is run from somewhere else than the session
+    monkeypatch.chdir(directory / "out")
+    os.mkdir("elsewhere")
+    monkeypatch.chdir("elsewhere")
+    updated, path, regenerated = amend_requirements(client, store, traceability, {"C1": "SSO"}, "s1-amend")
+    assert regenerated == ["3"]
+    assert client.headings == ["## 3 Specific Requirements"]
+    assert path == str(directory / "out" / "requirements_v2.md")
+    amended = open(path).read()
+    assert amended.count("3.1 Login") == 1 and amended.count("3.2 Reports") == 1
+    assert "SSO [REQ-001]" in amended and "Users log in [REQ-001]" not in amended
+    assert "## 1 Introduction\nPurpose." in amended
+    assert updated["document"] == {
+        "run_id": "s1-amend", "name": traceability["document"]["name"], "version": 1, "path": path,
+    }
+    assert load_traceability(store, "s1") == updated
+
+def test_amend_regenerates_a_document_without_numbered_sections_whole(session):
+    store, directory = session
+    traceability = start_session(store, directory, "# Software Requirements Specification\nUsers log in [REQ-001].")
+    client = SpecClient({
+        "## 1 Introduction": "Purpose.",
+        "## 2 Overall Description": "Overview.",
+        "### 3.1 Login": "SSO [REQ-001].",
+        "## 4 Appendices": "None.",
+    })
+    _, path, regenerated = amend_requirements(client, store, traceability, {"C1": "SSO"}, "s1-amend")
+    assert regenerated is None
+    assert "### 3.1 Login\nSSO [REQ-001]." in open(path).read()
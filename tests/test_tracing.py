@@ -0,0 +1,46 @@
+from tracing import Tracer, current_span, load_jsonl, start_thread_in_context
+
+def record(tracer, stage, calls):
+    with tracer.span(stage, stage=stage):
+        for _ in range(calls):
+            with tracer.span(f"run:{stage}", kind="call", prompt_tokens=10, completion_tokens=5):
+                pass
+
+def test_appended_spans_follow_the_earlier_attempt_with_unique_ids(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    interrupted = Tracer()
+    record(interrupted, "high_level_requirements", 1)
+    record(interrupted, "loop_1_questions", 1)
+    interrupted.export_jsonl(path, append=True)
+
+    resumed = Tracer()
+    record(resumed, "loop_1_update", 2)
+    resumed.export_jsonl(path, append=True)
+
+    spans = load_jsonl(path)
+    assert len(spans) == 7
+    assert len({span["id"] for span in spans}) == 7
+    ids = {span["id"] for span in spans}
+    assert all(span["parent_id"] in ids for span in spans if span["parent_id"] is not None)
+    summary = resumed.summary(spans)
+    assert {row["stage"]: row["calls"] for row in summary["stages"]} == {
+        "high_level_requirements": 1, "loop_N_questions": 1, "loop_N_update": 2,
+    }
+
+def test_export_without_append_replaces_the_file(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    tracer = Tracer()
+    record(tracer, "loop_1_questions", 1)
+    tracer.export_jsonl(path)
+    tracer.export_jsonl(path)
+    assert len(load_jsonl(path)) == 2
+    assert load_jsonl(str(tmp_path / "missing.jsonl")) == []
+
+def test_threads_started_in_context_see_the_current_span_and_are_daemons():
+    tracer = Tracer()
+    seen = []
+    with tracer.span("loop_1_questions") as span:
+        thread = start_thread_in_context("test-thread", lambda: seen.append(current_span.get()))
+    thread.join(5)
+    assert seen == [span]
+    assert thread.daemon and thread.name == "test-thread"
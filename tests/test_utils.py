@@ -0,0 +1,51 @@
+import logging
+import queue
+import sys
+from utils import ArtifactWriter, SessionQueueHandler, current_session_id
+
+def prepared(message, *args, max_payload_chars=20, exc_info=None):
+    handler = SessionQueueHandler(queue.Queue(), max_payload_chars)
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, message, args, exc_info)
+    return handler.prepare(record)
+
+def test_long_messages_are_truncated_after_formatting():
+    record = prepared("%s", "x" * 50)
+    assert record.getMessage() == "x" * 20 + "... [30 more chars truncated]"
+
+def test_short_messages_are_kept_whole():
+    assert prepared("short %s", "message").getMessage() == "short message"
+
+def test_messages_with_a_traceback_are_kept_whole():
+    try:
+        raise KeyError("boom")
+    except KeyError:
+        record = prepared("x" * 50, exc_info=sys.exc_info())
+    assert record.msg.startswith("x" * 50)
+    assert "KeyError" in record.msg
+
+def test_records_are_stamped_with_the_current_session():
+    token = current_session_id.set("session-1")
+    try:
+        assert prepared("hello").session_id == "session-1"
+    finally:
+        current_session_id.reset(token)
+
+def test_artifact_writes_are_applied_in_order_by_flush(tmp_path):
+    writer = ArtifactWriter()
+    path = tmp_path / "out" / "document.md"
+    for version in range(20):
+        writer.write(str(path), f"version {version}")
+    writer.flush()
+    assert path.read_text() == "version 19"
+
+def test_a_failed_artifact_write_does_not_stop_later_ones(tmp_path, caplog):
+    writer = ArtifactWriter()
+
+    def broken():
+        raise OSError("disk full")
+
+    writer.submit(broken)
+    writer.write(str(tmp_path / "document.md"), "content")
+    writer.flush()
+    assert (tmp_path / "document.md").read_text() == "content"
+    assert "Background artifact write broken failed" in caplog.text